@@ -0,0 +1,5 @@
+"""
+性能計測用ベンチマークスクリプト群
+
+プロジェクトルートから `python -m benchmarks.<モジュール名>` で実行する。
+"""
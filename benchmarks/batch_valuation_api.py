@@ -0,0 +1,145 @@
+"""
+一括評価APIのスループットのベンチマーク
+
+同じ物件を /api/valuate に1件ずつPOSTした場合と、/api/valuate/batch に
+JSON配列・NDJSONでまとめてPOSTした場合の1秒あたりの処理件数を比較する。
+あわせて評価額・評価履歴の件数が一致することを確認する。
+
+Flaskのテストクライアントで呼び出すため、HTTPの通信時間は含まない
+（実際の運用では1件ずつの場合にリクエストごとの往復時間がさらに加わる）。
+データベースは一時ディレクトリのSQLiteファイルを使う。
+
+実行方法:
+    python -m benchmarks.batch_valuation_api [件数]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+STRUCTURES = ['木造', '鉄骨造', '鉄筋コンクリート造']
+ADDRESSES = [f'東京都渋谷区渋谷{i}-1-1' for i in range(1, 51)]
+
+
+def make_properties(count: int, seed: int = 0) -> list:
+    """ランダムな物件のリストを作成"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'address': ADDRESSES[int(rng.integers(0, len(ADDRESSES)))],
+            'land_area': round(float(rng.uniform(30, 500)), 2),
+            'total_floor_area': round(float(rng.uniform(30, 800)), 2),
+            'building_structure': STRUCTURES[int(rng.integers(0, len(STRUCTURES)))],
+            'build_year': int(rng.integers(1950, 2026)),
+        }
+        for _ in range(count)
+    ]
+
+
+def load_app(database_path: str, email: str = 'bench@example.com'):
+    """一時データベースを使うFlaskアプリを読み込み、ログイン済みのテストクライアントを返す"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    flask_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app')
+    sys.path.insert(0, flask_dir)
+    from app import app
+    from models import db, User, ValuationHistory
+
+    with app.app_context():
+        db.create_all()
+        user = User(email=email)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    def history_count() -> int:
+        with app.app_context():
+            return db.session.query(ValuationHistory).count()
+
+    return client, history_count
+
+
+def post_single(client, properties: list) -> list:
+    """1件ずつ /api/valuate にPOST"""
+    results = []
+    for item in properties:
+        response = client.post('/api/valuate', json=item)
+        results.append(response.get_json()['result'])
+    return results
+
+
+def post_batch_json(client, properties: list) -> list:
+    """JSON配列で /api/valuate/batch にPOST"""
+    response = client.post('/api/valuate/batch', json=properties)
+    return [item['result'] for item in response.get_json()['results']]
+
+
+def post_batch_ndjson(client, properties: list) -> list:
+    """NDJSONで /api/valuate/batch にPOST"""
+    body = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in properties)
+    response = client.post('/api/valuate/batch', data=body.encode('utf-8'),
+                           content_type='application/x-ndjson')
+    return [json.loads(line)['result'] for line in response.get_data(as_text=True).splitlines()]
+
+
+VALUE_KEYS = ('land_valuation', 'building_valuation', 'total_valuation', 'road_price')
+
+
+def run(count: int = 1000) -> list:
+    """方式ごとの処理時間を計測し、結果が一致することを確認"""
+    properties = make_properties(count)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client, history_count = load_app(os.path.join(tmpdir, 'bench.db'))
+
+        rows = []
+        expected = None
+        for name, func in (('1件ずつ（/api/valuate）', post_single),
+                           ('一括（JSON配列）', post_batch_json),
+                           ('一括（NDJSON）', post_batch_ndjson)):
+            before = history_count()
+            start = time.perf_counter()
+            results = func(client, properties)
+            elapsed = time.perf_counter() - start
+
+            values = [tuple(result[key] for key in VALUE_KEYS) for result in results]
+            if expected is None:
+                expected = values
+            elif values != expected:
+                raise AssertionError(f'{name}: 評価額が一致しません')
+            if history_count() - before != count:
+                raise AssertionError(f'{name}: 評価履歴の件数が一致しません')
+
+            rows.append({'method': name, 'sec': elapsed, 'items_per_sec': count / elapsed})
+
+    return rows
+
+
+def main() -> None:
+    """メイン処理"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    print("=" * 60)
+    print(f"一括評価APIのベンチマーク（{count:,}件）")
+    print("=" * 60)
+
+    rows = run(count)
+    baseline = rows[0]['sec']
+    for row in rows:
+        print(f"{row['method']:<24} {row['sec']:8.3f} 秒  {row['items_per_sec']:10,.0f} 件/秒  "
+              f"{baseline / row['sec']:6.1f}x")
+
+    print("-" * 60)
+    print("評価額・評価履歴の件数: 一致")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
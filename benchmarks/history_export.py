@@ -0,0 +1,136 @@
+"""
+評価履歴エクスポートのベンチマーク
+
+全件をORMオブジェクトとして読み込んでからCSVを組み立てる方法と、
+/history/export（yield_perでチャンクごとに取り出してチャンク転送）の
+処理時間とピークメモリ（tracemalloc）を件数ごとに比較する。
+あわせてCSVの内容が一致すること、NDJSON・Arrow形式の件数が一致することを確認する。
+
+データベースは一時ディレクトリのSQLiteファイルを使う。
+
+実行方法:
+    python -m benchmarks.history_export [件数 ...]
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.batch_valuation_api import load_app, make_properties
+
+
+def insert_histories(count: int) -> None:
+    """評価履歴をまとめて登録"""
+    from app import app
+    from models import db, User, ValuationHistory
+
+    with app.app_context():
+        user_id = db.session.query(User.id).scalar()
+        base = datetime(2025, 1, 1)
+        template = make_properties(100)
+        db.session.execute(ValuationHistory.__table__.insert(), [
+            dict(template[i % 100], user_id=user_id, land_valuation=1.0e7 + i, building_valuation=5.0e6,
+                 total_valuation=1.5e7 + i, road_price=300000.0, created_at=base + timedelta(seconds=i))
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def legacy_export_csv() -> bytes:
+    """従来の方法: 全件をORMオブジェクトとして読み込んでからCSVを組み立てる"""
+    from app import app
+    from models import ValuationHistory
+
+    with app.app_context():
+        histories = ValuationHistory.query.order_by(ValuationHistory.id).all()
+        columns = [column.name for column in ValuationHistory.__table__.columns]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        for history in histories:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in (getattr(history, column) for column in columns)
+            ])
+        return buffer.getvalue().encode('utf-8')
+
+
+def measure(func) -> dict:
+    """処理時間と（別に実行して）ピークメモリを計測"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'sec': elapsed, 'peak_bytes': peak, 'result': result}
+
+
+def run(counts=(20000, 100000)) -> list:
+    """件数ごとに従来の方法とストリーミングを比較"""
+    import pyarrow
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client, _ = load_app(os.path.join(tmpdir, 'bench.db'))
+
+        def stream(fmt):
+            # 受け取ったチャンクはメモリに残さずファイルに書き出す
+            path = os.path.join(tmpdir, f'export.{fmt}')
+            response = client.get(f'/history/export?format={fmt}', buffered=False)
+            with open(path, 'wb') as f:
+                for chunk in response.response:
+                    f.write(chunk)
+            response.close()
+            return path
+
+        inserted = 0
+        for count in counts:
+            insert_histories(count - inserted)
+            inserted = count
+
+            legacy = measure(legacy_export_csv)
+            results = {fmt: measure(lambda fmt=fmt: stream(fmt)) for fmt in ('csv', 'ndjson', 'arrow')}
+
+            with open(results['csv'].pop('result'), 'rb') as f:
+                if f.read() != legacy.pop('result'):
+                    raise AssertionError(f'{count}件: CSVの内容が一致しません')
+            with open(results['ndjson'].pop('result'), 'rb') as f:
+                if sum(1 for _ in f) != count:
+                    raise AssertionError(f'{count}件: NDJSONの件数が一致しません')
+            with pyarrow.OSFile(results['arrow'].pop('result'), 'rb') as f:
+                if pyarrow.ipc.open_stream(f).read_all().num_rows != count:
+                    raise AssertionError(f'{count}件: Arrow形式の件数が一致しません')
+
+            rows.append({'count': count, 'legacy': legacy, 'stream': results})
+
+    return rows
+
+
+def main() -> None:
+    """メイン処理"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [20000, 100000]
+
+    print("=" * 60)
+    print("評価履歴エクスポートのベンチマーク")
+    print("=" * 60)
+
+    for row in run(counts):
+        print(f"\n[{row['count']:,}件]（CSVの内容・NDJSON/Arrowの件数: 一致）")
+        legacy = row['legacy']
+        print(f"  従来（全件読み込み・CSV）: {legacy['sec']:7.2f} 秒, ピーク {legacy['peak_bytes'] / 1024 / 1024:8.1f} MB")
+        for fmt, measured in row['stream'].items():
+            print(f"  ストリーミング（{fmt:<6}）: {measured['sec']:7.2f} 秒, "
+                  f"ピーク {measured['peak_bytes'] / 1024 / 1024:8.1f} MB")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+評価履歴のページネーションのベンチマーク
+
+100万件の評価履歴（4ユーザー）を登録したSQLiteで、
+従来の方法（paginate: COUNT(*) + OFFSET、user_id・created_at の単独インデックス）と
+キーセット方式（(user_id, created_at, id) の複合インデックス、総件数はキャッシュ）の
+ページの深さごとの表示時間とクエリプランを比較する。
+あわせて同じページの内容が一致することを確認する。
+
+実行方法:
+    python -m benchmarks.history_pagination [件数]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.batch_valuation_api import load_app, make_properties
+
+
+USERS = 4
+PER_PAGE = 20
+LEGACY_INDEXES = [
+    'CREATE INDEX ix_valuation_history_user_id ON valuation_history (user_id)',
+]
+NEW_INDEX = 'ix_valuation_history_user_created'
+
+
+def seed(count: int) -> int:
+    """評価履歴を登録し、ベンチマーク対象のユーザーIDを返す"""
+    from app import app
+    from models import db, User, ValuationHistory
+
+    with app.app_context():
+        for i in range(1, USERS):
+            db.session.add(User(email=f'bench{i}@example.com'))
+        db.session.commit()
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+
+        # 登録中はインデックスを外し、最後に作成する
+        table = ValuationHistory.__table__
+        for index in table.indexes:
+            index.drop(bind=db.engine)
+
+        base = datetime(2020, 1, 1)
+        template = make_properties(100)
+        chunk = 50000
+        for offset in range(0, count, chunk):
+            db.session.execute(table.insert(), [
+                dict(template[i % 100], user_id=user_ids[i % USERS], land_valuation=1.0e7 + i,
+                     building_valuation=5.0e6, total_valuation=1.5e7 + i, road_price=300000.0,
+                     created_at=base + timedelta(seconds=i))
+                for i in range(offset, min(offset + chunk, count))
+            ])
+            db.session.commit()
+
+        for index in table.indexes:
+            index.create(bind=db.engine)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        return user_ids[0]
+
+
+def timed(func, repeat: int = 15):
+    """中央値の処理時間（ミリ秒）と結果"""
+    result = func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def query_plan(sql_query) -> list:
+    """SQLiteのクエリプラン"""
+    from models import db
+
+    compiled = sql_query.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+
+def run(count: int = 1000000) -> dict:
+    """ページの深さごとに従来の方法とキーセット方式を比較"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        load_app(os.path.join(tmpdir, 'bench.db'))
+        from app import app
+        from models import db, ValuationHistory
+        from pagination import encode_cursor, invalidate_count, keyset_paginate
+        from sqlalchemy import select
+
+        start = time.perf_counter()
+        user_id = seed(count)
+        seed_seconds = time.perf_counter() - start
+
+        rows_per_user = count // USERS
+        last_page = (rows_per_user + PER_PAGE - 1) // PER_PAGE
+        pages = sorted({1, min(100, last_page), max(1, last_page // 2), last_page})
+        ordered = select(ValuationHistory).where(ValuationHistory.user_id == user_id).order_by(
+            ValuationHistory.created_at.desc(), ValuationHistory.id.desc())
+
+        with app.app_context():
+            # 比較する各ページの直前の行（キーセット方式のカーソル）
+            cursors = {}
+            for page in pages:
+                if page > 1:
+                    row = db.session.execute(ordered.offset((page - 1) * PER_PAGE - 1).limit(1)).scalar_one()
+                    cursors[page] = encode_cursor(row)
+            db.session.expunge_all()
+
+            def legacy(page):
+                return lambda: [h.id for h in ValuationHistory.query.filter_by(user_id=user_id).order_by(
+                    ValuationHistory.created_at.desc()
+                ).paginate(page=page, per_page=PER_PAGE, error_out=False).items]
+
+            def keyset(page):
+                return lambda: [h.id for h in keyset_paginate(
+                    ValuationHistory, user_id, PER_PAGE, after=cursors.get(page)).items]
+
+            # 新しいスキーマ（複合インデックス）
+            new_plan = query_plan(
+                ordered.where(ValuationHistory.created_at <= datetime(2020, 1, 2)).limit(PER_PAGE + 1))
+            invalidate_count(ValuationHistory, user_id)
+            cold_count_ms, _ = timed(lambda: (invalidate_count(ValuationHistory, user_id),
+                                              keyset(1)())[1], repeat=5)
+            new = {page: timed(keyset(page)) for page in pages}
+
+            # 従来のスキーマ（user_id・created_at の単独インデックス）
+            db.session.execute(db.text(f'DROP INDEX {NEW_INDEX}'))
+            for statement in LEGACY_INDEXES:
+                db.session.execute(db.text(statement))
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+            # EXPLAIN QUERY PLAN はスキーマの変更を確認しないため、古いスキーマを持つ接続を破棄する
+            db.engine.dispose()
+            legacy_plan = query_plan(
+                select(ValuationHistory).where(ValuationHistory.user_id == user_id)
+                .order_by(ValuationHistory.created_at.desc()).limit(PER_PAGE).offset(PER_PAGE * (last_page - 1)))
+            old = {page: timed(legacy(page), repeat=5) for page in pages}
+
+        for page in pages:
+            if old[page][1] != new[page][1]:
+                raise AssertionError(f'{page}ページ目の内容が一致しません')
+
+    return {
+        'count': count,
+        'seed_seconds': seed_seconds,
+        'rows_per_user': rows_per_user,
+        'pages': [{'page': page, 'legacy_ms': old[page][0], 'keyset_ms': new[page][0]} for page in pages],
+        'cold_count_ms': cold_count_ms,
+        'legacy_plan': legacy_plan,
+        'keyset_plan': new_plan,
+    }
+
+
+def main() -> None:
+    """メイン処理"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    print("=" * 60)
+    print(f"評価履歴のページネーションのベンチマーク（{count:,}件）")
+    print("=" * 60)
+
+    result = run(count)
+    print(f"登録: {result['seed_seconds']:.1f}秒、1ユーザーあたり {result['rows_per_user']:,}件")
+    print("-" * 60)
+    print(f"{'ページ':>8} {'従来(OFFSET+COUNT)':>20} {'キーセット':>12}")
+    for row in result['pages']:
+        print(f"{row['page']:>8} {row['legacy_ms']:>17.2f} ms {row['keyset_ms']:>9.2f} ms")
+    print(f"（キーセット方式で総件数を数え直す場合の1ページ目: {result['cold_count_ms']:.2f} ms）")
+    print("-" * 60)
+    print("従来のクエリプラン（最終ページ）:")
+    for line in result['legacy_plan']:
+        print(f"  {line}")
+    print("キーセット方式のクエリプラン:")
+    for line in result['keyset_plan']:
+        print(f"  {line}")
+    print("-" * 60)
+    print("各ページの内容: 一致")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+評価履歴の遅延書き込み（グループコミット）のベンチマーク
+
+/api/valuate を、評価履歴を1件ずつコミットする従来の方法と、
+遅延書き込み（VALUATION_HISTORY_WRITE_BEHIND=1）で呼び出した場合の1秒あたりの書き込み件数を、
+プロセス数（gunicornのワーカー数に相当）ごとに比較する。
+各プロセスは同じSQLiteファイルに同時に書き込み、処理時間には終了時の書き込み（close）を含める。
+あわせてレスポンスのIDがすべてデータベースに保存されていることを確認する。
+
+実行方法:
+    python -m benchmarks.history_write_behind [1プロセスあたりの件数]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.batch_valuation_api import load_app, make_properties
+
+
+def worker(database_path: str, write_behind: bool, number: int, count: int, barrier, queue) -> None:
+    """1つのワーカープロセス: /api/valuate を count 回呼び出す"""
+    os.environ['VALUATION_HISTORY_WRITE_BEHIND'] = '1' if write_behind else '0'
+    client, _ = load_app(database_path, email=f'bench{number}@example.com')
+    from app import app
+    from history_buffer import get_default_buffer
+
+    properties = make_properties(count, seed=number)
+    barrier.wait()
+    start = time.perf_counter()
+    ids = [client.post('/api/valuate', json=item).get_json()['result']['id'] for item in properties]
+    history_buffer = get_default_buffer(app)
+    if history_buffer is not None:
+        history_buffer.close()
+    queue.put((time.perf_counter() - start, ids))
+
+
+def saved_ids(database_path: str) -> list:
+    """データベースに保存された評価履歴のID"""
+    import sqlite3
+
+    with sqlite3.connect(database_path) as connection:
+        return [row[0] for row in connection.execute('SELECT id FROM valuation_history')]
+
+
+def run(count: int = 500, process_counts=(1, 3)) -> list:
+    """書き込み方法・プロセス数ごとに1秒あたりの書き込み件数を計測"""
+    context = multiprocessing.get_context('fork')
+    rows = []
+    for processes in process_counts:
+        for write_behind in (False, True):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                database_path = os.path.join(tmpdir, 'bench.db')
+                # スキーマは先に1つのプロセスで作成しておく
+                setup = context.Process(target=load_app, args=(database_path,))
+                setup.start()
+                setup.join()
+
+                barrier = context.Barrier(processes)
+                queue = context.Queue()
+                workers = [
+                    context.Process(target=worker, args=(database_path, write_behind, number, count, barrier, queue))
+                    for number in range(1, processes + 1)
+                ]
+                for process in workers:
+                    process.start()
+                results = [queue.get() for _ in workers]
+                for process in workers:
+                    process.join()
+
+                returned = [history_id for _, ids in results for history_id in ids]
+                saved = saved_ids(database_path)
+                if len(set(returned)) != processes * count or sorted(returned) != sorted(saved):
+                    raise AssertionError('レスポンスのIDと保存された評価履歴が一致しません')
+
+            elapsed = max(sec for sec, _ in results)
+            rows.append({
+                'processes': processes,
+                'write_behind': write_behind,
+                'sec': elapsed,
+                'writes_per_sec': processes * count / elapsed,
+            })
+    return rows
+
+
+def main() -> None:
+    """メイン処理"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    print("=" * 60)
+    print(f"評価履歴の遅延書き込みのベンチマーク（1プロセスあたり {count:,}件）")
+    print("=" * 60)
+
+    baseline = {}
+    for row in run(count):
+        mode = '遅延書き込み' if row['write_behind'] else '1件ずつコミット'
+        if not row['write_behind']:
+            baseline[row['processes']] = row['sec']
+        print(f"{row['processes']}プロセス {mode:<10} {row['sec']:8.3f} 秒  {row['writes_per_sec']:8,.0f} 件/秒  "
+              f"{baseline[row['processes']] / row['sec']:5.1f}x")
+
+    print("-" * 60)
+    print("レスポンスのIDと保存された評価履歴: 一致")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
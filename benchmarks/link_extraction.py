@@ -0,0 +1,133 @@
+"""
+リンク抽出のベンチマーク
+
+ページ全体をBeautifulSoupで解析してから <a> をたどる従来の方法と、
+link_extractor.extract_links（<a> のタグだけを正規表現で走査する）の
+1ページあたりの処理時間とピークメモリ（tracemalloc）を比較する。
+あわせて両者の結果が一致することを確認する。
+
+入力は fixtures/nta/ の保存済みページと、町名ごとに路線価図へのリンクが並ぶ
+市区町村ページを想定した大きなページ（Shift_JIS）。
+
+実行方法:
+    python -m benchmarks.link_extraction
+"""
+import os
+import time
+import tracemalloc
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from link_extractor import extract_links
+from nta_fixture_server import DEFAULT_FIXTURE_DIR
+
+
+def legacy_extract_links(html: bytes, page_url: str) -> list:
+    """従来の方法: ページ全体の木構造を作ってから <a> をたどる"""
+    soup = BeautifulSoup(html, 'html.parser')
+    return [
+        (link.get_text(strip=True), urljoin(page_url, link['href']))
+        for link in soup.find_all('a', href=True)
+    ]
+
+
+def make_city_page(towns: int = 600) -> bytes:
+    """町名ごとに路線価図（複数枚）へのリンクが並ぶ市区町村ページを作成"""
+    rows = []
+    for i in range(towns):
+        sheets = ''.join(
+            f'<td class="map"><a href="../../prices/html/{13000 + i * 3 + j:05d}f.htm" target="_blank">'
+            f'{13000 + i * 3 + j:05d}</a></td>'
+            for j in range(3)
+        )
+        rows.append(
+            f'<tr><td class="town"><span>千代田区 町名{i}丁目</span></td>'
+            f'<td class="kana">ちよだく ちょうめい{i}</td>{sheets}'
+            f'<td class="note">&nbsp;<!-- 備考 --></td></tr>'
+        )
+    html = (
+        '<!DOCTYPE html><html lang="ja"><head>'
+        '<meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS">'
+        '<title>千代田区 路線価図</title></head><body>'
+        '<h1>路線価図（千代田区）</h1><table summary="町名一覧">'
+        + '\n'.join(rows)
+        + '</table><p><a href="city_frm.htm">戻る</a> <a href="../../../index.htm">トップ</a></p></body></html>'
+    )
+    return html.encode('cp932')
+
+
+def load_pages() -> dict:
+    """ベンチマーク用のページ（{名前: (バイト列, URL)}）"""
+    pages = {}
+    for dirpath, _, filenames in os.walk(DEFAULT_FIXTURE_DIR):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, DEFAULT_FIXTURE_DIR).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                pages[relative] = (f.read(), f'https://www.rosenka.nta.go.jp/{relative}')
+    pages['市区町村ページ（600町名）'] = (
+        make_city_page(), 'https://www.rosenka.nta.go.jp/main_r06/tokyo/tokyo/prices/c13101rf.htm'
+    )
+    return pages
+
+
+def measure(func, html: bytes, url: str, min_seconds: float = 0.3) -> dict:
+    """1ページあたりの処理時間とピークメモリを計測"""
+    func(html, url)  # ウォームアップ
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        func(html, url)
+        count += 1
+    elapsed = (time.perf_counter() - start) / count
+
+    tracemalloc.start()
+    func(html, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'sec': elapsed, 'peak_bytes': peak}
+
+
+def run() -> list:
+    """ページごとに従来の方法と現在の方法を比較"""
+    results = []
+    for name, (html, url) in load_pages().items():
+        expected = legacy_extract_links(html, url)
+        actual = extract_links(html, url)
+        if expected != actual:
+            raise AssertionError(f'{name}: 抽出結果が一致しません')
+
+        legacy = measure(legacy_extract_links, html, url)
+        current = measure(extract_links, html, url)
+        results.append({
+            'page': name,
+            'bytes': len(html),
+            'links': len(actual),
+            'legacy': legacy,
+            'current': current,
+            'speedup': legacy['sec'] / current['sec'],
+        })
+    return results
+
+
+def main() -> None:
+    """メイン処理"""
+    print("=" * 60)
+    print("リンク抽出ベンチマーク")
+    print("=" * 60)
+
+    for row in run():
+        print(f"\n[{row['page']}] {row['bytes']:,}バイト / リンク{row['links']}件（結果一致）")
+        print(f"  従来（BeautifulSoup）: {row['legacy']['sec'] * 1000:.2f} ms, "
+              f"ピーク {row['legacy']['peak_bytes'] / 1024:,.0f} KB")
+        print(f"  現在（link_extractor）: {row['current']['sec'] * 1000:.2f} ms, "
+              f"ピーク {row['current']['peak_bytes'] / 1024:,.0f} KB")
+        print(f"  高速化: {row['speedup']:.1f}x")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
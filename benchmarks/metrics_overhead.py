@@ -0,0 +1,104 @@
+"""
+処理時間のメトリクスのオーバーヘッドのベンチマーク
+
+1回の記録（Metrics.observe・stage）にかかる時間と、/api/valuate を
+メトリクスなし（METRICS_ENABLED=0）・あり（デフォルト）で呼び出した場合の
+1秒あたりの処理件数を比較する。各設定は別のプロセスで交互に実行し、最も速い回を使う。
+
+実行方法:
+    python -m benchmarks.metrics_overhead [件数]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.batch_valuation_api import load_app, make_properties
+
+
+def api_worker(database_path: str, metrics_dir: str, enabled: bool, count: int, queue) -> None:
+    """/api/valuate を count 回呼び出し、1秒あたりの処理件数を返す"""
+    os.environ['METRICS_ENABLED'] = '1' if enabled else '0'
+    os.environ['METRICS_DIR'] = metrics_dir
+    client, _ = load_app(database_path, email=f'bench-{os.getpid()}@example.com')
+    properties = make_properties(count)
+    client.post('/api/valuate', json=properties[0])
+
+    start = time.perf_counter()
+    for item in properties:
+        client.post('/api/valuate', json=item)
+    queue.put(count / (time.perf_counter() - start))
+
+
+def observe_cost(metrics_dir: str, count: int = 200000) -> dict:
+    """1回の記録にかかる時間（マイクロ秒）"""
+    flask_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app')
+    if flask_dir not in sys.path:
+        sys.path.append(flask_dir)
+    from metrics import STAGE_METRIC, Metrics
+
+    metrics = Metrics(metrics_dir)
+    labels = (('route', '/api/valuate'), ('stage', 'valuation'))
+    start = time.perf_counter()
+    for i in range(count):
+        metrics.observe(STAGE_METRIC, labels, i * 1e-6)
+    observe_us = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    metrics.collect()
+    collect_ms = (time.perf_counter() - start) * 1000
+    return {'observe_us': observe_us, 'collect_ms': collect_ms}
+
+
+def run(count: int = 1000, rounds: int = 3) -> dict:
+    """記録1回の時間と、メトリクスなし・ありの /api/valuate の処理件数を計測"""
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_path = os.path.join(tmpdir, 'bench.db')
+        metrics_dir = os.path.join(tmpdir, 'metrics')
+        setup = context.Process(target=load_app, args=(database_path,))
+        setup.start()
+        setup.join()
+
+        throughput = {False: [], True: []}
+        for _ in range(rounds):
+            for enabled in (False, True):
+                queue = context.Queue()
+                process = context.Process(target=api_worker,
+                                          args=(database_path, metrics_dir, enabled, count, queue))
+                process.start()
+                throughput[enabled].append(queue.get())
+                process.join()
+
+        cost = observe_cost(os.path.join(tmpdir, 'observe'))
+
+    disabled, enabled = max(throughput[False]), max(throughput[True])
+    return {
+        'disabled_per_sec': disabled,
+        'enabled_per_sec': enabled,
+        'overhead_percent': (disabled / enabled - 1) * 100,
+        **cost,
+    }
+
+
+def main() -> None:
+    """メイン処理"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    print("=" * 60)
+    print(f"メトリクスのオーバーヘッドのベンチマーク（/api/valuate {count:,}件 × 3回）")
+    print("=" * 60)
+
+    result = run(count)
+    print(f"記録1回（observe）            {result['observe_us']:8.2f} マイクロ秒")
+    print(f"/metrics の合算（collect）    {result['collect_ms']:8.2f} ミリ秒")
+    print("-" * 60)
+    print(f"メトリクスなし                {result['disabled_per_sec']:8,.0f} 件/秒")
+    print(f"メトリクスあり                {result['enabled_per_sec']:8,.0f} 件/秒")
+    print(f"オーバーヘッド                {result['overhead_percent']:8.1f} %")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+合成コーパスでのOCR・解析の速度と項目ごとの精度
+
+ocr_corpus.py で作成した画像を extract_text_from_image（結果のキャッシュなし）と
+parse_property_info で処理し、1秒あたりの処理枚数と処理時間（中央値・95パーセンタイル）、
+項目ごとの正解率、条件（レイアウト・建築年の書き方・全角数字・傾きなど）ごとの全項目の正解率を表示する。
+
+--workers 個のスレッドから同時に処理する。OCRは常駐ワーカープール（OCR_POOL_SIZE を --workers に合わせる）
+またはtesseractのプロセスで実行されるため、複数のCPUコアを使う。
+--text-only では画像を使わず、描画したテキストをそのまま解析する（Tesseractのない環境でも
+全角数字や和暦などの書き方による解析の失敗を確認できる）。
+
+実行方法:
+    python ocr_corpus.py data/ocr_corpus --count 2000
+    python -m benchmarks.ocr_corpus data/ocr_corpus [--workers 4] [--limit 500] [--output 結果.json]
+
+    # 一時ディレクトリにコーパスを作成して計測する
+    python -m benchmarks.ocr_corpus --generate 200
+    python -m benchmarks.ocr_corpus --generate 2000 --text-only
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytesseract
+
+import ocr_engine
+from ocr_cache import OCRCache
+from ocr_corpus import FIELDS, field_matches, generate_corpus, load_labels
+from ocr_engine import create_engine
+from ocr_utils import extract_text_from_image
+from text_parser import parse_property_info
+
+
+def _bucket(name: str, value):
+    """条件の値を表示用にまとめる（連続値は区間にする）"""
+    if name == 'rotation':
+        return '0' if not value else ('<1.5°' if abs(value) < 1.5 else '≥1.5°')
+    if name == 'blur':
+        return '0' if not value else ('<1.0' if value < 1.0 else '≥1.0')
+    if name == 'noise':
+        return '0' if not value else ('<15' if value < 15 else '≥15')
+    if name == 'separator' and value == ' ':
+        return '空白'
+    return str(value)
+
+
+BREAKDOWN = ['layout', 'year_format', 'full_width', 'separator', 'unit', 'rotation', 'blur', 'noise', 'dpi',
+             'format', 'font']
+
+
+def process_document(label: dict, corpus_dir: str, engine=None, cache=None, lang: str = 'jpn+eng') -> dict:
+    """
+    1枚を処理して正解と比べる
+
+    engine を省略した場合は画像を使わず、ラベルの描画したテキストを解析する。
+    """
+    timings = defaultdict(float)
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    error = None
+    if engine is None:
+        text = label['text']
+    else:
+        text = extract_text_from_image(os.path.join(corpus_dir, label['file']), lang=lang, engine=engine,
+                                       cache=cache, stage_timer=stage)
+        if text.startswith('エラーが発生しました'):
+            error = text
+    with stage('parse'):
+        parsed = parse_property_info(text)
+
+    return {
+        'file': label['file'],
+        'variation': label['variation'],
+        'matches': {name: field_matches(name, label['truth'][name], parsed.get(name)) for name in FIELDS},
+        'seconds': time.perf_counter() - start,
+        'timings': dict(timings),
+        'error': error,
+    }
+
+
+def run(labels: list, corpus_dir: str, workers: int = None, text_only: bool = False,
+        lang: str = 'jpn+eng') -> dict:
+    """コーパスの全画像を workers 個のスレッドで処理し、集計した結果を返す"""
+    workers = workers or os.cpu_count() or 1
+    engine = cache = None
+    if not text_only:
+        # 常駐ワーカープールのワーカー数を同時に処理する数に合わせる
+        os.environ.setdefault('OCR_POOL_SIZE', str(workers))
+        engine = create_engine()
+        cache = OCRCache(max_entries=0)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda label: process_document(label, corpus_dir, engine, cache, lang), labels
+            ))
+        elapsed = time.perf_counter() - start
+    finally:
+        if engine is not None:
+            engine.shutdown()
+
+    return summarize(results, elapsed, workers, 'text' if text_only else 'ocr')
+
+
+def summarize(results: list, elapsed: float, workers: int, mode: str) -> dict:
+    """処理枚数・時間・項目ごとの正解率と、条件ごとの全項目の正解率をまとめる"""
+    count = len(results)
+    seconds = sorted(row['seconds'] for row in results)
+    stages = sorted({name for row in results for name in row['timings']})
+
+    by_variation = {}
+    for name in BREAKDOWN:
+        groups = defaultdict(list)
+        for row in results:
+            groups[_bucket(name, row['variation'].get(name))].append(all(row['matches'].values()))
+        by_variation[name] = {
+            value: {'docs': len(flags), 'all_fields': sum(flags) / len(flags)}
+            for value, flags in sorted(groups.items())
+        }
+
+    return {
+        'mode': mode,
+        'workers': workers,
+        'docs': count,
+        'errors': sum(1 for row in results if row['error']),
+        'first_error': next((row['error'] for row in results if row['error']), None),
+        'elapsed_sec': elapsed,
+        'docs_per_sec': count / elapsed if elapsed else None,
+        'median_ms': statistics.median(seconds) * 1000 if seconds else None,
+        'p95_ms': seconds[int(0.95 * (count - 1))] * 1000 if seconds else None,
+        'stage_mean_ms': {name: sum(row['timings'].get(name, 0) for row in results) / count * 1000
+                          for name in stages},
+        'field_accuracy': {name: sum(row['matches'][name] for row in results) / count if count else None
+                           for name in FIELDS},
+        'all_fields': sum(all(row['matches'].values()) for row in results) / count if count else None,
+        'by_variation': by_variation,
+    }
+
+
+def tesseract_available() -> bool:
+    """OCRを実行できるか（tesserocr または tesseract コマンドがあるか）"""
+    return ocr_engine.tesserocr is not None or shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def main() -> None:
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='合成コーパスでのOCR・解析の速度と精度')
+    parser.add_argument('corpus_dir', nargs='?', help='ocr_corpus.py で作成したコーパス')
+    parser.add_argument('--generate', type=int, metavar='N', help='一時ディレクトリにN枚のコーパスを作成して計測する')
+    parser.add_argument('--seed', type=int, default=0, help='--generate の乱数のシード')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='同時に処理する数（デフォルト: CPU数）')
+    parser.add_argument('--limit', type=int, help='先頭から処理する枚数')
+    parser.add_argument('--text-only', action='store_true', help='OCRを使わず描画したテキストを解析する')
+    parser.add_argument('--lang', default='jpn+eng', help='Tesseractの言語（デフォルト: jpn+eng）')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    args = parser.parse_args()
+
+    if not args.corpus_dir and not args.generate:
+        parser.error('コーパスのディレクトリか --generate を指定してください')
+    if not args.text_only and not tesseract_available():
+        print('Tesseractがインストールされていません（--text-only で解析だけを計測できます）', file=sys.stderr)
+        sys.exit(1)
+
+    print("=" * 60)
+    print("合成コーパスでのOCR・解析のベンチマーク")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corpus_dir = args.corpus_dir or tmpdir
+        if args.generate:
+            start = time.perf_counter()
+            generate_corpus(corpus_dir, args.generate, args.seed, args.workers)
+            print(f"コーパスを作成しました: {args.generate:,}枚（{time.perf_counter() - start:.1f}秒）")
+
+        labels = load_labels(corpus_dir)[:args.limit]
+        if not args.text_only and all(label['variation']['font'] == 'default' for label in labels):
+            print('⚠ 日本語フォントで描画されていないため、OCRの正解率は参考になりません')
+        result = run(labels, corpus_dir, args.workers, args.text_only, args.lang)
+
+    print(f"方式: {'テキストの解析のみ' if result['mode'] == 'text' else 'OCR+解析'}"
+          f"（{result['workers']}並列）")
+    print(f"処理枚数: {result['docs']:,}枚 / {result['elapsed_sec']:.2f}秒 = {result['docs_per_sec']:.1f}枚/秒")
+    print(f"1枚の処理時間: 中央値 {result['median_ms']:.2f}ms / 95%: {result['p95_ms']:.2f}ms  "
+          + ' '.join(f"{name} {ms:.2f}ms" for name, ms in result['stage_mean_ms'].items()))
+    if result['errors']:
+        print(f"OCRのエラー: {result['errors']:,}枚（{result['first_error'][:200]}）")
+
+    print("-" * 60)
+    print("項目ごとの正解率")
+    for name, accuracy in result['field_accuracy'].items():
+        print(f"  {name:<20} {accuracy * 100:6.1f}%")
+    print(f"  {'（全項目）':<18} {result['all_fields'] * 100:6.1f}%")
+
+    print("-" * 60)
+    print("条件ごとの全項目の正解率")
+    for name, groups in result['by_variation'].items():
+        cells = '  '.join(f"{value}: {row['all_fields'] * 100:.0f}%（{row['docs']}）" for value, row in groups.items())
+        print(f"  {name:<12} {cells}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print("-" * 60)
+        print(f"結果を保存しました: {args.output}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
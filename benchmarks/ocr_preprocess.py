@@ -0,0 +1,111 @@
+"""
+OCR前処理のベンチマーク
+
+前処理の設定ごとに、前処理時間・OCR時間と
+text_parser.parse_property_info で抽出できた項目の割合を比較する。
+
+入力画像は create_test_image.py のサンプルと、それを拡大して余白を付けた
+「スマートフォン撮影相当」のJPEG（約6000px）の2種類。
+
+実行方法:
+    python -m benchmarks.ocr_preprocess
+"""
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from create_test_image import create_property_image
+from ocr_engine import get_default_engine
+from ocr_preprocess import PreprocessConfig, preprocess_image
+from text_parser import parse_property_info
+
+
+CONFIGS = {
+    'なし（RGB変換のみ）': PreprocessConfig(enabled=False),
+    '縮小のみ': PreprocessConfig(grayscale=False, binarize=False, crop_borders=False),
+    '縮小+グレースケール': PreprocessConfig(binarize=False, crop_borders=False),
+    '縮小+グレースケール+余白除去': PreprocessConfig(binarize=False),
+    'すべて（デフォルト）': PreprocessConfig(),
+}
+
+
+def make_samples() -> dict:
+    """ベンチマーク用の画像（バイト列）を作成"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'sample_property.png')
+        create_property_image(path)
+        with open(path, 'rb') as f:
+            clean = f.read()
+
+    # スマートフォンで撮影した写真を想定し、拡大して背景色の余白を付ける
+    sheet = Image.open(io.BytesIO(clean)).convert('RGB').resize((6000, 4500))
+    photo = Image.new('RGB', (6400, 4900), (230, 225, 220))
+    photo.paste(sheet, (200, 200))
+    buffer = io.BytesIO()
+    photo.save(buffer, 'JPEG', quality=90)
+
+    return {'sample_property.png': clean, 'phone_photo.jpg': buffer.getvalue()}
+
+
+def run(lang: str = 'jpn+eng', ocr: bool = True) -> list:
+    """設定ごとの処理時間とパース成功率を計測"""
+    engine = get_default_engine()
+    results = []
+
+    for image_name, image_bytes in make_samples().items():
+        for config_name, config in CONFIGS.items():
+            start = time.perf_counter()
+            image, timings = preprocess_image(Image.open(io.BytesIO(image_bytes)), config)
+            preprocess_sec = time.perf_counter() - start
+
+            row = {
+                'image': image_name,
+                'config': config_name,
+                'size': image.size,
+                'preprocess_sec': preprocess_sec,
+                'timings': timings,
+                'ocr_sec': None,
+                'parsed_fields': None,
+            }
+
+            if ocr:
+                start = time.perf_counter()
+                text = engine.image_to_string(image, lang)
+                row['ocr_sec'] = time.perf_counter() - start
+                parsed = parse_property_info(text)
+                row['parsed_fields'] = sum(1 for v in parsed.values() if v is not None)
+
+            results.append(row)
+
+    return results
+
+
+def main() -> None:
+    """メイン処理"""
+    print("=" * 60)
+    print("OCR前処理ベンチマーク")
+    print("=" * 60)
+
+    try:
+        results = run()
+    except Exception as e:
+        print(f"OCRを実行できないため前処理のみ計測します: {e}")
+        results = run(ocr=False)
+
+    for row in results:
+        stages = ', '.join(f"{name}={sec * 1000:.1f}ms" for name, sec in row['timings'].items())
+        print(f"\n[{row['image']}] {row['config']}")
+        print(f"  サイズ: {row['size'][0]}x{row['size'][1]}px")
+        print(f"  前処理: {row['preprocess_sec'] * 1000:.1f} ms ({stages})")
+        if row['ocr_sec'] is not None:
+            print(f"  OCR: {row['ocr_sec'] * 1000:.1f} ms")
+            print(f"  抽出できた項目: {row['parsed_fields']}/5")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
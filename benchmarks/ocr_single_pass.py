@@ -0,0 +1,81 @@
+"""
+OCR 1パス化のベンチマーク
+
+従来の2パス（image_to_data + image_to_string）と、
+image_to_dataのみからテキストを再構成する1パス方式の処理時間を比較する。
+
+実行方法:
+    python -m benchmarks.ocr_single_pass [繰り返し回数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pytesseract
+from PIL import Image
+
+from create_test_image import create_property_image
+from ocr_utils import build_text_from_data
+
+
+def two_pass(image: Image.Image, lang: str) -> str:
+    """従来方式: 信頼度とテキストを別々のOCRで取得"""
+    pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+    return pytesseract.image_to_string(image, lang=lang).strip()
+
+
+def single_pass(image: Image.Image, lang: str) -> str:
+    """新方式: image_to_dataの結果からテキストを再構成"""
+    data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+    return build_text_from_data(data)
+
+
+def measure(func, image: Image.Image, lang: str, repeat: int) -> float:
+    """平均処理時間（秒）を計測"""
+    func(image, lang)  # ウォームアップ
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(image, lang)
+    return (time.perf_counter() - start) / repeat
+
+
+def run(repeat: int = 5, lang: str = 'jpn+eng') -> dict:
+    """サンプル画像で2パス/1パスを比較"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        image_path = os.path.join(tmpdir, 'sample_property.png')
+        create_property_image(image_path)
+        image = Image.open(image_path).convert('RGB')
+
+        two_pass_sec = measure(two_pass, image, lang, repeat)
+        single_pass_sec = measure(single_pass, image, lang, repeat)
+
+    return {
+        'two_pass_sec': two_pass_sec,
+        'single_pass_sec': single_pass_sec,
+        'speedup': two_pass_sec / single_pass_sec if single_pass_sec else 0,
+    }
+
+
+def main() -> None:
+    """メイン処理"""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 60)
+    print("OCR 1パス化ベンチマーク")
+    print("=" * 60)
+
+    try:
+        result = run(repeat)
+    except pytesseract.TesseractNotFoundError:
+        print("Tesseractがインストールされていないため計測できません")
+        return
+
+    print(f"2パス（従来）: {result['two_pass_sec'] * 1000:.1f} ms/画像")
+    print(f"1パス（新方式）: {result['single_pass_sec'] * 1000:.1f} ms/画像")
+    print(f"高速化: {result['speedup']:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+路線価インデックスのベンチマーク
+
+丁目単位の地域を登録した合成データでインデックスを作成し、
+作成時間・ファイルサイズ・オープン時間と、1件あたりの検索レイテンシを計測する。
+
+実行方法:
+    python -m benchmarks.rosenka_lookup [地域数]
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from rosenka_index import RosenkaIndex
+
+
+PREFECTURES = ['東京都', '大阪府', '神奈川県', '愛知県', '福岡県', '北海道', '京都府', '兵庫県']
+KANJI_NUMBERS = ['一', '二', '三', '四', '五', '六', '七', '八', '九']
+
+
+def make_records(areas: int, seed: int = 0) -> list:
+    """「都道府県+市区+町名+丁目」の地域と路線価（円/㎡）を作成"""
+    rng = random.Random(seed)
+    records = []
+    city = town = 0
+    while len(records) < areas:
+        prefecture = PREFECTURES[city % len(PREFECTURES)]
+        for chome in range(1, rng.randint(2, 9)):
+            records.append((f'{prefecture}第{city}市第{town}町{chome}丁目', rng.randint(10, 5000) * 1000))
+        town += 1
+        if town % 50 == 0:
+            city += 1
+    return records[:areas]
+
+
+def make_queries(records: list, count: int, seed: int = 1) -> list:
+    """登録地域内の番地（表記揺れを含む）と未登録の所在地を作成"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        area, _ = rng.choice(records)
+        if i % 10 == 0:
+            queries.append(area.replace('町', '村'))  # 未登録
+        elif i % 2 == 0:
+            queries.append(f'{area}{rng.randint(1, 30)}番{rng.randint(1, 20)}号')
+        else:
+            # 漢数字の丁目・全角ハイフン
+            town, chome = re.match(r'(.*町)([0-9]+)丁目$', area).groups()
+            queries.append(f'{town}{KANJI_NUMBERS[int(chome) - 1]}丁目{rng.randint(1, 30)}－{rng.randint(1, 20)}')
+    return queries
+
+
+def run(areas: int = 200_000, lookups: int = 20_000) -> dict:
+    """インデックスの作成・オープン・検索を計測"""
+    records = make_records(areas)
+    queries = make_queries(records, lookups)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'rosenka.idx')
+
+        start = time.perf_counter()
+        count = RosenkaIndex.build(records, path)
+        build_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = RosenkaIndex(path)
+        open_sec = time.perf_counter() - start
+
+        latencies = []
+        hits = 0
+        for address in queries:
+            start = time.perf_counter()
+            price = index.lookup(address)
+            latencies.append(time.perf_counter() - start)
+            hits += price is not None
+
+        result = {
+            'areas': count,
+            'file_bytes': os.path.getsize(path),
+            'build_sec': build_sec,
+            'open_sec': open_sec,
+            'lookups': len(queries),
+            'hit_rate': hits / len(queries),
+        }
+        index.close()
+
+    latencies.sort()
+    result['mean_us'] = sum(latencies) / len(latencies) * 1e6
+    result['p50_us'] = latencies[len(latencies) // 2] * 1e6
+    result['p99_us'] = latencies[int(len(latencies) * 0.99)] * 1e6
+    return result
+
+
+def main() -> None:
+    """メイン処理"""
+    areas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    print("=" * 60)
+    print("路線価インデックス ベンチマーク")
+    print("=" * 60)
+
+    result = run(areas)
+    print(f"地域数: {result['areas']:,}")
+    print(f"ファイルサイズ: {result['file_bytes'] / 1048576:.1f} MB")
+    print(f"作成: {result['build_sec']:.2f} 秒")
+    print(f"オープン: {result['open_sec'] * 1000:.2f} ms")
+    print(f"検索: {result['lookups']:,}件（ヒット率 {result['hit_rate']:.0%}）")
+    print(f"  平均: {result['mean_us']:.1f} µs")
+    print(f"  p50:  {result['p50_us']:.1f} µs")
+    print(f"  p99:  {result['p99_us']:.1f} µs")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+性能のベンチマークスイート（結果をJSONで保存し、基準の結果と比較する）
+
+テキストの解析・評価額の計算・OCR・評価APIの代表的な処理の1回あたりの時間を計測する。
+
+- parser.small / parser.large: parse_property_info（1ページの物件概要 / 30ページ分のOCRテキスト）
+- valuation.land / valuation.building: 1件の土地・建物の評価額の計算（路線価の検索を含む）
+- ocr.preprocess: create_test_image.py の画像の読み込み・前処理
+- ocr.extract: 同じ画像のOCR（キャッシュなし。Tesseractがない環境では省略）
+- api.valuate: Flaskのテストクライアントで /api/valuate（一時ディレクトリのSQLite）
+
+計測を安定させるため、各処理はウォームアップの後、1回分が --round-seconds 以上になるように
+繰り返し回数を決め、その回数の計測を --repeat 回行う（計測中はGCを止める）。
+これを --processes 個の新しいプロセスで順に行い、すべての計測の中央値を使う。
+--compare で基準の結果を指定すると、中央値が --threshold より遅くなった処理を回帰として表示し、
+終了コードを1にする（CIで使える）。結果は同じマシンで取った基準とだけ比較する。
+
+実行方法:
+    python -m benchmarks.suite [--output 結果.json] [--compare 基準.json] [--filter parser]
+
+    # 基準を保存してから、変更後に比較する
+    python -m benchmarks.suite --output data/benchmarks/baseline.json
+    python -m benchmarks.suite --compare data/benchmarks/baseline.json
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Skip(Exception):
+    """この環境では計測できない処理"""
+
+
+def parser_case(pages: int):
+    """parse_property_info（pages=0 は1ページの物件概要のみ）"""
+    from benchmarks.text_parser import SHEET, make_long_text
+    from text_parser import parse_property_info
+
+    text = make_long_text(pages) if pages else SHEET
+    result = parse_property_info(text)
+    if result.get('address') != '東京都渋谷区渋谷1-1-1' or result.get('land_area') != 150.5:
+        raise AssertionError(f'解析結果が正しくありません: {result}')
+    return lambda: parse_property_info(text)
+
+
+def valuation_case(kind: str):
+    """1件の土地（路線価の検索を含む）・建物の評価額の計算"""
+    from property_data import PropertyData
+    from valuation import calculate_building_valuation, calculate_land_valuation
+
+    data = PropertyData(
+        address='東京都渋谷区渋谷1-1-1', land_area=150.5, total_floor_area=200.0,
+        building_structure='鉄筋コンクリート造', build_year=2015
+    )
+    func = calculate_land_valuation if kind == 'land' else calculate_building_valuation
+    if not func(data) > 0:
+        raise AssertionError('評価額が正しくありません')
+    return lambda: func(data)
+
+
+def _sample_image_bytes(workdir: str) -> bytes:
+    """create_test_image.py の物件情報画像（PNG）"""
+    from contextlib import redirect_stdout
+
+    from create_test_image import create_property_image
+
+    path = os.path.join(workdir, 'sample_property.png')
+    with redirect_stdout(io.StringIO()):
+        create_property_image(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def ocr_preprocess_case(workdir: str):
+    """画像の読み込みとOCR用の前処理"""
+    from PIL import Image
+
+    from ocr_preprocess import PreprocessConfig, preprocess_image
+
+    image_bytes = _sample_image_bytes(workdir)
+    config = PreprocessConfig.from_env()
+
+    def func():
+        image, _ = preprocess_image(Image.open(io.BytesIO(image_bytes)), config)
+        image.load()
+        return image
+
+    return func
+
+
+def ocr_extract_case(workdir: str):
+    """OCR（結果のキャッシュを使わない）"""
+    import pytesseract
+
+    import ocr_engine
+    from ocr_cache import OCRCache
+    from ocr_utils import extract_text_from_image
+
+    if ocr_engine.tesserocr is None and shutil.which(pytesseract.pytesseract.tesseract_cmd) is None:
+        raise Skip('Tesseractがインストールされていません')
+
+    image_bytes = _sample_image_bytes(workdir)
+    cache = OCRCache(max_entries=0)
+    text = extract_text_from_image(image_bytes, cache=cache)
+    if text.startswith('エラーが発生しました'):
+        raise Skip(text)
+    return lambda: extract_text_from_image(image_bytes, cache=cache)
+
+
+def api_valuate_case(workdir: str):
+    """/api/valuate（評価・評価履歴の保存を含む）"""
+    # 計測中にメトリクスのファイルやリクエストのログを書き出さない
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('REQUEST_LOG_ENABLED', '0')
+    from benchmarks.batch_valuation_api import load_app, make_properties
+
+    client, _ = load_app(os.path.join(workdir, 'bench.db'))
+    item = make_properties(1)[0]
+    response = client.post('/api/valuate', json=item)
+    if response.status_code != 200 or not response.get_json()['success']:
+        raise AssertionError(f'/api/valuate が失敗しました: {response.get_data(as_text=True)}')
+
+    def func():
+        client.post('/api/valuate', json=item).close()
+
+    return func
+
+
+# (名前, 作業ディレクトリを受け取り、計測する処理を返す関数)
+CASES = [
+    ('parser.small', lambda workdir: parser_case(0)),
+    ('parser.large', lambda workdir: parser_case(30)),
+    ('valuation.land', lambda workdir: valuation_case('land')),
+    ('valuation.building', lambda workdir: valuation_case('building')),
+    ('ocr.preprocess', ocr_preprocess_case),
+    ('ocr.extract', ocr_extract_case),
+    ('api.valuate', api_valuate_case),
+]
+
+
+def _time_round(func, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def measure(func, repeat: int = 7, round_seconds: float = 0.2) -> dict:
+    """
+    1回あたりの処理時間を計測する
+
+    Returns:
+        {'number': 1回の計測の繰り返し回数, 'samples': 計測ごとの1回あたりの時間（秒）のリスト}
+    """
+    func()  # ウォームアップ
+    gc.collect()
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        # 1回の計測が round_seconds 以上になる繰り返し回数を決める
+        number = 1
+        while True:
+            elapsed = _time_round(func, number)
+            if elapsed >= round_seconds:
+                break
+            number = max(number * 2, int(number * round_seconds / max(elapsed, 1e-9) * 1.1))
+
+        samples = [elapsed / number] + [_time_round(func, number) / number for _ in range(repeat - 1)]
+    finally:
+        if was_enabled:
+            gc.enable()
+    return {'number': number, 'samples': samples}
+
+
+def summarize(measurements: list) -> dict:
+    """
+    複数のプロセスの計測結果をまとめる
+
+    Returns:
+        {'processes': プロセス数, 'number': 繰り返し回数, 'repeat': 計測回数の合計,
+         'median_us' / 'min_us' / 'stdev_us': 1回あたりの時間（マイクロ秒）}
+    """
+    samples = [sample for measurement in measurements for sample in measurement['samples']]
+    return {
+        'processes': len(measurements),
+        'number': min(measurement['number'] for measurement in measurements),
+        'repeat': len(samples),
+        'median_us': statistics.median(samples) * 1e6,
+        'min_us': min(samples) * 1e6,
+        'stdev_us': statistics.stdev(samples) * 1e6 if len(samples) > 1 else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _selected(names) -> list:
+    return [(name, setup) for name, setup in CASES if not names or any(part in name for part in names)]
+
+
+def measure_cases(names=None, repeat: int = 7, round_seconds: float = 0.2) -> dict:
+    """
+    このプロセスで処理を計測する
+
+    Returns:
+        {処理名: measure() の結果（省略した場合は {'skipped': 理由}）}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup in _selected(names):
+            try:
+                func = setup(workdir)
+            except Skip as e:
+                results[name] = {'skipped': str(e)}
+                continue
+            results[name] = measure(func, repeat, round_seconds)
+    return results
+
+
+def _measure_in_subprocess(names, repeat: int, round_seconds: float) -> dict:
+    """新しいPythonプロセスで measure_cases() を実行する"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'result.json')
+        command = [sys.executable, '-m', 'benchmarks.suite', '--worker', path,
+                   '--repeat', str(repeat), '--round-seconds', str(round_seconds)]
+        for name in names or []:
+            command += ['--filter', name]
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def run(names=None, repeat: int = 7, round_seconds: float = 0.2, processes: int = 3) -> dict:
+    """
+    ベンチマークを実行する
+
+    プロセスごとのばらつき（メモリ配置・CPUの状態）を平均するため、processes 個の
+    新しいプロセスで順に計測し、すべての計測をまとめて中央値を求める（1の場合はこのプロセスで計測する）。
+
+    Args:
+        names: 実行する処理名に含まれる文字列のリスト（省略時はすべて）
+
+    Returns:
+        {'meta': 実行環境, 'results': {処理名: summarize() の結果（省略した場合は {'skipped': 理由}）}}
+    """
+    if processes <= 1:
+        runs = [measure_cases(names, repeat, round_seconds)]
+    else:
+        runs = [_measure_in_subprocess(names, repeat, round_seconds) for _ in range(processes)]
+
+    results = {}
+    for name, _ in _selected(names):
+        measurements = [result[name] for result in runs if 'samples' in result.get(name, {})]
+        if measurements:
+            results[name] = summarize(measurements)
+        else:
+            results[name] = {'skipped': runs[0][name]['skipped']}
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'processes': processes,
+            'repeat': repeat,
+            'round_seconds': round_seconds,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.1) -> list:
+    """
+    基準の結果と中央値を比較する
+
+    ばらつきの大きい処理で誤って回帰と判定しないよう、中央値の差が threshold に加えて
+    計測のばらつき（標準偏差/中央値の大きい方）の2倍も超えた場合だけ回帰・改善とする。
+
+    Returns:
+        処理ごとの {'name', 'baseline_us', 'current_us', 'ratio', 'status'}
+        （status は 'regression' / 'improvement' / 'ok'、どちらかにない処理は 'missing'）
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name, {})
+        if 'median_us' not in result or 'median_us' not in base:
+            rows.append({'name': name, 'baseline_us': base.get('median_us'),
+                         'current_us': result.get('median_us'), 'ratio': None, 'status': 'missing'})
+            continue
+        ratio = result['median_us'] / base['median_us']
+        noise = max(result['stdev_us'] / result['median_us'], base['stdev_us'] / base['median_us'])
+        limit = max(threshold, 2 * noise)
+        if ratio > 1 + limit:
+            status = 'regression'
+        elif ratio < 1 / (1 + limit):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'baseline_us': base['median_us'], 'current_us': result['median_us'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+
+def _format_us(value) -> str:
+    if value is None:
+        return '-'
+    if value >= 1000:
+        return f'{value / 1000:,.2f} ms'
+    return f'{value:,.2f} µs'
+
+
+def main() -> None:
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='性能のベンチマークスイート')
+    parser.add_argument('--filter', action='append', help='処理名に含まれる文字列（複数指定可）')
+    parser.add_argument('--processes', type=int, default=3, help='計測するプロセス数（デフォルト: 3）')
+    parser.add_argument('--repeat', type=int, default=7, help='1プロセスあたりの計測回数（デフォルト: 7）')
+    parser.add_argument('--round-seconds', type=float, default=0.2, help='1回の計測の最短時間（秒）')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--compare', help='比較する基準の結果（JSONファイル）')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='回帰とみなす中央値の増加率（デフォルト: 0.1 = 10%%）')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # run() から起動された計測用のプロセス
+        with open(args.worker, 'w', encoding='utf-8') as f:
+            json.dump(measure_cases(args.filter, args.repeat, args.round_seconds), f)
+        return
+
+    print("=" * 60)
+    print("ベンチマークスイート")
+    print("=" * 60)
+
+    result = run(args.filter, args.repeat, args.round_seconds, args.processes)
+    for name, row in result['results'].items():
+        if 'skipped' in row:
+            print(f"{name:<20} 省略: {row['skipped']}")
+        else:
+            spread = row['stdev_us'] / row['median_us'] * 100 if row['median_us'] else 0
+            print(f"{name:<20} {_format_us(row['median_us']):>12}  ±{spread:4.1f}%  "
+                  f"（{row['number']:,}回 × {row['repeat']}）")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print("-" * 60)
+        print(f"結果を保存しました: {args.output}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print("-" * 60)
+        print(f"基準との比較（{baseline['meta'].get('commit')}、{baseline['meta'].get('created_at')}）")
+        labels = {'regression': '回帰', 'improvement': '改善', 'ok': '', 'missing': '比較なし'}
+        for row in compare(result, baseline, args.threshold):
+            ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else '-'
+            print(f"{row['name']:<20} {_format_us(row['baseline_us']):>12} → {_format_us(row['current_us']):>12}  "
+                  f"{ratio:>6}  {labels[row['status']]}")
+            if row['status'] == 'regression':
+                regressions.append(row['name'])
+
+    print("=" * 60)
+    if regressions:
+        print(f"回帰: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+text_parser のベンチマーク
+
+変更前の実装（benchmarks/legacy_text_parser.py）と現在の実装について、
+1ページの物件概要と、数十ページ分のOCR出力を想定した長文（物件情報の有無）での処理件数/秒を比較する。
+あわせて両者の出力が一致することを確認する。
+
+実行方法:
+    python -m benchmarks.text_parser [ページ数]
+"""
+import random
+import sys
+import time
+
+import text_parser
+from benchmarks import legacy_text_parser
+
+
+SHEET = """
+物件情報シート
+
+所在地：東京都渋谷区渋谷1-1-1
+土地面積：150.5㎡
+延床面積：200.0㎡
+建物構造：鉄筋コンクリート造
+建築年：平成27年
+"""
+
+# 物件情報とは関係のない、OCR結果によくある行
+FILLER_LINES = [
+    "重要事項説明書（第{n}頁）",
+    "本物件の取引態様は媒介です。",
+    "取引条件の有効期限は契約締結日までとします。",
+    "備考：現況を優先します。詳細は担当者までお問い合わせください。",
+    "Page {n} of 40 - Confidential",
+    "管理費 12,000円／月 修繕積立金 8,500円／月",
+    "交通：JR山手線 徒歩7分",
+    "設備：都市ガス 公営水道 本下水",
+    "ーーーーーーーーーーーーーーーーーーーーーーーー",
+    "|| 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 0 ||",
+]
+
+
+def make_long_text(pages: int, lines_per_page: int = 40, seed: int = 0, sheet: bool = True) -> str:
+    """物件情報が最後のページにある複数ページのOCRテキストを作成（sheet=Falseなら物件情報なし）"""
+    rng = random.Random(seed)
+    lines = []
+    for page in range(1, pages + 1):
+        for _ in range(lines_per_page):
+            lines.append(rng.choice(FILLER_LINES).format(n=page))
+    if sheet:
+        lines.append(SHEET)
+    return '\n'.join(lines)
+
+
+def measure(func, text: str, min_seconds: float = 0.5) -> float:
+    """1秒あたりの処理件数を計測"""
+    func(text)  # ウォームアップ
+    count = 0
+    start = time.perf_counter()
+    while True:
+        func(text)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return count / elapsed
+
+
+def run(pages: int = 30) -> list:
+    """入力ごとに変更前/現在の処理件数/秒を比較"""
+    inputs = {
+        '1ページ': SHEET,
+        f'{pages}ページ': make_long_text(pages),
+        f'{pages}ページ（物件情報なし）': make_long_text(pages, sheet=False),
+    }
+
+    results = []
+    for name, text in inputs.items():
+        legacy_result = legacy_text_parser.parse_property_info(text)
+        current_result = text_parser.parse_property_info(text)
+        if legacy_result != current_result:
+            raise AssertionError(f'出力が一致しません: {legacy_result} != {current_result}')
+
+        legacy_rate = measure(legacy_text_parser.parse_property_info, text)
+        current_rate = measure(text_parser.parse_property_info, text)
+        results.append({
+            'input': name,
+            'chars': len(text),
+            'legacy_per_sec': legacy_rate,
+            'current_per_sec': current_rate,
+            'speedup': current_rate / legacy_rate,
+        })
+
+    return results
+
+
+def main() -> None:
+    """メイン処理"""
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+
+    print("=" * 60)
+    print("text_parser ベンチマーク")
+    print("=" * 60)
+
+    for row in run(pages):
+        print(f"\n[{row['input']}] {row['chars']:,}文字（出力一致）")
+        print(f"  変更前: {row['legacy_per_sec']:,.0f} 件/秒")
+        print(f"  現在:   {row['current_per_sec']:,.0f} 件/秒")
+        print(f"  高速化: {row['speedup']:.1f}x")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
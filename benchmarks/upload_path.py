@@ -0,0 +1,117 @@
+"""
+アップロード画像の読み込み方式のベンチマーク
+
+従来方式（一時ファイルに保存 → ファイルから開く → 全解像度でRGB変換）と、
+新方式（メモリ上のバイト列から開く → JPEGはdraftで縮小デコードして前処理）の
+1アップロードあたりの処理時間とピークRSSを比較する。
+
+ピークRSSは方式ごとに別プロセスで計測する（OCR本体は含まない）。
+
+実行方法:
+    python -m benchmarks.upload_path [繰り返し回数]
+"""
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+from PIL import Image
+
+from create_test_image import create_property_image
+from ocr_preprocess import PreprocessConfig, preprocess_image
+
+
+def make_photo() -> bytes:
+    """スマートフォン撮影相当の大きなJPEG（約6000px）を作成"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'sample_property.png')
+        create_property_image(path)
+        sheet = Image.open(path).convert('RGB').resize((6000, 4500))
+
+    buffer = io.BytesIO()
+    sheet.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def disk_path(upload: bytes, upload_dir: str) -> Image.Image:
+    """従来方式: 一時ファイルに保存してから開き、全解像度でRGB変換"""
+    filepath = os.path.join(upload_dir, f'{uuid.uuid4()}_upload.jpg')
+    with open(filepath, 'wb') as f:
+        f.write(upload)
+    try:
+        image = Image.open(filepath)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.load()
+        return image
+    finally:
+        os.remove(filepath)
+
+
+def memory_path(upload: bytes, upload_dir: str) -> Image.Image:
+    """新方式: バイト列から直接開き、draftで縮小デコードして前処理"""
+    image, _ = preprocess_image(Image.open(io.BytesIO(upload)), PreprocessConfig())
+    return image
+
+
+def _maxrss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB単位、macOSはバイト単位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _measure(mode: str, upload: bytes, repeat: int, conn) -> None:
+    """子プロセス内で計測して結果を送る"""
+    func = disk_path if mode == 'disk' else memory_path
+    baseline = _maxrss_bytes()
+    with tempfile.TemporaryDirectory() as upload_dir:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(upload, upload_dir)
+        elapsed = (time.perf_counter() - start) / repeat
+    conn.send({'latency_sec': elapsed, 'peak_rss_delta': _maxrss_bytes() - baseline})
+    conn.close()
+
+
+def run(repeat: int = 5) -> dict:
+    """方式ごとの処理時間とピークRSSの増分を計測"""
+    context = multiprocessing.get_context('spawn')
+    # 子プロセスはfork時点のピークRSSを引き継ぐため、画像の作成も別プロセスで行う
+    with context.Pool(1) as pool:
+        upload = pool.apply(make_photo)
+    results = {'upload_bytes': len(upload)}
+
+    for mode in ('disk', 'memory'):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_measure, args=(mode, upload, repeat, child_conn))
+        process.start()
+        results[mode] = parent_conn.recv()
+        process.join()
+
+    return results
+
+
+def main() -> None:
+    """メイン処理"""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 60)
+    print("アップロード読み込み方式ベンチマーク")
+    print("=" * 60)
+
+    results = run(repeat)
+    print(f"アップロードサイズ: {results['upload_bytes'] / 1048576:.2f} MB")
+    for mode, label in (('disk', '従来（ディスク保存+全解像度デコード）'), ('memory', '新方式（メモリ+draftデコード）')):
+        row = results[mode]
+        print(f"{label}:")
+        print(f"  処理時間: {row['latency_sec'] * 1000:.1f} ms/アップロード")
+        print(f"  ピークRSS増分: {row['peak_rss_delta'] / 1048576:.1f} MB")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+評価額の一括計算のベンチマーク
+
+calculate_land_valuation / calculate_building_valuation を1件ずつ呼ぶループと、
+calculate_valuations_batch による配列演算の処理時間を件数ごとに比較する。
+あわせて両者の結果が完全に一致することを確認する。
+
+実行方法:
+    python -m benchmarks.valuation_batch [件数 ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from property_data import PropertyData
+from valuation import (
+    calculate_building_valuation,
+    calculate_land_valuation,
+    calculate_valuations_batch,
+)
+
+
+STRUCTURES = ['木造', '鉄骨造', '鉄筋コンクリート造', '軽量鉄骨造']
+ADDRESSES = [f'東京都渋谷区渋谷{i}-1-1' for i in range(1, 51)]
+CURRENT_YEAR = 2025
+
+
+def make_portfolio(rows: int, seed: int = 0) -> dict:
+    """ランダムな物件の列データを作成"""
+    rng = np.random.default_rng(seed)
+    return {
+        'addresses': [ADDRESSES[i] for i in rng.integers(0, len(ADDRESSES), rows)],
+        'land_areas': np.round(rng.uniform(30, 500, rows), 2),
+        'building_structures': [STRUCTURES[i] for i in rng.integers(0, len(STRUCTURES), rows)],
+        'total_floor_areas': np.round(rng.uniform(30, 800, rows), 2),
+        'build_years': rng.integers(1950, CURRENT_YEAR + 2, rows),
+    }
+
+
+def loop_valuation(portfolio: dict) -> dict:
+    """1件ずつPropertyDataを作って計算する"""
+    land_values = []
+    building_values = []
+    for address, land_area, structure, floor_area, build_year in zip(
+        portfolio['addresses'],
+        portfolio['land_areas'].tolist(),
+        portfolio['building_structures'],
+        portfolio['total_floor_areas'].tolist(),
+        portfolio['build_years'].tolist(),
+    ):
+        property_data = PropertyData(
+            address=address,
+            land_area=land_area,
+            building_structure=structure,
+            total_floor_area=floor_area,
+            build_year=build_year
+        )
+        land_values.append(calculate_land_valuation(property_data))
+        building_values.append(calculate_building_valuation(property_data, CURRENT_YEAR))
+    return {'land_valuation': land_values, 'building_valuation': building_values}
+
+
+def run(sizes=(10_000, 100_000, 1_000_000)) -> list:
+    """件数ごとにループと一括計算の処理時間を計測"""
+    results = []
+    for rows in sizes:
+        portfolio = make_portfolio(rows)
+
+        start = time.perf_counter()
+        expected = loop_valuation(portfolio)
+        loop_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = calculate_valuations_batch(**portfolio, current_year=CURRENT_YEAR)
+        batch_sec = time.perf_counter() - start
+
+        for key in ('land_valuation', 'building_valuation'):
+            if not np.array_equal(np.array(expected[key]), actual[key]):
+                raise AssertionError(f'{key} が一致しません（{rows}件）')
+
+        results.append({
+            'rows': rows,
+            'loop_sec': loop_sec,
+            'batch_sec': batch_sec,
+            'speedup': loop_sec / batch_sec,
+        })
+    return results
+
+
+def main() -> None:
+    """メイン処理"""
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    print("=" * 60)
+    print("評価額 一括計算ベンチマーク")
+    print("=" * 60)
+
+    for row in run(sizes):
+        print(f"\n[{row['rows']:,}件]（結果一致）")
+        print(f"  1件ずつ: {row['loop_sec'] * 1000:,.1f} ms")
+        print(f"  一括:    {row['batch_sec'] * 1000:,.1f} ms")
+        print(f"  高速化: {row['speedup']:.1f}x")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+全都道府県・市区町村の路線価図ページURLを収集するクローラー
+
+scraper.py のリンク探索（トップ → 都道府県 → 路線価図 → 市区町村）を使い、
+都道府県ごとのページ取得をスレッドプールで並行して行う。
+アクセス頻度は http_cache.CachedSession のホストごとのトークンバケットで制限する。
+
+都道府県ごとに結果をチェックポイントファイルへ保存するため、
+中断しても再実行すれば未完了の都道府県だけを取得する。
+
+実行方法:
+    python crawler.py [--checkpoint data/crawl_checkpoint.json] [--workers 4] [--rate 2]
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from http_cache import CachedSession, get_default_session
+from scraper import (
+    BASE_URL,
+    extract_links,
+    fetch_links,
+    fetch_page,
+    find_rosenka_list_link,
+    list_city_links,
+    list_prefecture_links,
+)
+
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crawl_checkpoint.json')
+
+
+class CrawlCheckpoint:
+    """都道府県ごとの収集結果を保存するチェックポイント"""
+
+    def __init__(self, path: Optional[str], base_url: str):
+        self.path = path
+        self.base_url = base_url
+        self.prefectures = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # 別のサイトのチェックポイントは使わない
+            if data.get('base_url') == base_url:
+                self.prefectures = data.get('prefectures', {})
+
+    def is_done(self, prefecture: str) -> bool:
+        with self._lock:
+            return prefecture in self.prefectures
+
+    def save(self, prefecture: str, result: dict) -> None:
+        """都道府県の結果を追加してファイルに書き込む"""
+        with self._lock:
+            self.prefectures[prefecture] = result
+            if not self.path:
+                return
+            data = json.dumps({'base_url': self.base_url, 'prefectures': self.prefectures},
+                              ensure_ascii=False, indent=1)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    def entries(self) -> List[Dict[str, str]]:
+        """収集済みの (都道府県, 市区町村, URL) の一覧"""
+        with self._lock:
+            return [
+                {'prefecture': prefecture, 'city': city, 'url': url}
+                for prefecture, result in self.prefectures.items()
+                for city, url in result['cities']
+            ]
+
+
+def crawl_prefecture(prefecture_url: str, session: CachedSession) -> dict:
+    """
+    都道府県ページから路線価図ページをたどり、市区町村の一覧を取得
+
+    Returns:
+        {'url', 'list_url', 'list_hash': 路線価図ページのSHA-256, 'cities': [[市区町村名, URL], ...]}
+
+    Raises:
+        requests.RequestException: 取得に失敗した場合
+        ValueError: 路線価図のリンクが見つからない場合
+    """
+    list_url = find_rosenka_list_link(fetch_links(prefecture_url, session))
+    if not list_url:
+        raise ValueError('路線価図のリンクが見つかりませんでした')
+
+    html = fetch_page(list_url, session)
+    cities = list_city_links(extract_links(html, list_url), list_url)
+    return {
+        'url': prefecture_url,
+        'list_url': list_url,
+        'list_hash': hashlib.sha256(html).hexdigest(),
+        'cities': [[city, url] for city, url in cities],
+    }
+
+
+def crawl(base_url: str = BASE_URL, session: Optional[CachedSession] = None, workers: int = 4,
+          checkpoint_path: Optional[str] = None, prefectures: Optional[List[str]] = None,
+          verbose: bool = True) -> dict:
+    """
+    全都道府県（または指定した都道府県）の市区町村ページURLを収集
+
+    Args:
+        base_url: サイトのトップページURL
+        session: 取得に使うセッション（省略時は共有セッション）
+        workers: 並行して処理する都道府県の数
+        checkpoint_path: チェックポイントファイル（Noneなら保存しない）
+        prefectures: 対象の都道府県名（省略時はトップページの全都道府県）
+        verbose: 進捗を表示するか
+
+    Returns:
+        {'entries': 収集結果, 'prefectures': {都道府県: crawl_prefectureの結果},
+         'failed': {都道府県: エラー}, 'pages': 取得ページ数,
+         'elapsed': 秒, 'pages_per_sec': 1秒あたりのページ数, 'skipped': 再開でスキップした数}
+    """
+    if session is None:
+        session = get_default_session()
+    checkpoint = CrawlCheckpoint(checkpoint_path, base_url)
+
+    start = time.perf_counter()
+    pages = 1
+    targets = list_prefecture_links(fetch_links(base_url, session))
+    if prefectures is not None:
+        targets = [(name, url) for name, url in targets if name in prefectures]
+
+    pending = [(name, url) for name, url in targets if not checkpoint.is_done(name)]
+    skipped = len(targets) - len(pending)
+    if verbose and skipped:
+        print(f"チェックポイントから再開: {skipped}件は取得済み")
+
+    failed = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawler')
+    try:
+        futures = {executor.submit(crawl_prefecture, url, session): name for name, url in pending}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed[name] = str(e)
+                if verbose:
+                    print(f"✗ {name}: {e}")
+                continue
+            pages += 2
+            checkpoint.save(name, result)
+            if verbose:
+                print(f"✓ {name}: {len(result['cities'])}市区町村")
+    finally:
+        # 中断時は実行前の都道府県を取り消す（完了分はチェックポイントに保存済み）
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'entries': checkpoint.entries(),
+        'prefectures': dict(checkpoint.prefectures),
+        'failed': failed,
+        'pages': pages,
+        'elapsed': elapsed,
+        'pages_per_sec': pages / elapsed if elapsed > 0 else 0.0,
+        'skipped': skipped,
+    }
+
+
+def main() -> None:
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='全都道府県・市区町村の路線価図ページURLを収集')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=None, help='1秒あたりのリクエスト数（省略時は SCRAPER_RATE）')
+    parser.add_argument('--burst', type=int, default=None, help='連続して送れるリクエスト数（省略時は SCRAPER_BURST）')
+    parser.add_argument('--prefecture', action='append', help='対象の都道府県（複数指定可）')
+    args = parser.parse_args()
+
+    session = get_default_session()
+    if args.rate is not None or args.burst is not None:
+        session = CachedSession(
+            cache_dir=session.cache_dir,
+            ttl=session.ttl,
+            rate=session.rate if args.rate is None else args.rate,
+            burst=session.burst if args.burst is None else args.burst,
+            pool_size=max(args.workers, 10)
+        )
+
+    print("=" * 60)
+    print("路線価図ページの収集")
+    print("=" * 60)
+
+    result = crawl(args.base_url, session, args.workers, args.checkpoint, args.prefecture)
+
+    print("-" * 60)
+    print(f"市区町村: {len(result['entries']):,}件（失敗 {len(result['failed'])}都道府県）")
+    print(f"取得ページ: {result['pages']}ページ / {result['elapsed']:.1f}秒（{result['pages_per_sec']:.1f} ページ/秒）")
+    print(f"HTTP統計: {session.stats()}")
+    print(f"チェックポイント: {args.checkpoint}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
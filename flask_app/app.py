@@ -2,14 +2,26 @@
 不動産評価額推定システム - Flaskアプリケーション
 """
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+import json
+import traceback
+import click
+from functools import wraps
+from itertools import islice
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Property, LoginToken, ValuationHistory
+from core import PropertyData, calculate_building_valuation, calculate_land_valuation, get_rosenka
+from models import db, User, Property, LoginToken, ValuationHistory, OCRJob, create_missing_indexes
+from ocr_jobs import extract_property_info, calculate_valuation_result, submit_ocr_job, expire_if_stale
+from batch_valuation import MAX_ITEMS as BATCH_MAX_ITEMS, evaluate_items, read_ndjson, validate_property
+from history_buffer import get_default_buffer
+from history_export import FORMATS as EXPORT_FORMATS, export_chunks, export_filename, parse_date
+import memory_diagnostics
+from metrics import annotate, init_app as init_metrics, stage
+from pagination import invalidate_count, keyset_paginate
+from profiler import get_default_profiler, init_app as init_profiler, list_profiles
 
-# プロジェクトルートディレクトリを取得
 basedir = os.path.abspath(os.path.dirname(__file__))
-project_root = os.path.dirname(basedir)
 
 # Flaskアプリケーションの初期化
 app = Flask(__name__)
@@ -34,6 +46,18 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # データベースの初期化
 db.init_app(app)
 
+# 処理時間のメトリクス（/metrics）
+init_metrics(app)
+
+# 管理者が開始するサンプリングプロファイラ（/admin/profiler）
+init_profiler(app)
+
+# リクエストごとのRSSの記録とワーカーの入れ替え、メモリの診断（/admin/memory）
+memory_diagnostics.init_app(app)
+
+# 管理者のメールアドレス（カンマ区切り）
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
 # Flask-Loginの初期化
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -237,8 +261,14 @@ def callback():
 @login_required
 def dashboard():
     """ダッシュボード"""
-    properties = current_user.properties.order_by(Property.created_at.desc()).all()
-    return render_template('dashboard.html', properties=properties)
+    # 登録物件（新しい順、キーセット方式のページネーション）
+    try:
+        page = keyset_paginate(Property, current_user.id, per_page=24,
+                               after=request.args.get('after'), before=request.args.get('before'))
+    except ValueError:
+        return redirect(url_for('dashboard'))
+
+    return render_template('dashboard.html', properties=page.items, pagination=page)
 
 
 @app.route('/history')
@@ -246,13 +276,12 @@ def dashboard():
 def history():
     """評価履歴一覧"""
     # ログイン中のユーザーの評価履歴を取得（新しい順）
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-
-    # ページネーション付きで取得
-    pagination = current_user.valuation_history.order_by(
-        ValuationHistory.created_at.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
+    # OFFSETではなく前のページの最後の行の位置から取得するため、古いページでも速い
+    try:
+        pagination = keyset_paginate(ValuationHistory, current_user.id, per_page=20,
+                                     after=request.args.get('after'), before=request.args.get('before'))
+    except ValueError:
+        return redirect(url_for('history'))
 
     histories = pagination.items
 
@@ -261,6 +290,35 @@ def history():
                          pagination=pagination)
 
 
+@app.route('/history/export')
+@login_required
+def history_export():
+    """
+    評価履歴・物件データのエクスポート（ダウンロード）
+
+    Query:
+        kind: history（評価履歴、デフォルト）または properties（物件）
+        format: csv（デフォルト）、ndjson または arrow
+        from / to: 作成日の範囲（YYYY-MM-DD、両端を含む）
+
+    行はデータベースからチャンクごとに取り出し、チャンク転送でそのまま返す。
+    """
+    kind = request.args.get('kind', 'history')
+    fmt = request.args.get('format', 'csv')
+    try:
+        start = parse_date(request.args.get('from'))
+        end = parse_date(request.args.get('to'), end=True)
+        chunks = export_chunks(kind, fmt, user_id=current_user.id, start=start, end=end)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt][0],
+        headers={'Content-Disposition': f'attachment; filename={export_filename(kind, fmt, start, end)}'}
+    )
+
+
 @app.route('/valuation', methods=['GET', 'POST'])
 @login_required
 def valuation():
@@ -268,6 +326,7 @@ def valuation():
     if request.method == 'POST':
         try:
             input_method = request.form.get('input_method')
+            annotate(input_method=input_method)
 
             if input_method == 'file':
                 # ファイルアップロード処理
@@ -278,94 +337,42 @@ def valuation():
                 if file.filename == '':
                     return jsonify({'success': False, 'error': 'ファイルが選択されていません'}), 400
 
-                # ファイルを一時保存
-                import uuid
-                from werkzeug.utils import secure_filename
-
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-
                 try:
-                    # OCRでテキスト抽出
-                    import sys
-                    sys.path.insert(0, project_root)
-                    from ocr_utils import extract_text_from_image
-                    from text_parser import parse_property_info
-
-                    extracted_text = extract_text_from_image(filepath)
-                    property_info = parse_property_info(extracted_text)
-
-                    # パース結果を確認
-                    if not all([property_info.get('address'),
-                               property_info.get('land_area'),
-                               property_info.get('total_floor_area'),
-                               property_info.get('building_structure'),
-                               property_info.get('build_year')]):
-                        return jsonify({
-                            'success': False,
-                            'error': '必要な情報を画像から抽出できませんでした。手動入力をお試しください。'
-                        }), 400
-
-                    address = property_info['address']
-                    land_area = float(property_info['land_area'])
-                    total_floor_area = float(property_info['total_floor_area'])
-                    building_structure = property_info['building_structure']
-                    build_year = int(property_info['build_year'])
-
-                finally:
-                    # 一時ファイルを削除
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
+                    # ディスクに保存せず、アップロードされたデータから直接OCR
+                    property_info = extract_property_info(file.stream)
+                except ValueError as e:
+                    return jsonify({'success': False, 'error': str(e)}), 400
+
+                address = property_info['address']
+                land_area = property_info['land_area']
+                total_floor_area = property_info['total_floor_area']
+                building_structure = property_info['building_structure']
+                build_year = property_info['build_year']
 
             elif input_method == 'manual':
                 # 手動入力処理
-                address = request.form.get('address')
-                land_area = float(request.form.get('land_area'))
-                total_floor_area = float(request.form.get('total_floor_area'))
-                building_structure = request.form.get('building_structure')
-                build_year = int(request.form.get('build_year'))
+                with stage('parse'):
+                    address = request.form.get('address')
+                    land_area = float(request.form.get('land_area'))
+                    total_floor_area = float(request.form.get('total_floor_area'))
+                    building_structure = request.form.get('building_structure')
+                    build_year = int(request.form.get('build_year'))
 
             else:
                 return jsonify({'success': False, 'error': '無効な入力方法です'}), 400
 
             # 評価額を計算
-            import sys
-            sys.path.insert(0, project_root)
-            from property_data import PropertyData
-            from valuation import calculate_building_valuation, calculate_land_valuation, get_rosenka_mock
-
-            property_data = PropertyData(
+            result = calculate_valuation_result(
                 address=address,
                 land_area=land_area,
-                building_structure=building_structure,
                 total_floor_area=total_floor_area,
+                building_structure=building_structure,
                 build_year=build_year
             )
 
-            land_value = calculate_land_valuation(property_data)
-            building_value = calculate_building_valuation(property_data)
-            total_value = land_value + building_value
-            road_price = get_rosenka_mock(address)
-
-            # 結果を返す
-            result = {
-                'address': address,
-                'land_area': land_area,
-                'total_floor_area': total_floor_area,
-                'building_structure': building_structure,
-                'build_year': build_year,
-                'land_valuation': int(land_value),
-                'building_valuation': int(building_value),
-                'total_valuation': int(total_value),
-                'road_price': int(road_price)
-            }
-
             return jsonify({'success': True, 'result': result})
 
         except Exception as e:
-            import traceback
             traceback.print_exc()
             return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -373,6 +380,55 @@ def valuation():
     return render_template('valuation.html')
 
 
+@app.route('/valuation/jobs', methods=['POST'])
+@login_required
+def valuation_job_create():
+    """
+    画像アップロードによる評価ジョブを登録（OCRはバックグラウンドで実行）
+
+    Response JSON (202):
+    {
+        "success": true,
+        "job": {"id": "ジョブID", "status": "queued", "progress": 0, ...},
+        "status_url": "進捗確認用URL"
+    }
+    """
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'ファイルが選択されていません'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'success': False, 'error': 'ファイルが選択されていません'}), 400
+
+    try:
+        # ディスクに保存せず、メモリ上のバイト列のままジョブに渡す
+        job = submit_ocr_job(app, current_user.id, file.read())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'status_url': url_for('valuation_job_status', job_id=job.id)
+    }), 202
+
+
+@app.route('/valuation/jobs/<job_id>')
+@login_required
+def valuation_job_status(job_id):
+    """評価ジョブの進捗・結果を取得"""
+    job = db.session.get(OCRJob, job_id)
+
+    # 自分のジョブかチェック
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'ジョブが見つかりません'}), 404
+
+    expire_if_stale(job)
+
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
 @app.route('/api/valuate', methods=['POST'])
 @login_required
 def api_valuate():
@@ -405,62 +461,37 @@ def api_valuate():
     }
     """
     try:
-        # JSONデータを取得
-        data = request.get_json()
-
-        # バリデーション
-        required_fields = ['address', 'land_area', 'total_floor_area', 'building_structure', 'build_year']
-        missing_fields = [field for field in required_fields if field not in data]
-
-        if missing_fields:
-            return jsonify({
-                'success': False,
-                'error': f'必須項目が不足しています: {", ".join(missing_fields)}'
-            }), 400
-
-        # データ型の変換とバリデーション
+        # JSONデータを取得してバリデーション
         try:
-            address = str(data['address']).strip()
-            land_area = float(data['land_area'])
-            total_floor_area = float(data['total_floor_area'])
-            building_structure = str(data['building_structure']).strip()
-            build_year = int(data['build_year'])
-
-            # 値の範囲チェック
-            if land_area <= 0:
-                return jsonify({'success': False, 'error': '土地面積は0より大きい値を入力してください'}), 400
-            if total_floor_area <= 0:
-                return jsonify({'success': False, 'error': '延床面積は0より大きい値を入力してください'}), 400
-            if build_year < 1900 or build_year > 2025:
-                return jsonify({'success': False, 'error': '建築年は1900年から2025年の範囲で入力してください'}), 400
-            if building_structure not in ['木造', '鉄骨造', '鉄筋コンクリート造']:
-                return jsonify({'success': False, 'error': '建物構造は「木造」「鉄骨造」「鉄筋コンクリート造」のいずれかを選択してください'}), 400
-
-        except (ValueError, TypeError) as e:
-            return jsonify({'success': False, 'error': f'データ形式が正しくありません: {str(e)}'}), 400
+            with stage('parse'):
+                property_info = validate_property(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
-        # 評価額を計算
-        import sys
-        sys.path.insert(0, project_root)
-        from property_data import PropertyData
-        from valuation import calculate_building_valuation, calculate_land_valuation, get_rosenka_mock
+        address = property_info['address']
+        land_area = property_info['land_area']
+        total_floor_area = property_info['total_floor_area']
+        building_structure = property_info['building_structure']
+        build_year = property_info['build_year']
 
-        property_data = PropertyData(
-            address=address,
-            land_area=land_area,
-            building_structure=building_structure,
-            total_floor_area=total_floor_area,
-            build_year=build_year
-        )
+        # 評価額を計算
+        with stage('valuation'):
+            property_data = PropertyData(
+                address=address,
+                land_area=land_area,
+                building_structure=building_structure,
+                total_floor_area=total_floor_area,
+                build_year=build_year
+            )
 
-        # 各評価額を計算
-        land_value = calculate_land_valuation(property_data)
-        building_value = calculate_building_valuation(property_data)
-        total_value = land_value + building_value
-        road_price = get_rosenka_mock(address)
+            # 各評価額を計算（路線価は1回だけ取得して評価と履歴の両方に使う）
+            road_price = get_rosenka(address)
+            land_value = calculate_land_valuation(property_data, road_price)
+            building_value = calculate_building_valuation(property_data)
+            total_value = land_value + building_value
 
         # 評価履歴をデータベースに保存
-        history = ValuationHistory(
+        history_values = dict(
             user_id=current_user.id,
             address=address,
             land_area=land_area,
@@ -472,12 +503,21 @@ def api_valuate():
             total_valuation=total_value,
             road_price=road_price
         )
-        db.session.add(history)
-        db.session.commit()
+        with stage('db'):
+            history_buffer = get_default_buffer(app)
+            if history_buffer is not None:
+                # 遅延書き込み: IDを割り当ててバッファに追加し、コミットを待たずに返す
+                history_id, created_at = history_buffer.add(**history_values)
+            else:
+                history = ValuationHistory(**history_values)
+                db.session.add(history)
+                db.session.commit()
+                invalidate_count(ValuationHistory, current_user.id)
+                history_id, created_at = history.id, history.created_at
 
         # 結果を返す
         result = {
-            'id': history.id,
+            'id': history_id,
             'address': address,
             'land_area': land_area,
             'total_floor_area': total_floor_area,
@@ -487,13 +527,12 @@ def api_valuate():
             'building_valuation': int(building_value),
             'total_valuation': int(total_value),
             'road_price': int(road_price),
-            'created_at': history.created_at.isoformat()
+            'created_at': created_at.isoformat()
         }
 
         return jsonify({'success': True, 'result': result}), 200
 
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({
             'success': False,
@@ -501,6 +540,77 @@ def api_valuate():
         }), 500
 
 
+@app.route('/api/valuate/batch', methods=['POST'])
+@login_required
+def api_valuate_batch():
+    """
+    複数物件の一括評価API
+
+    /api/valuate と同じ項目の物件を、JSON配列（Content-Type: application/json）
+    またはNDJSON（Content-Type: application/x-ndjson、1行1物件）で受け取る。
+    物件ごとに検証・評価し、評価履歴はチャンクごとにまとめて保存する。
+
+    Response（JSON配列の場合）:
+    {
+        "success": true,
+        "count": 件数, "succeeded": 成功件数, "failed": 失敗件数,
+        "results": [
+            {"index": 0, "success": true, "result": {/api/valuate の result と同じ}},
+            {"index": 1, "success": false, "error": "エラーメッセージ"},
+            ...
+        ]
+    }
+
+    NDJSONの場合は results の各要素を1行ずつ、計算したチャンクから順に返す。
+    """
+    user_id = current_user.id
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+        items = read_ndjson(request.stream)
+
+        def generate():
+            try:
+                for result in evaluate_items(user_id, islice(items, BATCH_MAX_ITEMS)):
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+                if next(items, None) is not None:
+                    yield json.dumps({
+                        'success': False,
+                        'error': f'1回に評価できるのは{BATCH_MAX_ITEMS}件までです。残りの物件は評価していません。'
+                    }, ensure_ascii=False) + '\n'
+            except Exception:
+                traceback.print_exc()
+                yield json.dumps({
+                    'success': False,
+                    'error': 'サーバーエラーが発生しました。しばらくしてから再度お試しください。'
+                }, ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return jsonify({'success': False, 'error': '物件情報のJSON配列を指定してください'}), 400
+    if len(data) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'1回に評価できるのは{BATCH_MAX_ITEMS}件までです'}), 413
+
+    try:
+        results = list(evaluate_items(user_id, data))
+    except Exception:
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': 'サーバーエラーが発生しました。しばらくしてから再度お試しください。'
+        }), 500
+
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    }), 200
+
+
 @app.route('/save_property', methods=['POST'])
 @login_required
 def save_property():
@@ -522,6 +632,7 @@ def save_property():
 
         db.session.add(property_record)
         db.session.commit()
+        invalidate_count(Property, current_user.id)
 
         return jsonify({'success': True, 'property_id': property_record.id})
 
@@ -542,12 +653,6 @@ def evaluate():
         total_floor_area = float(request.form.get('total_floor_area'))
         build_year = int(request.form.get('build_year'))
 
-        # 既存のモジュールをインポート
-        import sys
-        sys.path.insert(0, project_root)
-        from property_data import PropertyData
-        from valuation import calculate_building_valuation, calculate_land_valuation
-
         # 評価額を計算
         property_data = PropertyData(
             address=address,
@@ -575,6 +680,7 @@ def evaluate():
         )
         db.session.add(property_record)
         db.session.commit()
+        invalidate_count(Property, current_user.id)
 
         flash('評価額を計算しました。', 'success')
         return redirect(url_for('property_detail', property_id=property_record.id))
@@ -609,11 +715,232 @@ def property_delete(property_id):
 
     db.session.delete(property_record)
     db.session.commit()
+    invalidate_count(Property, current_user.id)
 
     flash('物件を削除しました。', 'success')
     return redirect(url_for('dashboard'))
 
 
+# ============================================================
+# 管理者用
+# ============================================================
+
+def is_admin(user):
+    """ADMIN_EMAILS に含まれるユーザーかどうか"""
+    return user.is_authenticated and user.email.lower() in ADMIN_EMAILS
+
+
+def admin_required(view):
+    """ログイン済みの管理者だけが使えるルートにする（それ以外は403）"""
+    @wraps(view)
+    @login_required
+    def decorated_view(*args, **kwargs):
+        if not is_admin(current_user):
+            return jsonify({'success': False, 'error': '管理者のみ利用できます'}), 403
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+def _admin_params():
+    """
+    管理用APIのパラメータ（JSONのオブジェクトまたはフォーム）
+
+    Raises:
+        ValueError: JSONがオブジェクトでない場合（配列や数値など）
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return request.form
+    if not isinstance(payload, dict):
+        raise ValueError('パラメータはJSONのオブジェクトで指定してください')
+    return payload
+
+
+def _optional_number(data, name, cast):
+    value = data.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} は数値で指定してください')
+
+
+def _other_worker(pid):
+    """pid を指定したリクエストに別のワーカーが応答した場合のレスポンス（同じワーカーならNone）"""
+    if pid is None or pid == os.getpid():
+        return None
+    return jsonify({'success': False, 'error': '別のワーカーが応答しました（再送してください）',
+                    'pid': os.getpid()}), 409
+
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+@admin_required
+def admin_profiler():
+    """
+    サンプリングプロファイラの状態の取得（GET）・開始（POST）
+
+    応答したワーカー（gunicornのワーカー1つ）でだけ計測する。
+
+    Request JSON（POST、フォームでも可）:
+    {
+        "seconds": この秒数で停止（任意）,
+        "requests": このワーカーでこの件数のリクエストを処理したら停止（任意）,
+        "pid": このプロセスIDのワーカーでだけ開始する（任意。他のワーカーが応答した場合は409）
+    }
+    """
+    profiler = get_default_profiler()
+    if request.method == 'GET':
+        return jsonify({'success': True, 'profiler': profiler.status(), 'profiles': list_profiles()})
+
+    try:
+        data = _admin_params()
+        seconds = _optional_number(data, 'seconds', float)
+        requests = _optional_number(data, 'requests', int)
+        pid = _optional_number(data, 'pid', int)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    other = _other_worker(pid)
+    if other is not None:
+        return other
+    try:
+        status = profiler.start(seconds=seconds, requests=requests)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e), 'profiler': profiler.status()}), 409
+    return jsonify({'success': True, 'profiler': status})
+
+
+@app.route('/admin/profiler/stop', methods=['POST'])
+@admin_required
+def admin_profiler_stop():
+    """応答したワーカーの計測を停止し、結果のファイルを書き出す"""
+    result = get_default_profiler().stop()
+    return jsonify({'success': True, 'pid': os.getpid(), 'result': result})
+
+
+def _allocation_options(data):
+    """一覧の件数（limit、1〜200）と集計の単位（group_by）"""
+    limit = _optional_number(data, 'limit', int)
+    if limit is None:
+        limit = 20
+    elif not 1 <= limit <= 200:
+        raise ValueError('limit は1〜200で指定してください')
+    group_by = data.get('group_by') or 'lineno'
+    if group_by not in memory_diagnostics.GROUP_BY:
+        raise ValueError(f'group_by は {" / ".join(memory_diagnostics.GROUP_BY)} のいずれかを指定してください')
+    return limit, group_by
+
+
+@app.route('/admin/memory')
+@admin_required
+def admin_memory():
+    """応答したワーカーのRSS・tracemalloc の状態と、保存済みのスナップショットID"""
+    return jsonify({'success': True, 'memory': memory_diagnostics.status()})
+
+
+@app.route('/admin/memory/tracemalloc', methods=['POST'])
+@admin_required
+def admin_memory_tracemalloc():
+    """
+    応答したワーカーで tracemalloc を開始・停止する
+
+    Request JSON（フォームでも可）:
+    {
+        "enabled": true（開始）/ false（停止）,
+        "frames": 記録する呼び出し元の数（任意）,
+        "pid": このプロセスIDのワーカーでだけ実行する（任意）
+    }
+    """
+    try:
+        data = _admin_params()
+        frames = _optional_number(data, 'frames', int) or memory_diagnostics.TRACEMALLOC_FRAMES
+        pid = _optional_number(data, 'pid', int)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    other = _other_worker(pid)
+    if other is not None:
+        return other
+    if str(data.get('enabled', 'true')).lower() in ('0', 'false', 'off'):
+        memory_diagnostics.stop_tracing()
+    else:
+        memory_diagnostics.start_tracing(frames)
+    return jsonify({'success': True, 'memory': memory_diagnostics.status()})
+
+
+@app.route('/admin/memory/snapshots', methods=['POST'])
+@admin_required
+def admin_memory_snapshot():
+    """
+    応答したワーカーでスナップショットを取得・保存し、メモリの多い箇所を返す
+
+    Request JSON（フォームでも可）:
+    {
+        "limit": 一覧の件数（任意、1〜200、デフォルト: 20）,
+        "group_by": "lineno" / "filename" / "traceback"（任意）,
+        "pid": このプロセスIDのワーカーでだけ取得する（任意）
+    }
+    """
+    try:
+        data = _admin_params()
+        limit, group_by = _allocation_options(data)
+        pid = _optional_number(data, 'pid', int)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    other = _other_worker(pid)
+    if other is not None:
+        return other
+    try:
+        snapshot_id, snapshot = memory_diagnostics.take_snapshot()
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    return jsonify({
+        'success': True,
+        'id': snapshot_id,
+        'memory': memory_diagnostics.status(),
+        'top': memory_diagnostics.top_allocations(snapshot, limit, group_by),
+    })
+
+
+@app.route('/admin/memory/snapshots/<snapshot_id>')
+@admin_required
+def admin_memory_snapshot_detail(snapshot_id):
+    """保存済みのスナップショットで、メモリの多い箇所（?limit=&group_by=）"""
+    try:
+        limit, group_by = _allocation_options(request.args)
+        snapshot = memory_diagnostics.load_snapshot(snapshot_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'スナップショットが見つかりません'}), 404
+    return jsonify({'success': True, 'id': snapshot_id,
+                    'top': memory_diagnostics.top_allocations(snapshot, limit, group_by)})
+
+
+@app.route('/admin/memory/diff')
+@admin_required
+def admin_memory_diff():
+    """2つのスナップショット（?from=&to=）の間でメモリの増減が大きかった箇所"""
+    try:
+        limit, group_by = _allocation_options(request.args)
+        old = memory_diagnostics.load_snapshot(request.args.get('from'))
+        new = memory_diagnostics.load_snapshot(request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'スナップショットが見つかりません'}), 404
+    return jsonify({
+        'success': True,
+        'from': request.args['from'],
+        'to': request.args['to'],
+        'diff': memory_diagnostics.diff_allocations(old, new, limit, group_by),
+    })
+
+
 # ============================================================
 # エラーハンドラー
 # ============================================================
@@ -639,9 +966,39 @@ def internal_error(error):
 def init_db():
     """データベースの初期化"""
     db.create_all()
+    # 既存のテーブルには、後から追加したインデックスを作成する
+    for name in create_missing_indexes():
+        print(f'インデックスを作成しました: {name}')
     print('データベースを初期化しました。')
 
 
+@app.cli.command()
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--kind', type=click.Choice(['history', 'properties']), default='history', help='エクスポートするデータ')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', help='出力形式')
+@click.option('--from', 'start', default=None, help='作成日の開始（YYYY-MM-DD）')
+@click.option('--to', 'end', default=None, help='作成日の終了（YYYY-MM-DD、この日を含む）')
+@click.option('--user', 'email', default=None, help='ユーザーのメールアドレスで絞り込む')
+def export(output, kind, fmt, start, end, email):
+    """評価履歴・物件データをファイル（省略時は標準出力）にエクスポート"""
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'ユーザーが見つかりません: {email}')
+        user_id = user.id
+
+    try:
+        chunks = export_chunks(kind, fmt, user_id=user_id,
+                               start=parse_date(start), end=parse_date(end, end=True))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
 @app.cli.command()
 def create_admin():
     """管理者ユーザーの作成"""
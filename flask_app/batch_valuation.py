@@ -0,0 +1,215 @@
+"""
+複数物件の一括評価（/api/valuate/batch）
+
+JSON配列またはNDJSON（1行1物件）で受け取った物件を /api/valuate と同じ規則で検証し、
+valuation.calculate_valuations_batch でまとめて計算する。
+評価履歴はチャンクごとにまとめてINSERTし、チャンクごとに1回だけコミットする。
+
+環境変数:
+    VALUATION_BATCH_CHUNK_SIZE: 1回の計算・INSERTで処理する件数（デフォルト: 500）
+    VALUATION_BATCH_MAX_ITEMS: 1リクエストあたりの最大件数（デフォルト: 10000）
+"""
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app
+
+from core import calculate_valuations_batch
+from history_buffer import get_default_buffer
+from metrics import stage
+from models import db, ValuationHistory
+from pagination import invalidate_count
+
+CHUNK_SIZE = int(os.environ.get('VALUATION_BATCH_CHUNK_SIZE', 500))
+MAX_ITEMS = int(os.environ.get('VALUATION_BATCH_MAX_ITEMS', 10000))
+
+REQUIRED_FIELDS = ['address', 'land_area', 'total_floor_area', 'building_structure', 'build_year']
+BUILDING_STRUCTURES = ['木造', '鉄骨造', '鉄筋コンクリート造']
+
+
+def validate_property(data):
+    """
+    評価APIの入力を検証して型を変換する
+
+    Args:
+        data: リクエストのJSONオブジェクト
+
+    Returns:
+        物件情報の辞書（address, land_area, total_floor_area, building_structure, build_year）
+
+    Raises:
+        ValueError: 入力が正しくない場合（メッセージはそのままレスポンスに使う）
+    """
+    if not isinstance(data, dict):
+        raise ValueError('物件情報はJSONオブジェクトで指定してください')
+
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing_fields:
+        raise ValueError(f'必須項目が不足しています: {", ".join(missing_fields)}')
+
+    # データ型の変換
+    try:
+        address = str(data['address']).strip()
+        land_area = float(data['land_area'])
+        total_floor_area = float(data['total_floor_area'])
+        building_structure = str(data['building_structure']).strip()
+        build_year = int(data['build_year'])
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'データ形式が正しくありません: {str(e)}')
+
+    # 値の範囲チェック
+    if land_area <= 0:
+        raise ValueError('土地面積は0より大きい値を入力してください')
+    if total_floor_area <= 0:
+        raise ValueError('延床面積は0より大きい値を入力してください')
+    if build_year < 1900 or build_year > 2025:
+        raise ValueError('建築年は1900年から2025年の範囲で入力してください')
+    if building_structure not in BUILDING_STRUCTURES:
+        raise ValueError('建物構造は「木造」「鉄骨造」「鉄筋コンクリート造」のいずれかを選択してください')
+
+    return {
+        'address': address,
+        'land_area': land_area,
+        'total_floor_area': total_floor_area,
+        'building_structure': building_structure,
+        'build_year': build_year
+    }
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f'JSONとして解析できません: {str(e)}')
+
+
+def read_ndjson(stream, chunk_size=65536):
+    """
+    NDJSONを1行ずつ読み込む（空行は読み飛ばす）
+
+    リクエストのストリームは1行ずつ読むと1バイトずつの読み込みになるため、まとめて読んで行に分ける。
+    解析できない行はその行の結果をエラーにするため、例外を送出せずValueErrorを返す。
+    """
+    rest = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if rest.strip():
+        yield _parse_line(rest)
+
+
+def evaluate_chunk(user_id, items, start_index=0):
+    """
+    物件のチャンクを検証・一括計算し、評価履歴をまとめて保存する
+
+    Args:
+        user_id: 評価したユーザーのID
+        items: 物件のJSONオブジェクト（またはread_ndjsonが返したValueError）のリスト
+        start_index: チャンクの先頭の物件の通し番号
+
+    Returns:
+        物件ごとの結果のリスト
+        （成功: {'index', 'success': True, 'result'}、失敗: {'index', 'success': False, 'error'}）
+    """
+    results = [None] * len(items)
+    properties = []
+    positions = []
+    for position, item in enumerate(items):
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            properties.append(validate_property(item))
+            positions.append(position)
+        except ValueError as e:
+            results[position] = {'index': start_index + position, 'success': False, 'error': str(e)}
+
+    if not properties:
+        return results
+
+    with stage('valuation'):
+        values = calculate_valuations_batch(
+            [p['address'] for p in properties],
+            [p['land_area'] for p in properties],
+            [p['building_structure'] for p in properties],
+            [p['total_floor_area'] for p in properties],
+            [p['build_year'] for p in properties]
+        )
+    land_values = values['land_valuation'].tolist()
+    building_values = values['building_valuation'].tolist()
+    total_values = values['total_valuation'].tolist()
+    road_prices = values['road_price'].tolist()
+
+    # チャンク内の履歴は同じ時刻で登録する（コミット後に読み直さずに済むよう明示する）
+    created_at = datetime.utcnow()
+    histories = [
+        ValuationHistory(
+            user_id=user_id,
+            land_valuation=land_values[i],
+            building_valuation=building_values[i],
+            total_valuation=total_values[i],
+            road_price=road_prices[i],
+            created_at=created_at,
+            **p
+        )
+        for i, p in enumerate(properties)
+    ]
+
+    # 遅延書き込みが有効な場合は、バッファの評価履歴とIDが重ならないよう同じ方法で割り当てる
+    history_buffer = get_default_buffer(current_app._get_current_object())
+    if history_buffer is not None:
+        for history, history_id in zip(histories, history_buffer.ids.allocate(len(histories))):
+            history.id = history_id
+
+    with stage('db'):
+        try:
+            db.session.add_all(histories)
+            db.session.flush()
+
+            for i, (position, p) in enumerate(zip(positions, properties)):
+                result = dict(p)
+                result.update({
+                    'id': histories[i].id,
+                    'land_valuation': int(land_values[i]),
+                    'building_valuation': int(building_values[i]),
+                    'total_valuation': int(total_values[i]),
+                    'road_price': int(road_prices[i]),
+                    'created_at': created_at.isoformat()
+                })
+                results[position] = {'index': start_index + position, 'success': True, 'result': result}
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    invalidate_count(ValuationHistory, user_id)
+
+    # 保存済みの履歴をセッションに溜め込まない
+    for history in histories:
+        db.session.expunge(history)
+
+    return results
+
+
+def evaluate_items(user_id, items, chunk_size=None):
+    """
+    物件をチャンクに分けて順に評価し、物件ごとの結果を入力順に返す（ジェネレーター）
+
+    Args:
+        user_id: 評価したユーザーのID
+        items: 物件のJSONオブジェクトのイテラブル（NDJSONの場合はread_ndjsonの結果）
+        chunk_size: 1回の計算・INSERTで処理する件数（省略時は VALUATION_BATCH_CHUNK_SIZE）
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    iterator = iter(items)
+    start_index = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield from evaluate_chunk(user_id, chunk, start_index)
+        start_index += len(chunk)
@@ -0,0 +1,42 @@
+"""
+評価・OCRの共通モジュールの読み込み
+
+プロジェクトルートの property_data・valuation・ocr_utils・text_parser（Streamlit版の
+app.py・main.py と共通）を、起動時に1回だけ読み込んで各モジュールで共有する。
+リクエストごとに sys.path を変更して関数内でimportすることはしない。
+
+flask_app/app.py がルートの app.py に隠れないよう、プロジェクトルートは
+検索パスの末尾に1回だけ追加する。
+"""
+import os
+import sys
+
+# プロジェクトルートディレクトリを取得
+basedir = os.path.abspath(os.path.dirname(__file__))
+project_root = os.path.dirname(basedir)
+
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# OCR関連モジュールはメインスレッドで読み込んでおく
+# （tesserocrはシグナルハンドラを登録するため、ワーカースレッドでは初回importできない）
+from property_data import PropertyData
+from valuation import (
+    calculate_building_valuation,
+    calculate_land_valuation,
+    calculate_valuations_batch,
+    get_rosenka,
+)
+from ocr_utils import extract_text_from_image
+from text_parser import parse_property_info
+
+__all__ = [
+    'PropertyData',
+    'calculate_building_valuation',
+    'calculate_land_valuation',
+    'calculate_valuations_batch',
+    'extract_text_from_image',
+    'get_rosenka',
+    'parse_property_info',
+    'project_root',
+]
@@ -0,0 +1,234 @@
+"""
+評価履歴の遅延書き込み（グループコミット）
+
+/api/valuate のたびにコミットせず、評価履歴をプロセス内のバッファに溜めて
+件数または時間ごとにまとめて1つのトランザクションでINSERTする。
+SQLiteでは書き込みロックを取り合う回数が、PostgreSQLではコミットごとのfsyncが件数分の1になる。
+
+IDはINSERT前に割り当てるため、レスポンスには従来どおり評価履歴のIDを返せる
+（PostgreSQLではシーケンスからまとめて取得し、それ以外は id_blocks テーブルで範囲を予約する）。
+遅延書き込みを有効にしている間は、一括評価APIの評価履歴も同じ方法でIDを割り当てる。
+
+正常終了時（gunicornのワーカーの停止・再起動を含む）はバッファの残りを書き込んでから終了する。
+プロセスが強制終了された場合は、まだ書き込んでいない評価履歴（最大で VALUATION_HISTORY_FLUSH_SECONDS 秒分）が失われる。
+書き込み前の評価履歴は /history にまだ表示されない。
+
+環境変数:
+    VALUATION_HISTORY_WRITE_BEHIND: 1で遅延書き込みを有効にする（デフォルト: 0）
+    VALUATION_HISTORY_FLUSH_ROWS: この件数が溜まったら書き込む（デフォルト: 200）
+    VALUATION_HISTORY_FLUSH_SECONDS: 溜まり始めてからこの秒数で書き込む（デフォルト: 0.5）
+    VALUATION_HISTORY_ID_BLOCK: 1回に予約するIDの数（デフォルト: 1000）
+"""
+import atexit
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from metrics import stage
+from models import db, IdBlock, ValuationHistory
+from pagination import invalidate_count
+
+WRITE_BEHIND = os.environ.get('VALUATION_HISTORY_WRITE_BEHIND', '0') == '1'
+FLUSH_ROWS = int(os.environ.get('VALUATION_HISTORY_FLUSH_ROWS', 200))
+FLUSH_SECONDS = float(os.environ.get('VALUATION_HISTORY_FLUSH_SECONDS', 0.5))
+ID_BLOCK = int(os.environ.get('VALUATION_HISTORY_ID_BLOCK', 1000))
+
+
+class IdAllocator:
+    """テーブルのIDをまとめて予約し、プロセス内で1つずつ割り当てる"""
+
+    def __init__(self, table, block_size=ID_BLOCK):
+        self.table = table
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+
+    def allocate(self, count=1):
+        """
+        IDを割り当てる（アプリケーションコンテキスト内で呼び出す）
+
+        Returns:
+            割り当てたIDのリスト
+        """
+        with self._lock:
+            while len(self._ids) < count:
+                self._ids.extend(self._reserve(max(self.block_size, count - len(self._ids))))
+            return [self._ids.popleft() for _ in range(count)]
+
+    def _reserve(self, count):
+        """データベースでIDを予約する（他のプロセスと重ならない）"""
+        try:
+            return self._reserve_once(count)
+        except IntegrityError:
+            # 他のプロセスが同時に最初の予約をした場合は予約し直す
+            return self._reserve_once(count)
+
+    def _reserve_once(self, count):
+        table = self.table
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                rows = connection.execute(
+                    text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+                    {'table': table.name, 'count': count}
+                )
+                return [row[0] for row in rows]
+
+            blocks = IdBlock.__table__
+            # 先に行を更新して書き込みロックを取り、他のプロセスと同時に予約しないようにする
+            updated = connection.execute(
+                update(blocks).where(blocks.c.name == table.name).values(next_id=blocks.c.next_id)
+            ).rowcount
+            next_id = 0
+            if updated:
+                next_id = connection.execute(select(blocks.c.next_id).where(blocks.c.name == table.name)).scalar()
+            # 遅延書き込みを無効にしていた間に自動採番で追加された行より後から予約する
+            max_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+            start = max(next_id, max_id + 1)
+
+            if updated:
+                connection.execute(
+                    update(blocks).where(blocks.c.name == table.name).values(next_id=start + count)
+                )
+            else:
+                connection.execute(insert(blocks).values(name=table.name, next_id=start + count))
+        return list(range(start, start + count))
+
+
+class HistoryWriteBuffer:
+    """
+    評価履歴をバッファに溜め、バックグラウンドのスレッドでまとめて書き込む
+
+    件数が max_rows に達するか、最初の1件から max_delay 秒たったら書き込む。
+    """
+
+    def __init__(self, app, max_rows=FLUSH_ROWS, max_delay=FLUSH_SECONDS, id_block=ID_BLOCK):
+        self.app = app
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.ids = IdAllocator(ValuationHistory.__table__, id_block)
+        self._rows = []
+        self._oldest = None
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+
+    def add(self, **values):
+        """
+        評価履歴をバッファに追加する（アプリケーションコンテキスト内で呼び出す）
+
+        Args:
+            values: ValuationHistory の列の値（created_at を省略した場合は現在時刻）
+
+        Returns:
+            (割り当てたID, 作成日時)
+        """
+        row = dict(values)
+        row.setdefault('created_at', datetime.utcnow())
+        row['id'] = self.ids.allocate()[0]
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('評価履歴のバッファは終了しています')
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+            if self._thread is None:
+                # gunicornがワーカーをforkした後、最初の追加でスレッドを起動する
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+            if len(self._rows) >= self.max_rows:
+                self._cond.notify()
+
+        return row['id'], row['created_at']
+
+    def pending(self):
+        """まだ書き込んでいない件数"""
+        with self._cond:
+            return len(self._rows)
+
+    def flush(self):
+        """
+        バッファの評価履歴を1つのトランザクションで書き込む
+
+        書き込めなかった場合はバッファに戻し、例外を送出する。
+
+        Returns:
+            書き込んだ件数
+        """
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                with self.app.app_context(), stage('history_flush'):
+                    with db.engine.begin() as connection:
+                        connection.execute(ValuationHistory.__table__.insert(), rows)
+            except Exception:
+                with self._cond:
+                    self._rows[:0] = rows
+                    self._oldest = time.monotonic()
+                raise
+
+            for user_id in {row['user_id'] for row in rows}:
+                invalidate_count(ValuationHistory, user_id)
+            return len(rows)
+
+    def _run(self):
+        """書き込みスレッド: 件数または時間の条件を満たすまで待ってから書き込む"""
+        while True:
+            with self._cond:
+                while not self._rows and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                while len(self._rows) < self.max_rows and not self._closed:
+                    remaining = self._oldest + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+                time.sleep(self.max_delay)
+
+    def close(self):
+        """新しい追加を止め、バッファの残りを書き込む（正常終了時に呼ばれる）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+_default_buffer = None
+_default_buffer_lock = threading.Lock()
+
+
+def get_default_buffer(app):
+    """
+    プロセス内で共有するバッファを取得（初回呼び出し時に作成）
+
+    Returns:
+        HistoryWriteBuffer（遅延書き込みが無効の場合はNone）
+    """
+    global _default_buffer
+    if not WRITE_BEHIND:
+        return None
+    if _default_buffer is None:
+        with _default_buffer_lock:
+            if _default_buffer is None:
+                _default_buffer = HistoryWriteBuffer(app)
+                atexit.register(_default_buffer.close)
+    return _default_buffer
@@ -0,0 +1,213 @@
+"""
+評価履歴・物件データのエクスポート（CSV / NDJSON / Arrow IPC）
+
+行をまとめて読み込まず、yield_per（PostgreSQLではサーバーサイドカーソル）で
+チャンクごとに取り出してそのまま書き出すため、件数が多くてもメモリ使用量は一定になる。
+HTTPではチャンク転送のレスポンスとして、CLIではファイルに順に書き込む。
+
+Arrow IPC（ストリーム形式）の出力には pyarrow が必要（任意の依存関係）。
+
+環境変数:
+    EXPORT_CHUNK_SIZE: 1回にデータベースから取り出す行数（デフォルト: 1000）
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Property, ValuationHistory
+
+try:
+    import pyarrow
+except ImportError:  # pyarrowは任意の依存関係（Arrow形式で出力する場合のみ必要）
+    pyarrow = None
+
+CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+# エクスポートできるデータ
+MODELS = {
+    'history': ValuationHistory,
+    'properties': Property,
+}
+
+# 形式ごとの (MIMEタイプ, 拡張子)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+}
+
+
+def parse_date(value, end=False):
+    """
+    期間指定の日付・日時を解析する
+
+    日付だけの場合、終了日はその日の終わりまでを含める。
+
+    Raises:
+        ValueError: 日付の形式が正しくない場合
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'日付の形式が正しくありません（YYYY-MM-DD）: {value}')
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def build_query(model, user_id=None, start=None, end=None):
+    """
+    エクスポートするテーブルの列を取り出すクエリ（ID順）
+
+    Args:
+        model: ValuationHistory または Property
+        user_id: ユーザーで絞り込む場合のID
+        start: 作成日時の開始（この日時を含む）
+        end: 作成日時の終了（この日時を含まない）
+    """
+    query = select(*model.__table__.columns)
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    if start is not None:
+        query = query.where(model.created_at >= start)
+    if end is not None:
+        query = query.where(model.created_at < end)
+    return query.order_by(model.id)
+
+
+def iter_row_chunks(query, chunk_size=None):
+    """
+    クエリの結果を行のチャンク（タプルのリスト）ごとに返す（ジェネレーター）
+
+    stream_results によりPostgreSQLではサーバーサイドカーソルを使い、
+    全行をクライアント側に読み込まない。
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns, chunks):
+    """CSV（1行目は列名）をチャンクごとのバイト列で返す"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(columns, chunks):
+    """NDJSON（1行1レコード）をチャンクごとのバイト列で返す"""
+    for rows in chunks:
+        yield ''.join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)},
+                       ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def _arrow_type(column):
+    """SQLAlchemyの列の型に対応するArrowの型"""
+    python_type = column.type.python_type
+    if python_type is bool:
+        return pyarrow.bool_()
+    if python_type is int:
+        return pyarrow.int64()
+    if python_type is float:
+        return pyarrow.float64()
+    if python_type is datetime:
+        return pyarrow.timestamp('us')
+    return pyarrow.string()
+
+
+def iter_arrow(table_columns, chunks):
+    """Arrow IPC（ストリーム形式）をチャンク（レコードバッチ）ごとのバイト列で返す"""
+    if pyarrow is None:
+        raise ValueError('Arrow形式の出力には pyarrow が必要です')
+
+    schema = pyarrow.schema([(column.name, _arrow_type(column)) for column in table_columns])
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()
+    for rows in chunks:
+        arrays = [
+            pyarrow.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(schema)
+        ]
+        writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+def export_chunks(kind, fmt, user_id=None, start=None, end=None, chunk_size=None):
+    """
+    エクスポートの内容をバイト列のチャンクで返す
+
+    Args:
+        kind: 'history'（評価履歴）または 'properties'（物件）
+        fmt: 'csv'、'ndjson' または 'arrow'
+        user_id: ユーザーで絞り込む場合のID
+        start: 作成日時の開始（この日時を含む）
+        end: 作成日時の終了（この日時を含まない）
+        chunk_size: 1回にデータベースから取り出す行数
+
+    Raises:
+        ValueError: データの種類・形式が正しくない場合、Arrow形式でpyarrowがない場合
+    """
+    if kind not in MODELS:
+        raise ValueError(f'データの種類は {", ".join(MODELS)} のいずれかを指定してください')
+    if fmt not in FORMATS:
+        raise ValueError(f'形式は {", ".join(FORMATS)} のいずれかを指定してください')
+    if fmt == 'arrow' and pyarrow is None:
+        raise ValueError('Arrow形式の出力には pyarrow が必要です')
+
+    model = MODELS[kind]
+    table_columns = list(model.__table__.columns)
+    chunks = iter_row_chunks(build_query(model, user_id, start, end), chunk_size)
+
+    if fmt == 'csv':
+        return iter_csv([column.name for column in table_columns], chunks)
+    if fmt == 'ndjson':
+        return iter_ndjson([column.name for column in table_columns], chunks)
+    return iter_arrow(table_columns, chunks)
+
+
+def export_filename(kind, fmt, start=None, end=None):
+    """ダウンロード時のファイル名"""
+    parts = [kind]
+    if start is not None:
+        parts.append(start.strftime('%Y%m%d'))
+    if end is not None:
+        parts.append((end - timedelta(microseconds=1)).strftime('%Y%m%d'))
+    return f"{'_'.join(parts)}.{FORMATS[fmt][1]}"
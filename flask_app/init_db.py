@@ -3,7 +3,7 @@
 """
 import os
 from app import app, db
-from models import User, Property
+from models import User, Property, create_missing_indexes
 
 
 def init_database():
@@ -19,6 +19,10 @@ def init_database():
         db.create_all()
         print('✓ データベーステーブルを作成しました。')
 
+        # 既存のテーブルには、後から追加したインデックスを作成する
+        for name in create_missing_indexes():
+            print(f'✓ インデックスを作成しました: {name}')
+
         # 初期データの投入（オプション）
         # 既にユーザーが存在する場合はスキップ
         if User.query.count() == 0:
@@ -0,0 +1,245 @@
+"""
+ワーカーのメモリ使用量の診断
+
+大きな画像のアップロードを繰り返すとワーカーのRSSが増えていく原因を調べるため、
+管理者が /admin/memory から次の操作をできるようにする（計測は応答したワーカーで行う）。
+
+- tracemalloc の開始・停止（起動時から有効にする場合は PYTHONTRACEMALLOC=10 で起動する）
+- スナップショットの取得と、確保したメモリの多い箇所（上位N件）の一覧
+- 2つのスナップショットの差分（どこで増えたか）
+
+スナップショットは MEMORY_SNAPSHOT_DIR にファイルとして保存するため、
+一覧・差分はどのワーカーが応答しても、取得したワーカーが再起動した後でも確認できる。
+
+すべてのリクエストで、処理後のRSSとプロセスの最大RSS、そのリクエスト中の最大RSSの増加分を
+リクエストごとのJSONログ（metrics.py）に記録する。最大RSSはプロセス全体の値のため、
+複数スレッドで処理している場合は同時に処理したリクエストの分も含む。
+
+MEMORY_LIMIT_MB を設定すると、レスポンスを送り終えた時点のRSSがこれを超えたワーカーは
+gunicornに終了を通知し（SIGTERM）、処理中のリクエストを終えてから新しいワーカーに入れ替わる。
+
+環境変数:
+    MEMORY_LIMIT_MB: ワーカーを入れ替えるRSSの上限（MB、デフォルト: 0 で入れ替えない）
+    MEMORY_SNAPSHOT_DIR: スナップショットの保存先（デフォルト: data/memory）
+    MEMORY_SNAPSHOT_KEEP: 保存しておくスナップショットの数（デフォルト: 10）
+    TRACEMALLOC_FRAMES: tracemalloc を開始するときに記録する呼び出し元の数（デフォルト: 10）
+"""
+import os
+import re
+import signal
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from flask import g, request
+
+from core import project_root
+from metrics import annotate
+from profiler import short_path
+
+try:
+    import resource
+except ImportError:  # Windowsでは最大RSSを記録しない
+    resource = None
+
+MEMORY_LIMIT_MB = float(os.environ.get('MEMORY_LIMIT_MB', 0))
+SNAPSHOT_DIR = os.environ.get('MEMORY_SNAPSHOT_DIR') or os.path.join(project_root, 'data', 'memory')
+SNAPSHOT_KEEP = int(os.environ.get('MEMORY_SNAPSHOT_KEEP', 10))
+TRACEMALLOC_FRAMES = int(os.environ.get('TRACEMALLOC_FRAMES', 10))
+
+GROUP_BY = ('lineno', 'filename', 'traceback')
+SNAPSHOT_ID_PATTERN = re.compile(r'^\d+-\d{8}-\d{6}-\d{3}$')
+SNAPSHOT_SUFFIX = '.tracemalloc'
+
+MB = 1024 * 1024
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# tracemalloc 自体とモジュールの読み込みによる確保は一覧に出さない
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_recycling = False
+
+
+def current_rss():
+    """現在のRSS（バイト、取得できない場合はNone）"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """プロセス開始からの最大RSS（バイト、取得できない場合はNone）"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト単位
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _mb(value):
+    return None if value is None else round(value / MB, 1)
+
+
+def status():
+    """このプロセスのメモリ使用量と tracemalloc の状態"""
+    state = {
+        'pid': os.getpid(),
+        'rss_mb': _mb(current_rss()),
+        'max_rss_mb': _mb(peak_rss()),
+        'limit_mb': MEMORY_LIMIT_MB or None,
+        'tracing': tracemalloc.is_tracing(),
+        'snapshots': list_snapshots(),
+    }
+    if state['tracing']:
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        state.update(traced_mb=_mb(traced), traced_peak_mb=_mb(traced_peak),
+                     frames=tracemalloc.get_traceback_limit())
+    return state
+
+
+def start_tracing(frames=TRACEMALLOC_FRAMES):
+    """tracemalloc を開始する（開始後に確保されたメモリだけが記録される）"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    """tracemalloc を停止する（記録していた分のメモリも解放される）"""
+    tracemalloc.stop()
+
+
+def take_snapshot(directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """
+    スナップショットを取得してファイルに保存する
+
+    Returns:
+        (スナップショットID, スナップショット)
+
+    Raises:
+        RuntimeError: tracemalloc を開始していない場合
+    """
+    if not tracemalloc.is_tracing():
+        raise RuntimeError(f'このプロセス（pid {os.getpid()}）では tracemalloc を開始していません')
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    now = datetime.now()
+    snapshot_id = f'{os.getpid()}-{now:%Y%m%d-%H%M%S}-{now.microsecond // 1000:03d}'
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    os.close(fd)
+    try:
+        snapshot.dump(tmp_path)
+        os.replace(tmp_path, os.path.join(directory, snapshot_id + SNAPSHOT_SUFFIX))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    # 古いスナップショットから削除する（1つ数MBになることがある）
+    for old_id in list_snapshots(directory)[keep:]:
+        os.unlink(os.path.join(directory, old_id + SNAPSHOT_SUFFIX))
+    return snapshot_id, snapshot
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """保存済みのスナップショットID（全プロセス分、新しい順）"""
+    if not os.path.isdir(directory):
+        return []
+    names = [name[:-len(SNAPSHOT_SUFFIX)] for name in os.listdir(directory) if name.endswith(SNAPSHOT_SUFFIX)]
+    # 手で置いたファイルなど、IDの形式でないものは一覧に含めない
+    names = [name for name in names if SNAPSHOT_ID_PATTERN.match(name)]
+    # IDの日時部分で並べる
+    return sorted(names, key=lambda name: name.split('-', 1)[1], reverse=True)
+
+
+def load_snapshot(snapshot_id, directory=SNAPSHOT_DIR):
+    """
+    保存済みのスナップショットを読み込む
+
+    Raises:
+        ValueError: IDの形式が正しくない場合
+        FileNotFoundError: スナップショットがない場合
+    """
+    if not SNAPSHOT_ID_PATTERN.match(snapshot_id or ''):
+        raise ValueError(f'スナップショットIDが正しくありません: {snapshot_id}')
+    return tracemalloc.Snapshot.load(os.path.join(directory, snapshot_id + SNAPSHOT_SUFFIX))
+
+
+def _site(frame):
+    return f'{short_path(frame.filename)}:{frame.lineno}'
+
+
+def _stat_entry(stat, group_by):
+    """統計1件を辞書にする（traceback の場合は呼び出し元から順に並べる）"""
+    frame = stat.traceback[-1]
+    entry = {
+        'site': short_path(frame.filename) if group_by == 'filename' else _site(frame),
+        'size_kb': round(stat.size / 1024, 1),
+        'count': stat.count,
+    }
+    if hasattr(stat, 'size_diff'):
+        entry['size_diff_kb'] = round(stat.size_diff / 1024, 1)
+        entry['count_diff'] = stat.count_diff
+    if group_by == 'traceback':
+        entry['traceback'] = [_site(item) for item in stat.traceback]
+    return entry
+
+
+def top_allocations(snapshot, limit=20, group_by='lineno'):
+    """確保しているメモリの多い箇所（上位 limit 件）"""
+    return [_stat_entry(stat, group_by) for stat in snapshot.statistics(group_by)[:limit]]
+
+
+def diff_allocations(old, new, limit=20, group_by='lineno'):
+    """old から new までにメモリの増減が大きかった箇所（上位 limit 件）"""
+    return [_stat_entry(stat, group_by) for stat in new.compare_to(old, group_by)[:limit]]
+
+
+def _recycle(rss, under_gunicorn):
+    """RSSの上限を超えたワーカーを入れ替える（レスポンスを送り終えた後に呼ばれる）"""
+    global _recycling
+    if _recycling:
+        return
+    _recycling = True
+    print(f'ワーカー（pid {os.getpid()}）のRSS {rss / MB:.0f}MB が MEMORY_LIMIT_MB（{MEMORY_LIMIT_MB:g}MB）を'
+          f'超えました' + ('。ワーカーを入れ替えます' if under_gunicorn else ''), file=sys.stderr)
+    if under_gunicorn:
+        # gunicornのワーカーは処理中のリクエストを終えてから終了し、マスターが新しいワーカーを起動する
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def init_app(app):
+    """
+    リクエストごとのRSSの記録と、上限を超えたワーカーの入れ替えを登録する
+
+    リクエストのJSONログに項目を加えるため、metrics.init_app より後に呼び出す
+    （after_request は登録と逆の順に実行される）。
+    """
+
+    @app.before_request
+    def _record_peak_rss():
+        g.max_rss_before = peak_rss()
+
+    @app.after_request
+    def _check_rss(response):
+        rss = current_rss()
+        peak = peak_rss()
+        before = g.get('max_rss_before')
+        annotate(
+            rss_mb=_mb(rss),
+            max_rss_mb=_mb(peak),
+            max_rss_growth_mb=_mb(peak - before) if peak is not None and before is not None else None,
+        )
+        if MEMORY_LIMIT_MB and rss is not None and rss > MEMORY_LIMIT_MB * MB and not _recycling:
+            under_gunicorn = request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+            response.call_on_close(lambda: _recycle(rss, under_gunicorn))
+        return response
@@ -0,0 +1,408 @@
+"""
+ルート・処理段階ごとの処理時間の計測
+
+メトリクス（Prometheusのテキスト形式で /metrics に出力）、レスポンスの Server-Timing ヘッダー、
+リクエストごとに1行のJSONログの3つに、同じ処理段階の計測結果を使う。
+
+リクエスト全体（ルート・メソッド・ステータスごと）と、処理段階
+（decode: 画像の読み込み・前処理、ocr: OCR、parse: 入力・テキストの解析、
+valuation: 路線価の取得・評価額の計算、db: データベースへの保存）ごとの処理時間をヒストグラムに記録する。
+
+記録はプロセス内のメモリに行い（ロック1回と配列の加算のみ）、
+METRICS_FLUSH_SECONDS ごとにプロセスごとのファイルに書き出す。/metrics は
+すべてのプロセス（gunicornのワーカー）のファイルを合算して返すため、どのワーカーが応答しても同じ値になる。
+終了したワーカーのファイルは合算済みのファイル（archive.json）にまとめる。
+
+各レスポンスには処理段階ごとの時間（ミリ秒）を Server-Timing ヘッダーで、リクエストIDを
+X-Request-ID ヘッダーで返す（リクエストに X-Request-ID があればそれを使う）。
+同じ内訳は、レスポンスを送り終えた時点でリクエストIDとともにJSONの1行として
+標準エラー出力（ロガー roadprice.request）に書き出す。
+
+環境変数:
+    METRICS_ENABLED: 0で計測しない（デフォルト: 1）
+    METRICS_DIR: プロセスごとのファイルを置くディレクトリ（デフォルト: data/metrics）
+        全ワーカーで同じディレクトリを指定する。サーバーを起動し直すたびに数値を0から始める場合は空にしておく。
+    METRICS_FLUSH_SECONDS: ファイルに書き出す間隔（デフォルト: 1）
+    SERVER_TIMING_ENABLED: 0で Server-Timing ヘッダーを付けない（デフォルト: 1）
+    REQUEST_LOG_ENABLED: 0でリクエストごとのJSONログを書き出さない（デフォルト: 1）
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request, session
+
+from core import project_root
+
+try:
+    import fcntl
+except ImportError:  # Windowsでは終了したワーカーのファイルをまとめない
+    fcntl = None
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(project_root, 'data', 'metrics')
+FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1))
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '1') != '0'
+REQUEST_LOG_ENABLED = os.environ.get('REQUEST_LOG_ENABLED', '1') != '0'
+
+# 受け取ったリクエストIDをそのまま使う形式（それ以外は新しく作成する）
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+# ヒストグラムのバケットの上限（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_METRIC = 'roadprice_http_request_duration_seconds'
+STAGE_METRIC = 'roadprice_stage_duration_seconds'
+
+HELP = {
+    REQUEST_METRIC: 'リクエストの処理時間（秒）',
+    STAGE_METRIC: '処理段階ごとの処理時間（秒）',
+}
+
+ARCHIVE_NAME = 'archive.json'
+
+logger = logging.getLogger('roadprice.metrics')
+
+
+def _merge(series, other):
+    """ヒストグラムの系列を加算する（{(名前, ラベル): [バケットごとの件数..., 合計]}）"""
+    for key, values in other.items():
+        current = series.get(key)
+        if current is None:
+            series[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                current[i] += value
+
+
+def _dump(series):
+    return [[name, [list(label) for label in labels], values] for (name, labels), values in series.items()]
+
+
+def _load(data):
+    return {(name, tuple(tuple(label) for label in labels)): values for name, labels, values in data}
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return _load(json.load(f))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, series):
+    """一時ファイルに書いてから置き換える（読み込み中のプロセスに途中の内容を見せない）"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(_dump(series), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metrics:
+    """プロセス内のヒストグラムと、プロセスごとのファイルへの書き出し・合算"""
+
+    def __init__(self, directory=None, flush_seconds=FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._write_failed = False
+        self._reset()
+
+    def _reset(self):
+        # forkされた子プロセスでは親の記録を引き継がず、別のファイルに書き出す
+        self._pid = os.getpid()
+        self._series = {}
+        self._last_flush = time.monotonic()
+        self._path = None
+        if self.directory:
+            self._path = os.path.join(self.directory, f'{self._pid}-{time.time_ns()}.json')
+
+    def observe(self, name, labels, seconds):
+        """
+        処理時間をヒストグラムに記録する
+
+        Args:
+            name: メトリクス名
+            labels: ラベルの (名前, 値) のタプル
+            seconds: 処理時間（秒）
+        """
+        flush = False
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            values = self._series.get((name, labels))
+            if values is None:
+                # バケットごとの件数（最後は+Inf）と合計
+                values = self._series[(name, labels)] = [0] * (len(BUCKETS) + 1) + [0.0]
+            values[bisect_left(BUCKETS, seconds)] += 1
+            values[-1] += seconds
+            now = time.monotonic()
+            if self._path and now - self._last_flush >= self.flush_seconds:
+                self._last_flush = now
+                flush = True
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        """このプロセスの記録のコピー"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            return {key: list(values) for key, values in self._series.items()}
+
+    def flush(self):
+        """
+        このプロセスの記録をファイルに書き出す
+
+        書き出せない場合（書き込めないディレクトリ・ディスクの空き不足など）は警告を記録するだけで、
+        リクエストの処理は失敗させない（記録はメモリに残り、次の書き出しで再度試す）。
+        """
+        if not self._path:
+            return
+        series = self.snapshot()
+        if not series:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_json(self._path, series)
+        except OSError as e:
+            # 書き出せるようになるまで、警告は最初の1回だけ記録する
+            if not self._write_failed:
+                self._write_failed = True
+                logger.warning('メトリクスを書き出せませんでした（%s）: %s', self.directory, e)
+        else:
+            self._write_failed = False
+
+    def collect(self):
+        """
+        すべてのプロセスの記録を合算する
+
+        Returns:
+            {(メトリクス名, ラベル): [バケットごとの件数..., 合計]}
+        """
+        if not self._path:
+            return self.snapshot()
+
+        self.flush()
+        series = {}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._directory_lock() as lock_file:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    self._archive_finished()
+                    # 読み込みの間は他のプロセスにまとめさせない（まとめる途中のファイルを二重に数えたり、
+                    # 読み落としたりすると、合計が減ってPrometheusではカウンターのリセットに見える）
+                    fcntl.flock(lock_file, fcntl.LOCK_SH)
+                for name in os.listdir(self.directory):
+                    if name.endswith('.json') and not name.startswith('.'):
+                        path = os.path.join(self.directory, name)
+                        if path != self._path:
+                            _merge(series, _read_json(path))
+        except OSError as e:
+            # ディレクトリを使えない場合は、このプロセスの記録だけを返す
+            logger.warning('メトリクスのファイルを読み込めませんでした（%s）: %s', self.directory, e)
+            series = {}
+        # このプロセスの分はファイルではなくメモリの最新の記録を使う
+        _merge(series, self.snapshot())
+        return series
+
+    @contextmanager
+    def _directory_lock(self):
+        """ディレクトリのロックファイル（fcntl がない環境ではNoneでロックしない）"""
+        if fcntl is None:
+            yield None
+            return
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            yield lock_file
+
+    def _archive_finished(self):
+        """終了したプロセスのファイルを合算済みのファイルにまとめる（ロックファイルを排他ロックして呼び出す）"""
+        finished = []
+        for name in os.listdir(self.directory):
+            pid = name.split('-', 1)[0]
+            if name.endswith('.json') and pid.isdigit() and not _pid_alive(int(pid)):
+                finished.append(os.path.join(self.directory, name))
+        if not finished:
+            return
+
+        archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+        archive = _read_json(archive_path)
+        for path in finished:
+            _merge(archive, _read_json(path))
+        _write_json(archive_path, archive)
+        for path in finished:
+            os.unlink(path)
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(series):
+    """ヒストグラムをPrometheusのテキスト形式（version 0.0.4）で出力する"""
+    lines = []
+    for metric in sorted({name for name, _ in series}):
+        lines.append(f'# HELP {metric} {HELP.get(metric, metric)}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, labels), values in sorted(series.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), values):
+                cumulative += count
+                label = _format_labels(labels + (('le', bound),))
+                lines.append(f'{metric}_bucket{{{label}}} {cumulative}')
+            label = _format_labels(labels)
+            lines.append(f'{metric}_sum{{{label}}} {values[-1]}')
+            lines.append(f'{metric}_count{{{label}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+_metrics = Metrics(METRICS_DIR if ENABLED else None)
+atexit.register(_metrics.flush)
+
+
+def current_route():
+    """メトリクスのラベルにするルート（URLではなくルールなので種類が増えない）"""
+    if not has_request_context():
+        return 'background'
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+@contextmanager
+def stage(name):
+    """
+    処理段階の時間を計測するコンテキストマネージャー
+
+    例外が発生した場合も計測する。リクエスト内では、そのリクエストの内訳
+    （Server-Timing・JSONログ）にも加える（同じ段階が複数回あれば合計する）。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        in_request = has_request_context()
+        if in_request:
+            timings = g.get('stage_timings')
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + elapsed
+        if ENABLED:
+            route = current_route() if in_request else 'background'
+            _metrics.observe(STAGE_METRIC, (('route', route), ('stage', name)), elapsed)
+
+
+def annotate(**fields):
+    """リクエストのJSONログに項目を追加する（例: 入力方法）"""
+    if has_request_context():
+        g.setdefault('log_fields', {}).update(fields)
+
+
+def server_timing(timings, total):
+    """Server-Timing ヘッダーの値（処理段階ごとと全体の時間、ミリ秒）"""
+    entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def _request_logger():
+    """リクエストごとのJSONログのロガー（メッセージだけを標準エラー出力に書き出す）"""
+    logger = logging.getLogger('roadprice.request')
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+request_logger = _request_logger() if REQUEST_LOG_ENABLED else None
+
+
+def _log_request(entry, timings, start):
+    """レスポンスを送り終えた時点の処理時間でJSONログを1行書き出す"""
+    entry['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    entry['stages'] = {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+    request_logger.info(json.dumps(entry, ensure_ascii=False))
+
+
+def init_app(app):
+    """リクエストの処理時間の記録（メトリクス・Server-Timing・JSONログ）と /metrics を登録する"""
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+        g.stage_timings = {}
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID_PATTERN.match(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = current_route()
+        timings = g.stage_timings
+
+        if ENABLED:
+            _metrics.observe(
+                REQUEST_METRIC,
+                (('method', request.method), ('route', route), ('status', str(response.status_code))),
+                elapsed
+            )
+        response.headers['X-Request-ID'] = g.request_id
+        if SERVER_TIMING_ENABLED:
+            # ストリーミングのレスポンスでは本文を送る前までの時間になる
+            response.headers['Server-Timing'] = server_timing(timings, elapsed)
+        if request_logger is not None:
+            entry = {
+                'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'request_id': g.request_id,
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'user_id': session.get('_user_id'),
+            }
+            entry.update(g.get('log_fields', {}))
+            response.call_on_close(lambda: _log_request(entry, timings, start))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheusのテキスト形式のメトリクス（全ワーカーの合算）"""
+        return render(_metrics.collect()), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
@@ -4,7 +4,9 @@
 from datetime import datetime, timedelta
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+import json
 import secrets
+import uuid
 
 db = SQLAlchemy()
 
@@ -38,6 +40,10 @@ class User(UserMixin, db.Model):
 class Property(db.Model):
     """物件情報モデル（将来的な拡張用）"""
     __tablename__ = 'properties'
+    __table_args__ = (
+        # ダッシュボードのキーセットページネーション（ユーザーごとに新しい順）用
+        db.Index('ix_properties_user_created', 'user_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -123,9 +129,14 @@ class LoginToken(db.Model):
 class ValuationHistory(db.Model):
     """評価履歴モデル"""
     __tablename__ = 'valuation_history'
+    __table_args__ = (
+        # 評価履歴のキーセットページネーション（ユーザーごとに新しい順）用
+        # user_id単独の検索もこのインデックスで行う
+        db.Index('ix_valuation_history_user_created', 'user_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     # 物件情報
     address = db.Column(db.String(200), nullable=False)
@@ -165,3 +176,84 @@ class ValuationHistory(db.Model):
             'road_price': int(self.road_price),
             'created_at': self.created_at.isoformat()
         }
+
+
+def create_missing_indexes():
+    """
+    既存のテーブルに、モデルで定義したインデックスのうち未作成のものを作成する
+
+    db.create_all() は既存のテーブルにインデックスを追加しないため、
+    モデルにインデックスを追加した後は init-db で実行する。
+
+    Returns:
+        作成したインデックス名のリスト
+    """
+    created = []
+    existing_tables = set(db.inspect(db.engine).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in db.inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+
+class OCRJob(db.Model):
+    """画像アップロードによる評価のバックグラウンドジョブ"""
+    __tablename__ = 'ocr_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # 状態（queued / running / succeeded / failed）
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 進捗（0-100）
+    stage = db.Column(db.String(100))  # 現在の処理内容
+    result = db.Column(db.Text)  # 評価結果（JSON）
+    error = db.Column(db.Text)  # エラーメッセージ
+
+    # タイムスタンプ
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # リレーション
+    user = db.relationship('User', backref=db.backref('ocr_jobs', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<OCRJob {self.id} {self.status}>'
+
+    def is_finished(self):
+        """ジョブが完了（成功または失敗）しているかチェック"""
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'stage': self.stage,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class IdBlock(db.Model):
+    """
+    事前に割り当てたIDの範囲（テーブルごとの次に割り当てるID）
+
+    評価履歴の遅延書き込み（history_buffer.py）で、INSERT前にIDを返すために使う。
+    PostgreSQLではシーケンスから割り当てるため使わない。
+    """
+    __tablename__ = 'id_blocks'
+
+    name = db.Column(db.String(50), primary_key=True)  # テーブル名
+    next_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<IdBlock {self.name} {self.next_id}>'
@@ -0,0 +1,238 @@
+"""
+画像アップロードによる評価のバックグラウンド処理
+
+アップロード直後にジョブIDを返し、OCR・テキスト解析・評価額計算は
+ワーカースレッドで実行する。ジョブの状態はデータベース（OCRJob）に保存するため、
+どのgunicornワーカーでも進捗を参照できる。
+
+環境変数:
+    OCR_JOB_WORKERS: 1プロセスあたりのワーカースレッド数（デフォルト: 2）
+    OCR_JOB_STALE_SECONDS: 更新が止まったジョブを失敗扱いにするまでの秒数（デフォルト: 600）
+
+順番待ちのジョブは、同じプロセスのワーカースレッドが状態を更新するたびに更新日時を進めるため、
+処理が混んで待ち時間が長くなっても失敗扱いにはならない（プロセスが停止した場合だけ失敗扱いになる）。
+ワーカースレッドは順番待ちのジョブだけを条件付きで running にし、その後の更新も running の
+ときだけ行うため、失敗扱いにしたジョブが後から実行されたり、結果で上書きされたりすることはない。
+"""
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from core import (
+    PropertyData,
+    calculate_building_valuation,
+    calculate_land_valuation,
+    extract_text_from_image,
+    get_rosenka,
+    parse_property_info,
+)
+from metrics import stage
+from models import db, OCRJob
+
+STALE_SECONDS = int(os.environ.get('OCR_JOB_STALE_SECONDS', 600))
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('OCR_JOB_WORKERS', 2)),
+    thread_name_prefix='ocr-job'
+)
+
+# このプロセスで順番待ちのジョブID
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def extract_property_info(image_file):
+    """
+    画像から物件情報を抽出する
+
+    Args:
+        image_file: 画像のバイト列、ファイルオブジェクトまたはファイルパス
+
+    Returns:
+        物件情報の辞書（address, land_area, total_floor_area, building_structure, build_year）
+
+    Raises:
+        ValueError: 必要な情報を抽出できなかった場合
+    """
+    extracted_text = extract_text_from_image(image_file, stage_timer=stage)
+    with stage('parse'):
+        property_info = parse_property_info(extracted_text)
+
+    # パース結果を確認
+    if not all([property_info.get('address'),
+               property_info.get('land_area'),
+               property_info.get('total_floor_area'),
+               property_info.get('building_structure'),
+               property_info.get('build_year')]):
+        raise ValueError('必要な情報を画像から抽出できませんでした。手動入力をお試しください。')
+
+    return {
+        'address': property_info['address'],
+        'land_area': float(property_info['land_area']),
+        'total_floor_area': float(property_info['total_floor_area']),
+        'building_structure': property_info['building_structure'],
+        'build_year': int(property_info['build_year'])
+    }
+
+
+def calculate_valuation_result(address, land_area, total_floor_area, building_structure, build_year):
+    """
+    評価額を計算して結果の辞書を作成する
+
+    Returns:
+        /valuation のレスポンスと同じ形式の評価結果
+    """
+    with stage('valuation'):
+        property_data = PropertyData(
+            address=address,
+            land_area=land_area,
+            building_structure=building_structure,
+            total_floor_area=total_floor_area,
+            build_year=build_year
+        )
+
+        # 路線価は1回だけ取得して評価と結果の両方に使う
+        road_price = get_rosenka(address)
+        land_value = calculate_land_valuation(property_data, road_price)
+        building_value = calculate_building_valuation(property_data)
+        total_value = land_value + building_value
+
+    return {
+        'address': address,
+        'land_area': land_area,
+        'total_floor_area': total_floor_area,
+        'building_structure': building_structure,
+        'build_year': build_year,
+        'land_valuation': int(land_value),
+        'building_valuation': int(building_value),
+        'total_valuation': int(total_value),
+        'road_price': int(road_price)
+    }
+
+
+def _touch_queued():
+    """このプロセスで順番待ちのジョブの更新日時を進める（コミットは呼び出し側で行う）"""
+    with _queued_lock:
+        job_ids = list(_queued)
+    if job_ids:
+        db.session.execute(
+            update(OCRJob).where(OCRJob.id.in_(job_ids), OCRJob.status == 'queued')
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _update(job_id, **fields):
+    """
+    実行中のジョブの状態を更新してコミット
+
+    Returns:
+        更新した場合はTrue（実行中に失敗扱いにされていた場合はFalse）
+    """
+    updated = db.session.execute(
+        update(OCRJob).where(OCRJob.id == job_id, OCRJob.status == 'running')
+        .values(updated_at=datetime.utcnow(), **fields)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    _touch_queued()
+    db.session.commit()
+    return updated == 1
+
+
+def _claim(job_id):
+    """
+    順番待ちのジョブを running にする
+
+    Returns:
+        running にした場合はTrue（失敗扱いにされていた場合などはFalse）
+    """
+    with _queued_lock:
+        _queued.discard(job_id)
+    claimed = db.session.execute(
+        update(OCRJob).where(OCRJob.id == job_id, OCRJob.status == 'queued')
+        .values(status='running', progress=10, stage='画像からテキストを抽出しています',
+                updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    _touch_queued()
+    db.session.commit()
+    return claimed == 1
+
+
+def run_ocr_job(app, job_id, image_bytes):
+    """ワーカースレッドでOCR→解析→評価額計算を実行"""
+    with app.app_context():
+        try:
+            if not _claim(job_id):
+                return
+
+            try:
+                property_info = extract_property_info(image_bytes)
+
+                if not _update(job_id, progress=70, stage='評価額を計算しています'):
+                    return
+                result = calculate_valuation_result(**property_info)
+
+                _update(job_id, status='succeeded', progress=100, stage='完了',
+                        result=json.dumps(result, ensure_ascii=False))
+
+            except ValueError as e:
+                db.session.rollback()
+                _update(job_id, status='failed', progress=100, stage='失敗', error=str(e))
+            except Exception as e:
+                traceback.print_exc()
+                db.session.rollback()
+                _update(job_id, status='failed', progress=100, stage='失敗', error=str(e))
+        finally:
+            db.session.remove()
+
+
+def submit_ocr_job(app, user_id, image_bytes):
+    """
+    ジョブを登録してワーカースレッドに投入する
+
+    アップロード画像はディスクに保存せず、メモリ上のバイト列のまま渡す。
+
+    Returns:
+        登録したOCRJob
+    """
+    job = OCRJob(user_id=user_id, status='queued', progress=0, stage='順番待ちです')
+    db.session.add(job)
+    db.session.commit()
+
+    with _queued_lock:
+        _queued.add(job.id)
+    executor.submit(run_ocr_job, app, job.id, image_bytes)
+    return job
+
+
+def expire_if_stale(job):
+    """
+    ワーカーの再起動などで更新が止まったジョブを失敗扱いにする
+
+    確認した後にワーカースレッドが実行を始めた場合は失敗扱いにしない（状態と更新日時が
+    変わっていないときだけ更新する）。
+
+    Returns:
+        失敗扱いにした場合はTrue
+    """
+    if job.is_finished():
+        return False
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    if job.updated_at > cutoff:
+        return False
+
+    expired = db.session.execute(
+        update(OCRJob).where(OCRJob.id == job.id, OCRJob.status == job.status, OCRJob.updated_at <= cutoff)
+        .values(status='failed', progress=100, stage='失敗',
+                error='処理が中断されました。もう一度アップロードしてください。')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    db.session.refresh(job)
+    return expired == 1
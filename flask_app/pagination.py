@@ -0,0 +1,149 @@
+"""
+キーセット（シーク）方式のページネーション
+
+OFFSETで読み飛ばす代わりに、前のページの最後の行の (created_at, id) より
+後の行を複合インデックス (user_id, created_at, id) で直接探すため、
+何ページ目でも1ページ目と同じ速さで表示できる。
+
+総件数は COUNT(*) を毎回実行せず、ユーザーごとに一定時間キャッシュする。
+
+環境変数:
+    PAGINATION_COUNT_CACHE_SECONDS: 総件数をキャッシュする秒数（デフォルト: 60）
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, or_, select
+
+from models import db
+
+COUNT_CACHE_SECONDS = float(os.environ.get('PAGINATION_COUNT_CACHE_SECONDS', 60))
+
+
+def encode_cursor(row):
+    """行の位置を表すカーソル（URLのクエリに使う文字列）"""
+    return f'{row.created_at.isoformat()}_{row.id}'
+
+
+def decode_cursor(cursor):
+    """
+    カーソルを (created_at, id) に戻す
+
+    Raises:
+        ValueError: カーソルの形式が正しくない場合
+    """
+    created_at, _, row_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+class KeysetPage:
+    """キーセット方式の1ページ分の結果（新しい順）"""
+
+    def __init__(self, items, has_prev, has_next, total):
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+
+    @property
+    def prev_cursor(self):
+        """前（新しい側）のページを取得するカーソル"""
+        return encode_cursor(self.items[0]) if self.has_prev and self.items else None
+
+    @property
+    def next_cursor(self):
+        """次（古い側）のページを取得するカーソル"""
+        return encode_cursor(self.items[-1]) if self.has_next and self.items else None
+
+
+class _CountCache:
+    """ユーザーごとの総件数のキャッシュ（プロセス内）"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(key)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        count = compute()
+        with self._lock:
+            self._counts[key] = (count, now)
+        return count
+
+    def invalidate(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+_count_cache = _CountCache(COUNT_CACHE_SECONDS)
+
+
+def count_for_user(model, user_id):
+    """ユーザーの行数（一定時間キャッシュする）"""
+    return _count_cache.get(
+        (model.__tablename__, user_id),
+        lambda: db.session.execute(
+            select(func.count()).select_from(model).where(model.user_id == user_id)
+        ).scalar()
+    )
+
+
+def invalidate_count(model, user_id):
+    """行を追加・削除したユーザーのキャッシュした行数を破棄する（このプロセスのみ）"""
+    _count_cache.invalidate((model.__tablename__, user_id))
+
+
+def keyset_paginate(model, user_id, per_page=20, after=None, before=None):
+    """
+    ユーザーの行を新しい順 (created_at DESC, id DESC) にキーセット方式で取得する
+
+    Args:
+        model: user_id・created_at・id 列を持つモデル
+        user_id: ユーザーのID
+        per_page: 1ページの件数
+        after: このカーソルより古い行を取得する（次のページ）
+        before: このカーソルより新しい行を取得する（前のページ）
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        ValueError: カーソルの形式が正しくない場合
+    """
+    query = select(model).where(model.user_id == user_id)
+
+    if before is not None:
+        created_at, row_id = decode_cursor(before)
+        # created_at の範囲条件をインデックスで絞り込み、同時刻の行だけidで比較する
+        query = query.where(
+            model.created_at >= created_at,
+            or_(model.created_at > created_at, model.id > row_id)
+        ).order_by(model.created_at.asc(), model.id.asc())
+    else:
+        if after is not None:
+            created_at, row_id = decode_cursor(after)
+            query = query.where(
+                model.created_at <= created_at,
+                or_(model.created_at < created_at, model.id < row_id)
+            )
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    # 1件多く取得して、その先のページがあるかを判定する
+    rows = db.session.execute(query.limit(per_page + 1)).scalars().all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    return KeysetPage(rows, has_prev, has_next, count_for_user(model, user_id))
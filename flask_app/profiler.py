@@ -0,0 +1,242 @@
+"""
+本番ワーカーのサンプリングプロファイラ
+
+管理者が /admin/profiler から開始すると、そのリクエストを処理したプロセス（gunicornのワーカー1つ）で
+バックグラウンドのスレッドが PROFILER_INTERVAL ごとに全スレッドのスタックを記録する。
+指定した秒数が経つか、指定した件数のリクエストを処理し終えると停止し、
+同じスタックの回数をまとめた collapsed stack 形式（flamegraph.pl・speedscope でフレームグラフにできる）で
+PROFILER_DIR/<pid>-<日時>.folded に書き出す。サーバーの再起動は不要。
+
+計測中も対象のスレッドは止めない。サンプリング1回は sys._current_frames() でフレームをたどり、
+コードオブジェクトの組を数えるだけで、関数名などの文字列には書き出すときに1回だけ変換する。
+停止中はリクエストごとに計測中かどうかを確認するだけで、処理時間は増えない。
+
+環境変数:
+    PROFILER_DIR: 出力先のディレクトリ（デフォルト: data/profiles）
+    PROFILER_INTERVAL: サンプリング間隔（秒、デフォルト: 0.01）
+    PROFILER_MAX_SECONDS: 1回の計測の上限（秒、デフォルト: 300）
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+from core import project_root
+
+PROFILER_DIR = os.environ.get('PROFILER_DIR') or os.path.join(project_root, 'data', 'profiles')
+INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.01))
+MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 300))
+
+
+def short_path(filename):
+    """スタックに出すファイル名（プロジェクト内は相対パス、ライブラリは site-packages 以下）"""
+    if filename.startswith(project_root + os.sep):
+        return os.path.relpath(filename, project_root)
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """一定間隔で全スレッドのスタックを記録する統計的プロファイラ（プロセスごとに1つ）"""
+
+    def __init__(self, directory=PROFILER_DIR, interval=INTERVAL, max_seconds=MAX_SECONDS):
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._counts = Counter()
+        self._labels = {}
+        self._remaining_requests = None
+        self._state = {}
+        self.last_result = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None, requests=None):
+        """
+        計測を開始する
+
+        Args:
+            seconds: この秒数で停止する（PROFILER_MAX_SECONDS が上限）
+            requests: このプロセスでこの件数のリクエストを処理し終えたら停止する
+
+        Returns:
+            計測の状態（status() と同じ）
+
+        Raises:
+            ValueError: 秒数・件数が正しくない場合
+            RuntimeError: すでに計測中の場合
+        """
+        if seconds is None and requests is None:
+            raise ValueError('秒数（seconds）かリクエスト数（requests）を指定してください')
+        if seconds is not None and not 0 < seconds <= self.max_seconds:
+            raise ValueError(f'秒数は0より大きく{self.max_seconds:g}以下で指定してください')
+        if requests is not None and requests < 1:
+            raise ValueError('リクエスト数は1以上で指定してください')
+
+        with self._lock:
+            if self.running:
+                raise RuntimeError(f'このプロセス（pid {os.getpid()}）ではすでに計測中です')
+            self._stop.clear()
+            self._counts = Counter()
+            self._remaining_requests = requests
+            # 件数だけを指定した場合も PROFILER_MAX_SECONDS で停止する
+            limit = seconds if seconds is not None else self.max_seconds
+            self._state = {
+                'pid': os.getpid(),
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'seconds': seconds,
+                'requests': requests,
+                'interval': self.interval,
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(time.monotonic() + limit,), name='sampling-profiler', daemon=True
+            )
+            self._thread.start()
+        return self.status()
+
+    def request_finished(self):
+        """リクエストを処理し終えたときに呼ばれる（件数を指定した計測を数える）"""
+        with self._lock:
+            if self._remaining_requests is None:
+                return
+            self._remaining_requests -= 1
+            if self._remaining_requests <= 0:
+                self._remaining_requests = None
+                self._stop.set()
+
+    def stop(self):
+        """
+        計測を停止して結果を書き出す
+
+        Returns:
+            書き出した結果（計測していなかった場合は直前の結果）
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.last_result
+
+    def status(self):
+        """このプロセスの計測の状態と直前の結果"""
+        with self._lock:
+            state = dict(self._state, running=self.running, pid=os.getpid())
+            if state['running']:
+                state['samples'] = sum(self._counts.values())
+                state['remaining_requests'] = self._remaining_requests
+        state['last_result'] = self.last_result
+        return state
+
+    def _run(self, deadline):
+        """サンプリングのスレッド: 停止の条件を満たすまで記録し、結果を書き出す"""
+        own = threading.get_ident()
+        started = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+            if time.monotonic() >= deadline:
+                break
+
+        with self._lock:
+            self._remaining_requests = None
+            counts = self._counts
+        path = self._write(counts)
+        self.last_result = {
+            'path': path,
+            'samples': sum(counts.values()),
+            'seconds': round(time.monotonic() - started, 3),
+        }
+
+    def _sample(self, own):
+        """全スレッド（このスレッドを除く）のスタックを1回記録する"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self._counts[(names.get(ident, str(ident)), tuple(codes))] += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+            )
+        return label
+
+    def _write(self, counts):
+        """
+        collapsed stack 形式（1行に「スレッド名;呼び出し元;...;関数 回数」）で書き出す
+
+        Returns:
+            出力したファイルのパス
+        """
+        lines = Counter()
+        for (thread_name, codes), count in counts.items():
+            frames = [thread_name.replace(';', ':')] + [self._label(code) for code in reversed(codes)]
+            lines[';'.join(frames)] += count
+
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.now()
+        path = os.path.join(self.directory, f'{os.getpid()}-{now:%Y%m%d-%H%M%S}-{now.microsecond // 1000:03d}.folded')
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for stack, count in lines.most_common():
+                    f.write(f'{stack} {count}\n')
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return path
+
+
+def list_profiles(directory=PROFILER_DIR, limit=20):
+    """出力済みの結果のファイル名（全プロセス分、新しい順）"""
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.endswith('.folded')]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    return names[:limit]
+
+
+_default_profiler = None
+_default_profiler_lock = threading.Lock()
+
+
+def get_default_profiler():
+    """プロセス内で共有するプロファイラを取得（forkされたワーカーでは新しく作成）"""
+    global _default_profiler
+    if _default_profiler is None or _default_profiler.pid != os.getpid():
+        with _default_profiler_lock:
+            if _default_profiler is None or _default_profiler.pid != os.getpid():
+                _default_profiler = SamplingProfiler()
+    return _default_profiler
+
+
+def init_app(app):
+    """件数を指定した計測のため、リクエストを処理し終えるたびにプロファイラに知らせる"""
+
+    @app.after_request
+    def _count_profiled_request(response):
+        profiler = _default_profiler
+        # 開始・停止のリクエスト自体は数えない
+        if profiler is not None and profiler.running and not request.path.startswith('/admin/'):
+            response.call_on_close(profiler.request_finished)
+        return response
@@ -0,0 +1,256 @@
+"""
+スクレイパー用のHTTPセッション（コネクションプール＋ディスクキャッシュ）
+
+- コネクションプール: requests.Session を共有し、同じホストへの接続を使い回す
+- ディスクキャッシュ: 取得したページを保存し、有効期間内はネットワークにアクセスしない。
+  期限切れの場合は ETag / Last-Modified による条件付きリクエストで再検証し、
+  304なら保存済みのページを使う
+- アクセス頻度: ホストごとのトークンバケットで、実際にリクエストを送る場合のみ制限する
+  （キャッシュから返す場合は待たない）。複数スレッドから同時に使っても全体で制限を守る
+
+環境変数:
+    SCRAPER_CACHE_DIR: キャッシュのディレクトリ（デフォルト: data/http_cache、空文字でディスクキャッシュなし）
+    SCRAPER_CACHE_TTL: 再検証なしでキャッシュを使う秒数（デフォルト: 86400）
+    SCRAPER_RATE: 同じホストへの1秒あたりのリクエスト数（デフォルト: 1.0、0で制限なし）
+    SCRAPER_BURST: 連続して送れるリクエスト数（デフォルト: 1）
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'http_cache')
+
+# キャッシュに保存するレスポンスヘッダ
+_CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+
+class TokenBucket:
+    """1秒あたり rate 個のトークンを補充し、最大 burst 個まで貯めるレート制限"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        トークンを1つ取得する（なければ補充されるまで待つ）
+
+        Returns:
+            待った秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class CachedSession:
+    """ディスクキャッシュ付きのHTTPセッション"""
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl: float = 86400,
+                 rate: float = 1.0, burst: int = 1, pool_size: int = 10, timeout: float = 10):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'revalidated': 0,
+            'rate_limited_seconds': 0.0,
+        }
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, url: str, timeout: Optional[float] = None) -> requests.Response:
+        """
+        URLを取得する（キャッシュが有効期間内ならネットワークにアクセスしない）
+
+        Returns:
+            requests.Response（キャッシュから返した場合は from_cache=True）
+
+        Raises:
+            requests.RequestException: 取得に失敗し、使えるキャッシュもない場合
+        """
+        entry = self._read_cache(url)
+        if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+            with self._lock:
+                self._stats['cache_hits'] += 1
+            return self._cached_response(url, entry)
+
+        headers = {}
+        if entry is not None:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        try:
+            response = self._request(url, headers, timeout)
+        except requests.RequestException:
+            if entry is None:
+                raise
+            # ネットワークエラー時は期限切れでも保存済みのページを使う
+            return self._cached_response(url, entry)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self._stats['revalidated'] += 1
+            entry['fetched_at'] = time.time()
+            self._write_cache(url, entry)
+            return self._cached_response(url, entry)
+
+        response.from_cache = False
+        if response.status_code == 200:
+            self._write_cache(url, {
+                'url': url,
+                'fetched_at': time.time(),
+                'headers': {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers},
+                'encoding': response.encoding,
+            }, response.content)
+        return response
+
+    def stats(self) -> dict:
+        """リクエスト数・キャッシュヒット数などの統計"""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _request(self, url: str, headers: dict, timeout: Optional[float]) -> requests.Response:
+        """ホストごとのレート制限を守って送信"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+
+        waited = bucket.acquire()
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['rate_limited_seconds'] += waited
+        return self._session.get(url, headers=headers, timeout=timeout or self.timeout)
+
+    def _cached_response(self, url: str, entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry.get('encoding')
+        response._content = entry['body']
+        response.from_cache = True
+        return response
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _read_cache(self, url: str) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+        path = self._path(url)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(path + '.body', 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        return entry
+
+    def _write_cache(self, url: str, entry: dict, body: Optional[bytes] = None) -> None:
+        """本文→メタデータの順に書き込む（メタデータがあれば本文も揃っている）"""
+        if not self.cache_dir:
+            return
+        path = self._path(url)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if body is not None:
+                self._atomic_write(path + '.body', body)
+            meta = {name: value for name, value in entry.items() if name != 'body'}
+            self._atomic_write(path + '.json', json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        except OSError:
+            # キャッシュに書けなくても取得結果はそのまま返す
+            pass
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def create_session(ttl: Optional[float] = None) -> CachedSession:
+    """
+    環境変数の設定に従ってセッションを作成する
+
+    Args:
+        ttl: 再検証なしでキャッシュを使う秒数（省略時は SCRAPER_CACHE_TTL。0で毎回 ETag・Last-Modified で再検証）
+    """
+    cache_dir = os.environ.get('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR)
+    return CachedSession(
+        cache_dir=cache_dir or None,
+        ttl=float(os.environ.get('SCRAPER_CACHE_TTL', 86400)) if ttl is None else ttl,
+        rate=float(os.environ.get('SCRAPER_RATE', 1.0)),
+        burst=int(os.environ.get('SCRAPER_BURST', 1))
+    )
+
+
+def get_default_session() -> CachedSession:
+    """プロセス内で共有するセッションを取得（初回呼び出し時に作成）"""
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
@@ -0,0 +1,195 @@
+"""
+HTMLからリンクだけを取り出す軽量パーサー
+
+ページ全体の木構造（BeautifulSoup）を作らず、<a> の開始・終了タグだけを
+正規表現で1回走査して、href とリンク内の文字列だけを記録する。
+コメント・script・style の中は読み飛ばす。
+リンクのテキストは BeautifulSoup の get_text(strip=True) と同じ規則
+（文字列ごとに前後の空白を除いて連結）で作る。
+"""
+import codecs
+import html as html_module
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin
+
+
+_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+# 日本語ページでよく宣言される文字コードは、対応する上位互換のコーデックで読む
+_CODEC_ALIASES = {
+    'shift_jis': 'cp932',
+    'shift-jis': 'cp932',
+    'sjis': 'cp932',
+    'x-sjis': 'cp932',
+    'windows-31j': 'cp932',
+}
+
+
+def decode_html(html: bytes) -> str:
+    """
+    HTMLのバイト列を文字列にする
+
+    BOM → <meta charset> → UTF-8 → cp932（Shift_JIS）の順に文字コードを判定する。
+    """
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if html.startswith(bom):
+            return html.decode(encoding, errors='replace')
+
+    match = _CHARSET.search(html, 0, 4096)
+    if match:
+        encoding = match.group(1).decode('ascii').lower()
+        encoding = _CODEC_ALIASES.get(encoding, encoding)
+        try:
+            return html.decode(encoding, errors='replace')
+        except LookupError:
+            pass
+
+    try:
+        return html.decode('utf-8')
+    except UnicodeDecodeError:
+        return html.decode('cp932', errors='replace')
+
+
+# <a> の開始・終了タグと、リンクの文字列に含めない部分（コメント・script・style）
+_TOKEN = re.compile(
+    r'<!--.*?(?:-->|$)'
+    r'|<(script|style)\b(?:"[^"]*"|\'[^\']*\'|[^\'">])*>.*?(?:</\1\s*>|$)'
+    r'|<(/?)a(?=[\s/>])((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>',
+    re.IGNORECASE | re.DOTALL
+)
+_HREF = re.compile(r'(?:^|\s)href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.IGNORECASE)
+# リンク内のその他のタグ（文字列の区切りになる）
+_OTHER_TAG = re.compile(r'</?[A-Za-z][^>]*>|<![^>]*>|<\?[^>]*>')
+
+
+def _texts(chunk: str) -> List[str]:
+    """タグで区切った文字列ごとに前後の空白を除く（空になったものは除く）"""
+    texts = []
+    for part in _OTHER_TAG.split(chunk):
+        text = html_module.unescape(part).strip() if '&' in part else part.strip()
+        if text:
+            texts.append(text)
+    return texts
+
+
+def _close(links: list, open_links: list) -> None:
+    """最も内側の <a> を閉じて文字列を確定する（外側のリンクの文字列にも含める）"""
+    index, texts = open_links.pop()
+    if index is not None:
+        links[index][0] = ''.join(texts)
+    if open_links:
+        open_links[-1][1].extend(texts)
+
+
+def _scan_links(html: str) -> List[list]:
+    """<a> の開始・終了タグだけを走査して [テキスト, href] の一覧を開始タグの出現順に返す"""
+    links = []
+    # 開いている <a> ごとの (linksの位置またはNone, 文字列のリスト)（不正な入れ子にも対応）
+    open_links = []
+    position = 0
+
+    for match in _TOKEN.finditer(html):
+        if open_links and match.start() > position:
+            open_links[-1][1].extend(_texts(html[position:match.start()]))
+        position = match.end()
+
+        attrs = match.group(3)
+        if attrs is None:
+            # コメント・script・style
+            continue
+
+        if match.group(2):
+            # </a>
+            if open_links:
+                _close(links, open_links)
+            continue
+
+        index = None
+        href_match = _HREF.search(attrs)
+        if href_match:
+            href = next(value for value in href_match.groups() if value is not None)
+            index = len(links)
+            links.append(['', html_module.unescape(href)])
+        # <a href="..."/> は中身のないリンク
+        if not attrs.rstrip().endswith('/'):
+            open_links.append((index, []))
+
+    # 閉じられていない <a> はページの最後までを文字列とする
+    if open_links:
+        open_links[-1][1].extend(_texts(html[position:]))
+    while open_links:
+        _close(links, open_links)
+
+    return links
+
+
+def _resolver(page_url: str):
+    """
+    相対URLを絶対URLにする関数を返す
+
+    urljoin は1回ごとの処理が重いため、同じディレクトリ部分（最後の / まで）の
+    結果を使い回し、ファイル名部分を連結する。ファイル名部分にクエリ・フラグメント・
+    スキームが含まれ得る場合や . / .. の場合は urljoin をそのまま使う。
+    """
+    directories = {}
+
+    def resolve(href: str) -> str:
+        head, slash, tail = href.rpartition('/')
+        if (not tail or tail in ('.', '..') or '?' in href or '#' in href or ':' in tail
+                or '\\' in href or tail != tail.strip()):
+            return urljoin(page_url, href)
+        head += slash
+        directory = directories.get(head)
+        if directory is None:
+            directory = directories[head] = urljoin(page_url, head or './')
+        return directory + tail
+
+    return resolve
+
+
+def extract_links(html, page_url: str) -> List[Tuple[str, str]]:
+    """
+    ページ内のリンクの (テキスト, 絶対URL) の一覧を出現順に返す
+
+    Args:
+        html: HTMLのバイト列または文字列
+        page_url: 相対URLの基準にするページのURL
+    """
+    if isinstance(html, bytes):
+        html = decode_html(html)
+    resolve = _resolver(page_url)
+    return [(text, resolve(href)) for text, href in _scan_links(html)]
+
+
+def find_links(links: List[Tuple[str, str]], text: Optional[str] = None, contains: Optional[str] = None,
+               href_contains: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    条件に一致するリンクをすべて返す
+
+    Args:
+        links: extract_links の結果
+        text: リンクのテキストと完全一致
+        contains: リンクのテキストに含まれる文字列
+        href_contains: URLに含まれる文字列
+    """
+    return [
+        (link_text, href) for link_text, href in links
+        if (text is None or link_text == text)
+        and (contains is None or contains in link_text)
+        and (href_contains is None or href_contains in href)
+    ]
+
+
+def find_link(links: List[Tuple[str, str]], text: Optional[str] = None, contains: Optional[str] = None,
+              href_contains: Optional[str] = None) -> Optional[str]:
+    """条件に一致する最初のリンクのURLを返す（見つからない場合はNone）"""
+    for link_text, href in links:
+        if text is not None and link_text != text:
+            continue
+        if contains is not None and contains not in link_text:
+            continue
+        if href_contains is not None and href_contains not in href:
+            continue
+        return href
+    return None
@@ -0,0 +1,161 @@
+"""
+国税庁 路線価サイトの代わりにローカルで保存済みページを配信するHTTPサーバー
+
+スクレイパーのテストやベンチマークをネットワークなしで実行するために使う。
+ETag / Last-Modified を返し、条件付きリクエストには304で応答する。
+パスごとのリクエスト数を記録するため、テストでネットワークアクセスの回数を確認できる。
+
+実行方法:
+    python nta_fixture_server.py [ポート番号] [ページのディレクトリ]
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'nta')
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """保存済みページを返すハンドラ"""
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/'):
+            path += 'index.htm'
+
+        file_path = os.path.normpath(os.path.join(server.root, path.lstrip('/')))
+        with server.lock:
+            server.requests[path] += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if not file_path.startswith(server.root) or not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        mtime = int(os.path.getmtime(file_path))
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+        if self._not_modified(etag, mtime):
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        content_type = 'text/html; charset=utf-8' if file_path.endswith(('.htm', '.html')) else 'application/octet-stream'
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', formatdate(mtime, usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag: str, mtime: int) -> bool:
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FixtureServer:
+    """
+    保存済みページを配信するサーバー（別スレッドで起動）
+
+    使い方:
+        with FixtureServer() as server:
+            get_rosenka_page_url('東京都', '千代田区', base_url=server.url)
+            server.request_count()
+    """
+
+    def __init__(self, root: str = DEFAULT_FIXTURE_DIR, port: int = 0,
+                 latency: float = 0.0, verbose: bool = False):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _FixtureHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.root = os.path.abspath(root)
+        self._httpd.latency = latency
+        self._httpd.verbose = verbose
+        self._httpd.lock = threading.Lock()
+        self._httpd.requests = Counter()
+        self._httpd.not_modified = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """サーバーのベースURL（末尾は/）"""
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> 'FixtureServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def request_count(self, path: Optional[str] = None) -> int:
+        """受け付けたリクエスト数（pathを指定するとそのパスのみ）"""
+        with self._httpd.lock:
+            if path is None:
+                return sum(self._httpd.requests.values())
+            return self._httpd.requests[path]
+
+    def not_modified_count(self) -> int:
+        """304で応答したリクエスト数"""
+        with self._httpd.lock:
+            return self._httpd.not_modified
+
+    def reset_counts(self) -> None:
+        with self._httpd.lock:
+            self._httpd.requests.clear()
+            self._httpd.not_modified = 0
+
+    def __enter__(self) -> 'FixtureServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    """メイン処理"""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8800
+    root = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FIXTURE_DIR
+
+    server = FixtureServer(root, port=port, verbose=True)
+    print(f"{root} を {server.url} で配信しています（Ctrl+Cで終了）")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
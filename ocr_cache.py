@@ -0,0 +1,225 @@
+"""
+OCR結果のキャッシュ
+
+画像バイト列のハッシュ・言語・前処理設定をキーとしてOCR結果を保存する。
+同じ物件資料を何度アップロードしてもTesseractは1回だけ実行される。
+
+- メモリ層: プロセス内のLRUキャッシュ
+- ディスク層: 複数のgunicornワーカーで共有するディレクトリ（任意、サイズ・経過時間で削除）
+
+環境変数:
+    OCR_CACHE_SIZE: メモリ層に保持する件数（デフォルト: 128、0で無効）
+    OCR_CACHE_DIR: ディスク層のディレクトリ（未設定の場合はディスク層を使わない）
+    OCR_CACHE_MAX_BYTES: ディスク層の最大サイズ（デフォルト: 100MB）
+    OCR_CACHE_MAX_AGE: ディスク層の保持期間（秒、デフォルト: 7日）
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class OCRCache:
+    """メモリLRU層と任意のディスク層からなるOCR結果キャッシュ"""
+
+    # ディスク層の削除処理を行う書き込み間隔
+    EVICT_INTERVAL = 32
+
+    def __init__(self, max_entries: int = 128, cache_dir: Optional[str] = None,
+                 max_bytes: int = 100 * 1024 * 1024, max_age: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'saved_seconds': 0.0,
+        }
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_bytes: bytes, kind: str, lang: str, settings: Optional[dict] = None) -> str:
+        """
+        キャッシュキーを作成
+
+        Args:
+            image_bytes: 画像ファイルのバイト列
+            kind: 結果の種類（'text' や 'confidence'）
+            lang: Tesseractの言語設定
+            settings: 前処理などOCR結果に影響する設定
+
+        Returns:
+            SHA-256のキー文字列
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        params = json.dumps({'kind': kind, 'lang': lang, 'settings': settings or {}}, sort_keys=True)
+        return hashlib.sha256(f'{digest}:{params}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """キャッシュから結果を取得（見つからない場合はNone）"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                self._stats['saved_seconds'] += entry['ocr_seconds']
+                return entry['result']
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._stats['saved_seconds'] += entry['ocr_seconds']
+            self._put_memory(key, entry)
+        return entry['result']
+
+    def put(self, key: str, result: Any, ocr_seconds: float = 0.0) -> None:
+        """結果をキャッシュに保存"""
+        entry = {'result': result, 'ocr_seconds': ocr_seconds}
+        with self._lock:
+            self._put_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self) -> dict:
+        """ヒット・ミス数と節約できたOCR時間を取得"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self._memory)
+        return stats
+
+    def clear(self) -> None:
+        """メモリ層を空にする（ディスク層は残す）"""
+        with self._lock:
+            self._memory.clear()
+
+    # ------------------------------------------------------------
+    # メモリ層
+    # ------------------------------------------------------------
+
+    def _put_memory(self, key: str, entry: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------
+    # ディスク層
+    # ------------------------------------------------------------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # 最終参照時刻として更新（削除の優先順位に使う）
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: dict) -> None:
+        if not self.cache_dir:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 他のワーカーが書きかけのファイルを読まないよう、一時ファイルから置き換える
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        # ディレクトリ全体の走査は重いので、一定回数の書き込みごとに行う
+        with self._lock:
+            self._disk_writes += 1
+            should_evict = self._disk_writes % self.EVICT_INTERVAL == 1
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """ディスク層から期限切れのファイルと、上限サイズを超えた古いファイルを削除"""
+        if not self.cache_dir:
+            return
+
+        now = time.time()
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age:
+                    self._remove(path)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        files.sort()
+        for _, size, path in files:
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> OCRCache:
+    """プロセス内で共有するOCRキャッシュを取得（初回呼び出し時に作成）"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = OCRCache(
+                    max_entries=int(os.environ.get('OCR_CACHE_SIZE', 128)),
+                    cache_dir=os.environ.get('OCR_CACHE_DIR') or None,
+                    max_bytes=int(os.environ.get('OCR_CACHE_MAX_BYTES', 100 * 1024 * 1024)),
+                    max_age=float(os.environ.get('OCR_CACHE_MAX_AGE', 7 * 24 * 3600))
+                )
+    return _default_cache
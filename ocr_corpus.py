@@ -0,0 +1,391 @@
+"""
+OCRの速度・精度の計測用に、物件情報シートの画像を正解ラベル付きで大量に作成する
+
+create_test_image.py の1枚の画像と違い、1枚ごとに次の条件を変える。
+
+- フォント（見つかった日本語フォントから選ぶ）・文字の大きさ
+- 建築年の書き方（西暦・和暦・元年・年月）、全角数字
+- 項目名の言い換え（所在地/住所、延床面積/建物面積 など）・区切り文字・面積の単位
+- レイアウト（箇条書き・表・2段組み・関係のない行が混ざった資料）
+- 傾き・ぼかし・ノイズ・解像度（DPI）・保存形式（PNG / JPEG）
+
+出力ディレクトリに画像と labels.jsonl（1行に1枚: ファイル名・正解の項目・描画したテキスト・条件）を書き出す。
+同じシード・枚数なら同じコーパスになる。計測は benchmarks/ocr_corpus.py で行う。
+
+日本語フォントは --font・環境変数 CORPUS_FONTS（パスまたはディレクトリを os.pathsep 区切り）と、
+macOS・Linux（Noto CJK・IPAフォント）・Windowsの標準的な場所から探す。
+見つからない場合はPillowの標準フォントで描画する（日本語が表示されないため、OCRの精度は計測できない）。
+
+実行方法:
+    python ocr_corpus.py [出力ディレクトリ] [--count 1000] [--seed 0] [--workers 4] [--font フォントのパス]
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+
+LABELS_FILE = 'labels.jsonl'
+FIELDS = ['address', 'land_area', 'total_floor_area', 'building_structure', 'build_year']
+
+FONT_CANDIDATES = [
+    # macOS
+    '/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc',
+    '/System/Library/Fonts/ヒラギノ角ゴシック W6.ttc',
+    '/System/Library/Fonts/ヒラギノ明朝 ProN.ttc',
+    # Linux（fonts-noto-cjk・fonts-ipafont・fonts-ipaexfont）
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSerifCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf',
+    '/usr/share/fonts/opentype/ipafont-mincho/ipam.ttf',
+    '/usr/share/fonts/opentype/ipaexfont-gothic/ipaexg.ttf',
+    '/usr/share/fonts/opentype/ipaexfont-mincho/ipaexm.ttf',
+    # Windows
+    'C:/Windows/Fonts/msgothic.ttc',
+    'C:/Windows/Fonts/msmincho.ttc',
+    'C:/Windows/Fonts/meiryo.ttc',
+    'C:/Windows/Fonts/YuGothR.ttc',
+]
+
+LOCATIONS = [
+    '東京都渋谷区渋谷', '東京都千代田区丸の内', '東京都世田谷区三軒茶屋', '大阪府大阪市北区梅田',
+    '神奈川県横浜市中区山下町', '北海道札幌市中央区大通西', '愛知県名古屋市中区栄', '福岡県福岡市博多区博多駅前',
+    '京都府京都市中京区河原町', '埼玉県さいたま市浦和区高砂', '兵庫県神戸市中央区三宮町', '千葉県船橋市本町',
+]
+
+# 項目名の言い換え（text_parser が対応している項目名）
+FIELD_LABELS = {
+    'address': ['所在地', '住所', '物件所在地'],
+    'land_area': ['土地面積', '敷地面積'],
+    'total_floor_area': ['延床面積', '延べ床面積', '建物面積'],
+    'building_structure': ['建物構造', '構造'],
+    'build_year': ['建築年', '築年月', '竣工年'],
+}
+
+# 正解の構造名ごとの書き方
+STRUCTURE_VARIANTS = {
+    '木造': ['木造', '木造2階建', 'W造'],
+    '鉄骨造': ['鉄骨造', 'S造', '軽量鉄骨造'],
+    '鉄筋コンクリート造': ['鉄筋コンクリート造', 'RC造', '鉄筋コンクリート造 地上5階建'],
+}
+
+TITLES = ['物件概要書', '物件情報シート', '重要事項説明書（抜粋）', '販売図面']
+SEPARATORS = ['：', ':', ' ']
+AREA_UNITS = ['㎡', 'm²', '平方メートル']
+YEAR_FORMATS = ['western', 'western_month', 'wareki', 'wareki_gannen']
+LAYOUTS = ['list', 'table', 'two_column', 'noisy_list']
+
+# 関係のない行（noisy_list で混ぜる。数字や年を含むものもある）
+FILLER_LINES = [
+    '交通：JR山手線「渋谷」駅 徒歩7分',
+    '管理費 12,000円／月 修繕積立金 8,500円／月',
+    '設備：都市ガス 公営水道 本下水',
+    '備考：現況を優先します。詳細は担当者までお問い合わせください。',
+    '取引態様：媒介',
+    '作成日 2024年3月1日',
+    'お問い合わせ 03-1234-5678（受付 10:00〜18:00）',
+    '用途地域：第一種住居地域 建ぺい率60% 容積率200%',
+]
+
+FULL_WIDTH_DIGITS = str.maketrans('0123456789.-', '０１２３４５６７８９．－')
+ERA_STARTS = [('令和', 2019), ('平成', 1989), ('昭和', 1926)]
+
+
+def find_fonts(extra: Optional[List[str]] = None) -> List[str]:
+    """
+    使用できる日本語フォントのパスを探す
+
+    Args:
+        extra: 追加のフォント（ファイルまたはディレクトリ）
+
+    Returns:
+        フォントファイルのパスのリスト（見つからない場合は空）
+    """
+    candidates = list(extra or [])
+    candidates += [path for path in os.environ.get('CORPUS_FONTS', '').split(os.pathsep) if path]
+    candidates += FONT_CANDIDATES
+
+    fonts = []
+    for path in candidates:
+        if os.path.isdir(path):
+            paths = sorted(glob.glob(os.path.join(path, '*.tt[fc]')) + glob.glob(os.path.join(path, '*.otf')))
+        else:
+            paths = [path] if os.path.isfile(path) else []
+        for font_path in paths:
+            if font_path not in fonts:
+                fonts.append(font_path)
+    return fonts
+
+
+def _format_year(year: int, fmt: str, rng: random.Random):
+    """
+    建築年を書き方に従って文字列にする
+
+    Returns:
+        (文字列, 正解の建築年) wareki_gannen は改元の年（令和元年 = 2019年 など）に置き換える
+    """
+    if fmt == 'western':
+        return f'{year}年', year
+    if fmt == 'western_month':
+        return f'{year}年{rng.randint(1, 12)}月', year
+
+    era, start = next((era, start) for era, start in ERA_STARTS if year >= start)
+    if fmt == 'wareki_gannen':
+        return f'{era}元年', start
+    return f'{era}{year - start + 1}年', year
+
+
+def make_spec(index: int, seed: int = 0, fonts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    1枚分の正解ラベルと描画の条件を決める（index・seed が同じなら同じ結果）
+
+    Returns:
+        {'file', 'truth': 正解の項目, 'lines': [(項目名, 値)], 'title', 'filler': 関係のない行,
+         'variation': 描画の条件}
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+
+    build_year = rng.randint(1960, 2025)
+    year_format = rng.choices(YEAR_FORMATS, weights=[3, 2, 4, 1])[0]
+    year_text, build_year = _format_year(build_year, year_format, rng)
+
+    location = rng.choice(LOCATIONS)
+    numbers = (rng.randint(1, 9), rng.randint(1, 30), rng.randint(1, 20))
+    if rng.random() < 0.5:
+        address = f'{location}{numbers[0]}-{numbers[1]}-{numbers[2]}'
+    else:
+        address = f'{location}{numbers[0]}丁目{numbers[1]}番{numbers[2]}号'
+
+    structure = rng.choice(list(STRUCTURE_VARIANTS))
+    truth = {
+        'address': address,
+        'land_area': round(rng.uniform(30, 500), rng.choice([1, 2])),
+        'total_floor_area': round(rng.uniform(30, 800), rng.choice([1, 2])),
+        'building_structure': structure,
+        'build_year': build_year,
+    }
+
+    separator = rng.choice(SEPARATORS)
+    unit = rng.choice(AREA_UNITS)
+    values = {
+        'address': address,
+        'land_area': f'{truth["land_area"]}{unit}',
+        'total_floor_area': f'{truth["total_floor_area"]}{unit}',
+        'building_structure': rng.choice(STRUCTURE_VARIANTS[structure]),
+        'build_year': year_text,
+    }
+    full_width = rng.random() < 0.2
+    if full_width:
+        values = {name: value.translate(FULL_WIDTH_DIGITS) for name, value in values.items()}
+
+    layout = rng.choice(LAYOUTS)
+    font_path = rng.choice(fonts) if fonts else None
+    variation = {
+        'font': os.path.basename(font_path) if font_path else 'default',
+        'font_size_pt': rng.choice([10, 11, 12, 14, 16]),
+        'layout': layout,
+        'year_format': year_format,
+        'full_width': full_width,
+        'separator': separator,
+        'unit': unit,
+        'rotation': round(rng.choice([0.0, 0.0, rng.uniform(-3, 3)]), 2),
+        'blur': round(rng.choice([0.0, 0.0, rng.uniform(0.3, 1.5)]), 2),
+        'noise': round(rng.choice([0.0, 0.0, rng.uniform(5, 30)]), 1),
+        'dpi': rng.choice([150, 200, 300]),
+        'format': rng.choice(['png', 'jpg']),
+    }
+    if font_path:
+        variation['font_path'] = font_path
+
+    return {
+        'file': f'sheet_{index:06d}.{variation["format"]}',
+        'truth': truth,
+        'lines': [(rng.choice(FIELD_LABELS[name]), values[name]) for name in FIELDS],
+        'separator': separator,
+        'title': rng.choice(TITLES),
+        'filler': rng.sample(FILLER_LINES, 4) if layout == 'noisy_list' else [],
+        'variation': variation,
+        'seed': seed * 1_000_003 + index,
+    }
+
+
+def spec_text(spec: Dict[str, Any]) -> str:
+    """描画するテキスト（レイアウトによらず上から順に並べたもの。OCRを使わない計測に使う）"""
+    lines = [spec['title']]
+    fields = [f'{label}{spec["separator"]}{value}' for label, value in spec['lines']]
+    if spec['filler']:
+        # 関係のない行を項目の間に挟む
+        for field, filler in zip(fields, spec['filler'] + ['']):
+            lines.append(field)
+            if filler:
+                lines.append(filler)
+    else:
+        lines.extend(fields)
+    return '\n'.join(lines)
+
+
+def _load_font(spec: Dict[str, Any], size: int):
+    path = spec['variation'].get('font_path')
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow 10.1.0 より前は大きさを指定できない
+        return ImageFont.load_default()
+
+
+def render_sheet(spec: Dict[str, Any]) -> Image.Image:
+    """描画の条件に従ってA4の物件情報シートを描画し、傾き・ぼかし・ノイズを加える"""
+    variation = spec['variation']
+    dpi = variation['dpi']
+    width, height = round(8.27 * dpi), round(11.69 * dpi)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+
+    size = round(variation['font_size_pt'] * dpi / 72)
+    font = _load_font(spec, size)
+    title_font = _load_font(spec, round(size * 1.6))
+    margin = round(width * 0.08)
+    line_height = round(size * 1.8)
+
+    draw.text((margin, margin), spec['title'], fill=0, font=title_font)
+    y = margin + round(size * 1.6 * 2)
+    fields = [(label, value) for label, value in spec['lines']]
+    layout = variation['layout']
+
+    if layout == 'table':
+        label_width = round((width - 2 * margin) * 0.3)
+        row_height = round(size * 2.2)
+        for label, value in fields:
+            draw.rectangle([margin, y, margin + label_width, y + row_height], outline=0, width=2)
+            draw.rectangle([margin + label_width, y, width - margin, y + row_height], outline=0, width=2)
+            draw.text((margin + size // 2, y + (row_height - size) // 2), label, fill=0, font=font)
+            draw.text((margin + label_width + size // 2, y + (row_height - size) // 2), value, fill=0, font=font)
+            y += row_height
+    elif layout == 'two_column':
+        column_width = (width - 2 * margin) // 2
+        for i, (label, value) in enumerate(fields):
+            x = margin + (column_width if i >= 3 else 0)
+            row = i - 3 if i >= 3 else i
+            draw.text((x, y + row * line_height * 2), label, fill=0, font=font)
+            draw.text((x, y + row * line_height * 2 + line_height), value, fill=0, font=font)
+    else:
+        for line in spec_text(spec).split('\n')[1:]:
+            draw.text((margin, y), line, fill=0, font=font)
+            y += line_height
+
+    if variation['rotation']:
+        image = image.rotate(variation['rotation'], resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    if variation['blur']:
+        image = image.filter(ImageFilter.GaussianBlur(variation['blur'] * dpi / 150))
+    if variation['noise']:
+        rng = np.random.default_rng(spec['seed'])
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += rng.standard_normal(pixels.shape, dtype=np.float32) * variation['noise']
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+def _generate_one(args) -> Dict[str, Any]:
+    """1枚を作成して保存し、labels.jsonl の1行を返す（ワーカープロセスで実行）"""
+    output_dir, index, seed, fonts = args
+    spec = make_spec(index, seed, fonts)
+    image = render_sheet(spec)
+    path = os.path.join(output_dir, spec['file'])
+    dpi = spec['variation']['dpi']
+    if spec['variation']['format'] == 'jpg':
+        image.save(path, 'JPEG', quality=random.Random(spec['seed']).randint(60, 95), dpi=(dpi, dpi))
+    else:
+        # ノイズを加えた画像は圧縮しにくいため、圧縮率より速さを優先する
+        image.save(path, 'PNG', dpi=(dpi, dpi), compress_level=1)
+
+    variation = dict(spec['variation'])
+    variation.pop('font_path', None)
+    return {'file': spec['file'], 'truth': spec['truth'], 'text': spec_text(spec), 'variation': variation}
+
+
+def generate_corpus(output_dir: str, count: int = 1000, seed: int = 0, workers: Optional[int] = None,
+                    fonts: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    コーパスを作成する
+
+    Args:
+        output_dir: 画像と labels.jsonl の出力先
+        count: 枚数
+        seed: 乱数のシード
+        workers: 並列に作成するプロセス数（省略時はCPU数）
+        fonts: 使用するフォント（省略時は find_fonts() で探す）
+
+    Returns:
+        labels.jsonl に書き出したラベルのリスト
+    """
+    fonts = find_fonts() if fonts is None else fonts
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(output_dir, index, seed, fonts) for index in range(count)]
+
+    if workers == 1:
+        labels = [_generate_one(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            labels = list(executor.map(_generate_one, tasks, chunksize=16))
+
+    with open(os.path.join(output_dir, LABELS_FILE), 'w', encoding='utf-8') as f:
+        for label in labels:
+            f.write(json.dumps(label, ensure_ascii=False) + '\n')
+    return labels
+
+
+def load_labels(corpus_dir: str) -> List[Dict[str, Any]]:
+    """コーパスの labels.jsonl を読み込む"""
+    with open(os.path.join(corpus_dir, LABELS_FILE), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def field_matches(name: str, expected: Any, actual: Any) -> bool:
+    """
+    抽出した項目が正解と一致するか
+
+    所在地は全角・半角と空白の違い（OCRは文字の間に空白を入れることがある）を無視して比べる。
+    """
+    if actual is None:
+        return False
+    if name == 'address':
+        normalize = lambda value: ''.join(unicodedata.normalize('NFKC', str(value)).split())  # noqa: E731
+        return normalize(expected) == normalize(actual)
+    if name in ('land_area', 'total_floor_area'):
+        return math.isclose(float(expected), float(actual), abs_tol=1e-6)
+    return expected == actual
+
+
+def main() -> None:
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='OCR計測用の物件情報シートのコーパスを作成')
+    parser.add_argument('output_dir', nargs='?', default=os.path.join('data', 'ocr_corpus'), help='出力ディレクトリ')
+    parser.add_argument('--count', type=int, default=1000, help='枚数（デフォルト: 1000）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--workers', type=int, default=None, help='並列に作成するプロセス数（デフォルト: CPU数）')
+    parser.add_argument('--font', action='append', default=[], help='使用するフォント（ファイルまたはディレクトリ、複数指定可）')
+    args = parser.parse_args()
+
+    fonts = find_fonts(args.font)
+    if not fonts:
+        print('⚠ 日本語フォントが見つからないため、Pillowの標準フォントで描画します（日本語は表示されません）',
+              file=sys.stderr)
+
+    labels = generate_corpus(args.output_dir, args.count, args.seed, args.workers, fonts)
+    print(f"✓ コーパスを作成しました: {args.output_dir}（{len(labels):,}枚）")
+    print(f"  フォント: {', '.join(os.path.basename(path) for path in fonts) or '標準フォント'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+OCRエンジンの抽象化と常駐ワーカープール
+
+Tesseractの呼び出し方法を切り替えられるようにする。
+
+- SubprocessEngine: pytesseract経由で呼び出しごとにtesseractプロセスを起動する（従来方式）
+- WorkerPoolEngine: 言語モデルを読み込んだままの常駐ワーカープロセスでOCRを実行する
+  （tesserocrが必要）
+
+環境変数:
+    OCR_ENGINE: 'pool' または 'subprocess'（デフォルト: tesserocrがあれば'pool'）
+    OCR_POOL_SIZE: ワーカー数の上限（デフォルト: 2）
+    OCR_JOB_TIMEOUT: 1ジョブあたりのタイムアウト秒数（デフォルト: 120）
+    OCR_MAX_JOBS_PER_WORKER: ワーカーを再起動するまでのジョブ数（デフォルト: 200）
+    TESSDATA_PREFIX: 常駐ワーカーが使うtraineddataのディレクトリ（任意）
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from typing import Optional
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # tesserocrは任意の依存関係
+    tesserocr = None
+
+
+class OCREngineError(Exception):
+    """OCRワーカーの異常終了など、エンジン側のエラー"""
+
+
+class OCRTimeoutError(OCREngineError):
+    """OCRジョブがタイムアウトした"""
+
+
+class SubprocessEngine:
+    """pytesseractで呼び出しごとにtesseractを起動するエンジン（フォールバック用）"""
+
+    name = 'subprocess'
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        return pytesseract.image_to_string(image, lang=lang)
+
+    def image_to_data(self, image: Image.Image, lang: str) -> dict:
+        return pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+    def shutdown(self) -> None:
+        pass
+
+
+# ============================================================
+# ワーカープロセス側の処理
+# ============================================================
+
+def _recognize_data(api) -> dict:
+    """tesserocrの認識結果をpytesseractのimage_to_data(DICT)と同じ形式に変換"""
+    data = {key: [] for key in (
+        'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+        'left', 'top', 'width', 'height', 'conf', 'text'
+    )}
+
+    api.Recognize()
+    iterator = api.GetIterator()
+    if iterator is None:
+        return data
+
+    block_num = par_num = line_num = word_num = 0
+    for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+        if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            block_num += 1
+            par_num = line_num = word_num = 0
+        if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+            par_num += 1
+            line_num = word_num = 0
+        if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            line_num += 1
+            word_num = 0
+        word_num += 1
+
+        box = word.BoundingBox(tesserocr.RIL.WORD) or (0, 0, 0, 0)
+        data['level'].append(5)
+        data['page_num'].append(1)
+        data['block_num'].append(block_num)
+        data['par_num'].append(par_num)
+        data['line_num'].append(line_num)
+        data['word_num'].append(word_num)
+        data['left'].append(box[0])
+        data['top'].append(box[1])
+        data['width'].append(box[2] - box[0])
+        data['height'].append(box[3] - box[1])
+        data['conf'].append(int(word.Confidence(tesserocr.RIL.WORD)))
+        data['text'].append(word.GetUTF8Text(tesserocr.RIL.WORD) or '')
+
+    return data
+
+
+def _worker_main(conn) -> None:
+    """常駐ワーカーのメインループ（言語ごとにAPIを保持して再利用する）"""
+    apis = {}
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+
+            kind, image, lang = job
+            try:
+                api = apis.get(lang)
+                if api is None:
+                    tessdata = os.environ.get('TESSDATA_PREFIX')
+                    if tessdata:
+                        api = tesserocr.PyTessBaseAPI(path=tessdata, lang=lang)
+                    else:
+                        api = tesserocr.PyTessBaseAPI(lang=lang)
+                    apis[lang] = api
+
+                api.SetImage(image)
+                if kind == 'string':
+                    result = api.GetUTF8Text()
+                else:
+                    result = _recognize_data(api)
+                conn.send(('ok', result))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for api in apis.values():
+            api.End()
+
+
+# ============================================================
+# 親プロセス側のプール
+# ============================================================
+
+class _Worker:
+    """ワーカープロセスと通信用パイプの組"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class WorkerPoolEngine:
+    """言語モデルを読み込んだままの常駐ワーカーでOCRを行うエンジン"""
+
+    name = 'pool'
+
+    def __init__(self, size: int = 2, job_timeout: float = 120, max_jobs_per_worker: int = 200):
+        if tesserocr is None:
+            raise OCREngineError('tesserocrがインストールされていません')
+
+        self.size = size
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        # fork後のスレッド・DB接続の持ち越しを避けるためspawnで起動する
+        self._context = multiprocessing.get_context('spawn')
+        # 空きワーカー（後に返却したものから使う）と起動済みの数。ワーカーの返却・停止を待機中の呼び出し元に通知する
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._spawned = 0
+        self._closed = False
+
+    def _acquire(self) -> _Worker:
+        """
+        空きワーカーを取得（上限に達していなければ新規起動）
+
+        上限に達している場合は、ワーカーが返却されるか停止されて起動できるようになるまで待つ。
+        """
+        deadline = time.monotonic() + self.job_timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise OCREngineError('ワーカープールは停止済みです')
+                if self._idle:
+                    return self._idle.pop()
+                if self._spawned < self.size:
+                    self._spawned += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise OCRTimeoutError('空きワーカーを待機中にタイムアウトしました')
+                self._available.wait(remaining)
+
+        try:
+            return _Worker(self._context)
+        except Exception:
+            with self._available:
+                self._spawned -= 1
+                self._available.notify()
+            raise
+
+    def _discard(self, worker: _Worker, kill: bool = False) -> None:
+        """ワーカーを停止してプールから外す（待機中の呼び出し元が新しいワーカーを起動できる）"""
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        with self._available:
+            self._spawned -= 1
+            self._available.notify()
+
+    def _release(self, worker: _Worker) -> None:
+        """ジョブ完了後のワーカーを返却（上限ジョブ数に達したら再起動対象）"""
+        with self._available:
+            if not self._closed and worker.jobs < self.max_jobs_per_worker:
+                self._idle.append(worker)
+                self._available.notify()
+                return
+        self._discard(worker)
+
+    def _run(self, kind: str, image: Image.Image, lang: str):
+        worker = self._acquire()
+        try:
+            worker.conn.send((kind, image, lang))
+            if not worker.conn.poll(self.job_timeout):
+                # 応答のないワーカーは強制終了し、次回は新しいワーカーを起動する
+                self._discard(worker, kill=True)
+                raise OCRTimeoutError(f'OCRが{self.job_timeout}秒以内に完了しませんでした')
+            status, result = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self._discard(worker, kill=True)
+            raise OCREngineError(f'OCRワーカーが異常終了しました: {e}')
+
+        worker.jobs += 1
+        self._release(worker)
+
+        if status != 'ok':
+            raise OCREngineError(result)
+        return result
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        return self._run('string', image, lang)
+
+    def image_to_data(self, image: Image.Image, lang: str) -> dict:
+        return self._run('data', image, lang)
+
+    def shutdown(self) -> None:
+        """全ワーカーを停止"""
+        with self._available:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._available.notify_all()
+        for worker in workers:
+            self._discard(worker)
+
+
+class FallbackEngine:
+    """プールで失敗した場合にsubprocess方式で再実行するエンジン"""
+
+    def __init__(self, primary, fallback=None):
+        self.primary = primary
+        self.fallback = fallback or SubprocessEngine()
+        self.name = primary.name
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        try:
+            return self.primary.image_to_string(image, lang)
+        except OCRTimeoutError:
+            raise
+        except OCREngineError:
+            return self.fallback.image_to_string(image, lang)
+
+    def image_to_data(self, image: Image.Image, lang: str) -> dict:
+        try:
+            return self.primary.image_to_data(image, lang)
+        except OCRTimeoutError:
+            raise
+        except OCREngineError:
+            return self.fallback.image_to_data(image, lang)
+
+    def shutdown(self) -> None:
+        self.primary.shutdown()
+
+
+def create_engine(kind: Optional[str] = None):
+    """
+    環境変数の設定に従ってOCRエンジンを作成する
+
+    Args:
+        kind: 'pool' または 'subprocess'（省略時は環境変数OCR_ENGINE）
+
+    Returns:
+        OCRエンジン
+    """
+    kind = kind or os.environ.get('OCR_ENGINE') or ('pool' if tesserocr is not None else 'subprocess')
+
+    if kind == 'pool' and tesserocr is not None:
+        pool = WorkerPoolEngine(
+            size=int(os.environ.get('OCR_POOL_SIZE', 2)),
+            job_timeout=float(os.environ.get('OCR_JOB_TIMEOUT', 120)),
+            max_jobs_per_worker=int(os.environ.get('OCR_MAX_JOBS_PER_WORKER', 200))
+        )
+        return FallbackEngine(pool)
+
+    return SubprocessEngine()
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_default_engine():
+    """プロセス内で共有するOCRエンジンを取得（初回呼び出し時に作成）"""
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                _default_engine = create_engine()
+                atexit.register(_default_engine.shutdown)
+    return _default_engine
@@ -2,80 +2,183 @@
 画像からテキストを抽出するOCRユーティリティ
 """
 from PIL import Image
-import pytesseract
-from typing import Optional
+from contextlib import nullcontext
+from typing import Callable, Optional
 import io
+import time
 
+from ocr_cache import get_default_cache
+from ocr_engine import get_default_engine
+from ocr_preprocess import PreprocessConfig, preprocess_image
 
-def extract_text_from_image(image_file, lang: str = 'jpn+eng') -> str:
+
+def _read_image_bytes(image_file) -> bytes:
+    """画像ファイル（パス・バイト列・ファイルオブジェクト）の内容をバイト列で取得"""
+    if isinstance(image_file, bytes):
+        return image_file
+    if isinstance(image_file, str):
+        with open(image_file, 'rb') as f:
+            return f.read()
+
+    # BytesIOまたはUploadedFileオブジェクトの場合（読み込み後は先頭に戻す）
+    image_file.seek(0)
+    data = image_file.read()
+    image_file.seek(0)
+    return data
+
+
+def _open_image(image_bytes: bytes, preprocess: PreprocessConfig) -> Image.Image:
+    """バイト列から画像を開き、OCR用に前処理する"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image, _ = preprocess_image(image, preprocess)
+    return image
+
+
+def extract_text_from_image(image_file, lang: str = 'jpn+eng', engine=None, cache=None,
+                            preprocess: Optional[PreprocessConfig] = None,
+                            stage_timer: Optional[Callable] = None) -> str:
     """
     画像からテキストを抽出する
 
     Args:
         image_file: 画像ファイル（BytesIOオブジェクトまたはファイルパス）
         lang: Tesseractで使用する言語（デフォルト: 'jpn+eng'で日本語と英語）
+        engine: OCRエンジン（省略時はプロセス内で共有するエンジン）
+        cache: OCR結果キャッシュ（省略時はプロセス内で共有するキャッシュ）
+        preprocess: OCR前の画像前処理の設定（省略時は環境変数から作成）
+        stage_timer: 処理段階名（'decode' / 'ocr'）を受け取り、その時間を計測する
+            コンテキストマネージャーを返す関数（省略時は計測しない）
 
     Returns:
         抽出されたテキスト
     """
+    stage_timer = stage_timer or (lambda name: nullcontext())
     try:
-        # 画像を開く
-        if isinstance(image_file, (str, bytes)):
-            image = Image.open(image_file)
-        else:
-            # BytesIOまたはUploadedFileオブジェクトの場合
-            image = Image.open(image_file)
+        with stage_timer('decode'):
+            image_bytes = _read_image_bytes(image_file)
 
-        # RGBモードに変換（必要に応じて）
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+            # 同じ画像・設定のOCR結果があれば再利用
+            cache = cache or get_default_cache()
+            preprocess = preprocess or PreprocessConfig.from_env()
+            key = cache.make_key(image_bytes, 'text', lang, preprocess.to_dict())
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+            image = _open_image(image_bytes, preprocess)
 
         # OCR実行
-        text = pytesseract.image_to_string(image, lang=lang)
+        with stage_timer('ocr'):
+            engine = engine or get_default_engine()
+            start = time.perf_counter()
+            text = engine.image_to_string(image, lang).strip()
+            cache.put(key, text, time.perf_counter() - start)
 
-        return text.strip()
+        return text
 
     except Exception as e:
         return f"エラーが発生しました: {str(e)}"
 
 
-def extract_text_with_confidence(image_file, lang: str = 'jpn+eng') -> dict:
+def build_text_from_data(data: dict) -> str:
+    """
+    image_to_dataの単語テーブルからテキストを再構成する
+
+    同じ行の単語は空白で連結し、行の区切りは改行、
+    ブロック・段落の区切りは空行として出力する（image_to_stringと同じ形式）。
+
+    Args:
+        data: pytesseract.image_to_data(output_type=Output.DICT)の結果
+
+    Returns:
+        再構成されたテキスト
+    """
+    paragraphs = []
+    lines = []
+    words = []
+    current_paragraph = None
+    current_line = None
+
+    for i, word in enumerate(data.get('text', [])):
+        # 単語レベル（level=5）以外はレイアウト情報のみなので読み飛ばす
+        if data['level'][i] != 5:
+            continue
+        word = str(word).strip()
+        if not word:
+            continue
+
+        paragraph_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        line_key = paragraph_key + (data['line_num'][i],)
+
+        if line_key != current_line:
+            if words:
+                lines.append(' '.join(words))
+                words = []
+            current_line = line_key
+
+        if paragraph_key != current_paragraph:
+            if lines:
+                paragraphs.append('\n'.join(lines))
+                lines = []
+            current_paragraph = paragraph_key
+
+        words.append(word)
+
+    if words:
+        lines.append(' '.join(words))
+    if lines:
+        paragraphs.append('\n'.join(lines))
+
+    return '\n\n'.join(paragraphs)
+
+
+def extract_text_with_confidence(image_file, lang: str = 'jpn+eng', engine=None, cache=None,
+                                 preprocess: Optional[PreprocessConfig] = None) -> dict:
     """
     画像からテキストを抽出し、信頼度情報も取得する
 
     Args:
         image_file: 画像ファイル（BytesIOオブジェクトまたはファイルパス）
         lang: Tesseractで使用する言語
+        engine: OCRエンジン（省略時はプロセス内で共有するエンジン）
+        cache: OCR結果キャッシュ（省略時はプロセス内で共有するキャッシュ）
+        preprocess: OCR前の画像前処理の設定（省略時は環境変数から作成）
 
     Returns:
         テキストと信頼度情報を含む辞書
     """
     try:
-        # 画像を開く
-        if isinstance(image_file, (str, bytes)):
-            image = Image.open(image_file)
-        else:
-            image = Image.open(image_file)
+        image_bytes = _read_image_bytes(image_file)
 
-        # RGBモードに変換
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        # 同じ画像・設定のOCR結果があれば再利用
+        cache = cache or get_default_cache()
+        preprocess = preprocess or PreprocessConfig.from_env()
+        key = cache.make_key(image_bytes, 'confidence', lang, preprocess.to_dict())
+        cached = cache.get(key)
+        if cached is not None:
+            return dict(cached)
 
-        # OCR実行（詳細データを取得）
-        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+        image = _open_image(image_bytes, preprocess)
 
-        # テキストを結合
-        text = pytesseract.image_to_string(image, lang=lang)
+        # OCR実行（1回のみ。テキストは単語テーブルから再構成する）
+        engine = engine or get_default_engine()
+        start = time.perf_counter()
+        data = engine.image_to_data(image, lang)
+        ocr_seconds = time.perf_counter() - start
+        text = build_text_from_data(data)
 
         # 信頼度の平均を計算（-1以外の値のみ）
         confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
         avg_confidence = sum(confidences) / len(confidences) if confidences else 0
 
-        return {
+        result = {
             'text': text.strip(),
             'confidence': avg_confidence,
             'word_count': len([w for w in data['text'] if w.strip()])
         }
+        cache.put(key, result, ocr_seconds)
+
+        return dict(result)
 
     except Exception as e:
         return {
@@ -90,3 +193,4 @@ if __name__ == "__main__":
     print("使用可能な関数:")
     print("- extract_text_from_image(image_file, lang='jpn+eng')")
     print("- extract_text_with_confidence(image_file, lang='jpn+eng')")
+    print("- build_text_from_data(data)")
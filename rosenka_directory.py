@@ -0,0 +1,273 @@
+"""
+都道府県 → 市区町村 → 路線価図ページURL のローカルディレクトリ
+
+crawler.py で収集した結果をSQLiteに保存し、scraper.get_rosenka_page_url は
+まずここを検索する（ネットワークにアクセスしない）。見つからない場合のみサイトをたどる。
+
+更新時は都道府県ごとに路線価図（市区町村選択）ページのハッシュを比較し、
+変わった都道府県だけ市区町村の一覧を差し替える。
+
+実行方法:
+    python rosenka_directory.py rebuild            # 全件を取得し直す
+    python rosenka_directory.py diff               # 取得して差分を表示（保存しない）
+    python rosenka_directory.py refresh            # 変わった都道府県だけ更新
+    python rosenka_directory.py lookup 東京都 千代田区
+
+rebuild・diff・refresh はHTTPキャッシュのページを再検証してから使う（--max-age 秒以内に
+取得したページだけはそのまま使う）。
+
+環境変数:
+    ROSENKA_DIRECTORY_PATH: ディレクトリのSQLiteファイル（デフォルト: data/rosenka_directory.sqlite3）
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_DIRECTORY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'rosenka_directory.sqlite3'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prefectures (
+    prefecture TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    list_url TEXT NOT NULL,
+    list_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cities (
+    prefecture TEXT NOT NULL,
+    city TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (prefecture, city)
+);
+"""
+
+
+class RosenkaDirectory:
+    """
+    路線価図ページURLのディレクトリ
+
+    開いた時点で全件をメモリ上の辞書に読み込むため、検索は定数時間でネットワークも使わない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """全件をメモリに読み込む"""
+        meta = dict(self._conn.execute('SELECT key, value FROM meta'))
+        self.base_url = meta.get('base_url')
+        self._hashes = dict(self._conn.execute('SELECT prefecture, list_hash FROM prefectures'))
+        self._urls = {}
+        self._cities = {}
+        rows = self._conn.execute('SELECT prefecture, city, url FROM cities ORDER BY prefecture, position')
+        for prefecture, city, url in rows:
+            self._urls[(prefecture, city)] = url
+            self._cities.setdefault(prefecture, []).append((city, url))
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def lookup(self, prefecture: str, city: str) -> Optional[str]:
+        """
+        市区町村の路線価図ページURLを返す（見つからない場合はNone）
+
+        完全一致がなければ、サイト上の並び順で最初に市区町村名を含むものを返す
+        （get_rosenka_page_url のリンク探索と同じ規則）。
+        """
+        url = self._urls.get((prefecture, city))
+        if url is not None:
+            return url
+        for name, url in self._cities.get(prefecture, ()):
+            if city in name:
+                return url
+        return None
+
+    def prefecture_hash(self, prefecture: str) -> Optional[str]:
+        """保存済みの路線価図ページのハッシュ"""
+        return self._hashes.get(prefecture)
+
+    def diff(self, results: Dict[str, dict]) -> Dict[str, dict]:
+        """
+        クロール結果と保存済みの内容の差分を都道府県ごとに求める
+
+        Args:
+            results: crawler.crawl の 'prefectures'（{都道府県: {'url', 'list_url', 'list_hash', 'cities'}}）
+
+        Returns:
+            {都道府県: {'added': [...], 'removed': [...], 'changed': [...]}}
+            （ページのハッシュが同じ都道府県は含まない）
+        """
+        changes = {}
+        for prefecture, result in results.items():
+            if self._hashes.get(prefecture) == result['list_hash']:
+                continue
+            old = dict(self._cities.get(prefecture, ()))
+            new = dict((city, url) for city, url in result['cities'])
+            changes[prefecture] = {
+                'added': sorted(set(new) - set(old)),
+                'removed': sorted(set(old) - set(new)),
+                'changed': sorted(city for city in set(old) & set(new) if old[city] != new[city]),
+            }
+        return changes
+
+    def apply(self, base_url: str, results: Dict[str, dict], replace: bool = False) -> Dict[str, dict]:
+        """
+        クロール結果を保存する
+
+        Args:
+            base_url: クロールしたサイトのトップページURL
+            results: crawler.crawl の 'prefectures'
+            replace: Trueなら既存の内容をすべて削除してから保存する
+
+        Returns:
+            保存した差分（diff と同じ形式）
+        """
+        with self._lock:
+            # 別のサイトの内容は差分ではなく置き換える
+            if self.base_url is not None and self.base_url != base_url:
+                replace = True
+            changes = self.diff(results) if not replace else {
+                prefecture: {'added': [city for city, _ in result['cities']], 'removed': [], 'changed': []}
+                for prefecture, result in results.items()
+            }
+            now = time.time()
+            with self._conn:
+                if replace:
+                    self._conn.execute('DELETE FROM prefectures')
+                    self._conn.execute('DELETE FROM cities')
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('base_url', base_url)
+                )
+                for prefecture in changes:
+                    result = results[prefecture]
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO prefectures (prefecture, url, list_url, list_hash, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (prefecture, result['url'], result['list_url'], result['list_hash'], now)
+                    )
+                    self._conn.execute('DELETE FROM cities WHERE prefecture = ?', (prefecture,))
+                    self._conn.executemany(
+                        'INSERT INTO cities (prefecture, city, url, position) VALUES (?, ?, ?, ?)',
+                        [(prefecture, city, url, i) for i, (city, url) in enumerate(result['cities'])]
+                    )
+            self._load()
+        return changes
+
+    def add(self, prefecture: str, city: str, url: str) -> None:
+        """サイトをたどって見つけた1件を追加する（ハッシュは更新しない）"""
+        with self._lock:
+            with self._conn:
+                position = self._conn.execute(
+                    'SELECT COALESCE(MAX(position) + 1, 0) FROM cities WHERE prefecture = ?', (prefecture,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO cities (prefecture, city, url, position) VALUES (?, ?, ?, ?)',
+                    (prefecture, city, url, position)
+                )
+            self._urls[(prefecture, city)] = url
+            self._cities.setdefault(prefecture, []).append((city, url))
+
+    def entries(self) -> List[Tuple[str, str, str]]:
+        """(都道府県, 市区町村, URL) の一覧"""
+        return [(prefecture, city, url) for (prefecture, city), url in self._urls.items()]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def crawl_results(base_url: str, session=None, workers: int = 4, verbose: bool = True) -> Dict[str, dict]:
+    """サイトを収集して都道府県ごとの結果を返す（失敗した都道府県は含まない）"""
+    from crawler import crawl
+
+    result = crawl(base_url, session, workers=workers, verbose=verbose)
+    return result['prefectures']
+
+
+_default_directory = None
+_default_directory_lock = threading.Lock()
+
+
+def get_default_directory() -> Optional[RosenkaDirectory]:
+    """ROSENKA_DIRECTORY_PATH のディレクトリを取得（ファイルがなければNone）"""
+    global _default_directory
+    path = os.environ.get('ROSENKA_DIRECTORY_PATH') or DEFAULT_DIRECTORY_PATH
+    if _default_directory is None or _default_directory.path != path:
+        if not os.path.exists(path):
+            return None
+        with _default_directory_lock:
+            if _default_directory is None or _default_directory.path != path:
+                _default_directory = RosenkaDirectory(path)
+    return _default_directory
+
+
+def _print_changes(changes: Dict[str, dict], unchanged: int) -> None:
+    for prefecture, change in sorted(changes.items()):
+        print(f"{prefecture}:")
+        for label, mark in (('added', '+'), ('removed', '-'), ('changed', '~')):
+            for city in change[label]:
+                print(f"  {mark} {city}")
+    print(f"変更あり: {len(changes)}都道府県、変更なし: {unchanged}都道府県")
+
+
+def main() -> None:
+    """メイン処理"""
+    from http_cache import create_session
+    from scraper import BASE_URL
+
+    parser = argparse.ArgumentParser(description='路線価図ページURLのローカルディレクトリ')
+    parser.add_argument('--path', default=os.environ.get('ROSENKA_DIRECTORY_PATH') or DEFAULT_DIRECTORY_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('rebuild', '全件を取得し直す'), ('diff', '取得して差分を表示（保存しない）'),
+                               ('refresh', '変わった都道府県だけ更新')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--base-url', default=BASE_URL)
+        sub.add_argument('--workers', type=int, default=4)
+        sub.add_argument('--max-age', type=float, default=0,
+                         help='再検証せずに使うキャッシュの秒数（デフォルト: 0 で常に再検証）')
+    lookup_parser = subparsers.add_parser('lookup', help='路線価図ページURLを検索')
+    lookup_parser.add_argument('prefecture')
+    lookup_parser.add_argument('city')
+    args = parser.parse_args()
+
+    directory = RosenkaDirectory(args.path)
+
+    if args.command == 'lookup':
+        url = directory.lookup(args.prefecture, args.city)
+        if url is None:
+            print(f"✗ 見つかりません: {args.prefecture} {args.city}")
+            sys.exit(1)
+        print(url)
+        return
+
+    # 共有セッションのキャッシュ（SCRAPER_CACHE_TTL）をそのまま使うと、前回の収集から変わっていないように見える
+    session = create_session(ttl=args.max_age)
+    results = crawl_results(args.base_url, session, workers=args.workers)
+    if args.command == 'diff':
+        changes = directory.diff(results)
+    else:
+        changes = directory.apply(args.base_url, results, replace=args.command == 'rebuild')
+        print(f"✓ {len(directory):,}件を保存しました: {args.path}")
+    _print_changes(changes, len(results) - len(changes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+路線価のローカルインデックス
+
+CSVなどから取り込んだ路線価（円/㎡）を、正規化した所在地の昇順に並べた
+コンパクトなバイナリファイルに保存し、mmapで開いて検索する。
+ファイル全体を読み込まないため、件数に関係なく数ミリ秒で開ける。
+
+所在地は「東京都渋谷区渋谷1丁目」のような地域単位で登録し、
+検索時は物件の所在地に前方一致する最も長い地域の路線価を返す（二分探索）。
+
+ファイル形式（リトルエンディアン）:
+    ヘッダ（16バイト）: マジック b'RSKIDX1\\0', 件数 uint32, キー領域のバイト数 uint32
+    オフセット: uint32 × (件数 + 1)  … キー領域内の各キーの開始位置
+    路線価:     uint32 × 件数         … 円/㎡
+    キー領域:   正規化した所在地（UTF-8）を昇順に連結したもの
+
+取り込み:
+    python rosenka_index.py build rosenka.csv [-o data/rosenka.idx] [--scale 1000]
+
+環境変数:
+    ROSENKA_INDEX_PATH: インデックスファイルのパス（デフォルト: data/rosenka.idx）
+"""
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+
+MAGIC = b'RSKIDX1\0'
+HEADER = struct.Struct('<8sII')
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rosenka.idx')
+
+# CSVの列名の候補
+ADDRESS_COLUMNS = ['address', '所在地', '地域', '町名']
+PRICE_COLUMNS = ['price', '路線価', 'rosenka']
+
+
+# ============================================================
+# 所在地の正規化
+# ============================================================
+
+_KANJI_DIGITS = {'〇': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_HYPHENS = re.compile(r'[‐‑‒–—―−-]|(?<=[0-9])[ー─━](?=[0-9])')
+_IGNORED = re.compile(r'[\s・･]')
+_KANJI_CHOME = re.compile(r'([〇一二三四五六七八九十]+)丁目')
+_CHOME = re.compile(r'([0-9]+)(?:丁目|番地|番)')
+_GO = re.compile(r'([0-9]+)号')
+
+
+def _kanji_to_int(kanji: str) -> int:
+    """漢数字（九十九まで）を整数に変換"""
+    if '十' not in kanji:
+        value = 0
+        for char in kanji:
+            value = value * 10 + _KANJI_DIGITS[char]
+        return value
+    tens, _, ones = kanji.partition('十')
+    return (_KANJI_DIGITS[tens] if tens else 1) * 10 + (_KANJI_DIGITS[ones] if ones else 0)
+
+
+def normalize_address(address: str) -> str:
+    """
+    所在地を検索用に正規化する
+
+    全角英数字を半角に、漢数字の丁目を算用数字にし、
+    「1丁目2番3号」「1-2-3」などの表記揺れを「1-2-3」にそろえる。
+    """
+    text = unicodedata.normalize('NFKC', address)
+    text = _IGNORED.sub('', text)
+    text = _KANJI_CHOME.sub(lambda m: f'{_kanji_to_int(m.group(1))}丁目', text)
+    text = _HYPHENS.sub('-', text)
+    text = _CHOME.sub(r'\1-', text)
+    text = _GO.sub(r'\1', text)
+    return text
+
+
+# ============================================================
+# インデックス
+# ============================================================
+
+class _Keys:
+    """mmap上のキー領域を、二分探索できるバイト列のシーケンスとして扱う"""
+
+    def __init__(self, buffer, offsets: memoryview, base: int):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._base = base
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        offsets = self._offsets
+        return self._buffer[self._base + offsets[i]:self._base + offsets[i + 1]]
+
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+def _is_digit_byte(value: int) -> bool:
+    return 0x30 <= value <= 0x39
+
+
+class RosenkaIndex:
+    """mmapで開いた路線価インデックス"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'路線価インデックスの形式が正しくありません: {path}')
+
+        # 要素の参照はPythonのintで行う方がnumpy配列より速いため、memoryviewで扱う
+        # （uint32はリトルエンディアンで保存しているため、ビッグエンディアン環境では使えない）
+        self._view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._offsets = self._view[offset:offset + 4 * (count + 1)].cast('I')
+        offset += 4 * (count + 1)
+        self._prices = self._view[offset:offset + 4 * count].cast('I')
+        offset += 4 * count
+        self._keys = _Keys(self._mmap, self._offsets, offset)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def lookup(self, address: str) -> Optional[int]:
+        """
+        所在地に前方一致する最も長い地域の路線価を返す
+
+        Args:
+            address: 物件の所在地
+
+        Returns:
+            路線価（円/㎡）、該当する地域がない場合はNone
+        """
+        target = normalize_address(address).encode('utf-8')
+        full = target
+
+        while target:
+            i = bisect.bisect_right(self._keys, target)
+            if i == 0:
+                return None
+            key = self._keys[i - 1]
+
+            if target.startswith(key):
+                # 「渋谷1」が「渋谷10-...」に一致しないよう、数字の途中で切れる一致は除く
+                if not (_is_digit_byte(key[-1]) and len(full) > len(key) and _is_digit_byte(full[len(key)])):
+                    return self._prices[i - 1]
+                target = full[:len(key) - 1]
+            else:
+                # keyより短い一致候補は、共通部分の範囲にしかない
+                target = target[:_common_prefix_length(key, target)]
+
+        return None
+
+    def close(self) -> None:
+        """mmapを閉じる"""
+        self._keys = None
+        self._offsets.release()
+        self._prices.release()
+        self._view.release()
+        self._mmap.close()
+
+    @staticmethod
+    def build(records: Iterable[Tuple[str, float]], path: str) -> int:
+        """
+        (所在地, 路線価) の組からインデックスファイルを作成する
+
+        同じ所在地（正規化後）が複数ある場合は後のものを使う。
+
+        Returns:
+            登録した件数
+        """
+        prices = {}
+        for address, price in records:
+            key = normalize_address(address)
+            if key:
+                prices[key.encode('utf-8')] = int(round(float(price)))
+
+        keys = sorted(prices)
+        offsets = np.zeros(len(keys) + 1, dtype='<u4')
+        if keys:
+            np.cumsum([len(key) for key in keys], out=offsets[1:])
+        values = np.array([prices[key] for key in keys], dtype='<u4')
+        blob = b''.join(keys)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 書き込み中のファイルを他プロセスが開かないよう、一時ファイルから置き換える
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, len(keys), len(blob)))
+                f.write(offsets.tobytes())
+                f.write(values.tobytes())
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        return len(keys)
+
+
+def read_csv_records(csv_path: str, scale: float = 1.0):
+    """
+    CSVから (所在地, 路線価) の組を読み込む
+
+    1行目は列名で、所在地は address/所在地/地域/町名、路線価は price/路線価/rosenka のいずれか。
+    scale は路線価に掛ける倍率（千円単位のデータなら1000）。
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        address_column = next((c for c in ADDRESS_COLUMNS if c in columns), None)
+        price_column = next((c for c in PRICE_COLUMNS if c in columns), None)
+        if address_column is None or price_column is None:
+            raise ValueError(f'所在地・路線価の列が見つかりません: {columns}')
+
+        for row in reader:
+            price = (row.get(price_column) or '').replace(',', '').strip()
+            if not price:
+                continue
+            yield row[address_column], float(price) * scale
+
+
+# ============================================================
+# プロセス内で共有するインデックス
+# ============================================================
+
+_default_index = None
+_default_index_mtime = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index() -> Optional[RosenkaIndex]:
+    """
+    ROSENKA_INDEX_PATH のインデックスを取得（ファイルがなければNone）
+
+    ファイルが再作成された場合は開き直すため、取り込み後にサーバーの再起動は不要。
+    """
+    global _default_index, _default_index_mtime
+    path = os.environ.get('ROSENKA_INDEX_PATH') or DEFAULT_INDEX_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    if _default_index is None or _default_index.path != path or _default_index_mtime != mtime:
+        with _default_index_lock:
+            if _default_index is None or _default_index.path != path or _default_index_mtime != mtime:
+                # 古いインデックスは参照中のスレッドがあり得るため閉じずに手放す
+                _default_index = RosenkaIndex(path)
+                _default_index_mtime = mtime
+    return _default_index
+
+
+def main() -> None:
+    """コマンドライン: インデックスの作成と検索"""
+    parser = argparse.ArgumentParser(description='路線価のローカルインデックス')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='CSVからインデックスを作成')
+    build_parser.add_argument('csv_path')
+    build_parser.add_argument('-o', '--output', default=os.environ.get('ROSENKA_INDEX_PATH') or DEFAULT_INDEX_PATH)
+    build_parser.add_argument('--scale', type=float, default=1.0, help='路線価に掛ける倍率（千円単位なら1000）')
+
+    lookup_parser = subparsers.add_parser('lookup', help='所在地の路線価を検索')
+    lookup_parser.add_argument('address')
+    lookup_parser.add_argument('-i', '--index', default=os.environ.get('ROSENKA_INDEX_PATH') or DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        count = RosenkaIndex.build(read_csv_records(args.csv_path, args.scale), args.output)
+        elapsed = time.perf_counter() - start
+        print(f"✓ {count:,}件を登録しました: {args.output}（{os.path.getsize(args.output):,}バイト、{elapsed:.2f}秒）")
+    else:
+        index = RosenkaIndex(args.index)
+        price = index.lookup(args.address)
+        if price is None:
+            print(f"✗ 該当する地域がありません: {args.address}")
+            sys.exit(1)
+        print(f"{args.address}: {price:,}円/㎡")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""
+路線価図（地図シート）の取り込みパイプライン
+
+ダウンロード済みの路線価図（PDF・画像）を1ページずつOCRし、
+「520C」のような路線価の表記（千円/㎡ + 借地権割合の記号）を読み取って
+SQLiteの路線価テーブルに保存する。ページのOCRはスレッドプールで並行して行う
+（実際の処理はOCRエンジンの常駐ワーカー・tesseractプロセスが行う）。
+
+シートごとにファイルのハッシュと一緒に保存するため、中断しても再実行すれば
+未処理・変更されたシートだけを処理する。
+
+シートの所在地は入力ディレクトリの sheets.csv（列: file, prefecture, city, town）で指定する。
+町名ごとの路線価（中央値）は rosenka_index.py のインデックスとして書き出せる。
+
+実行方法:
+    python rosenka_maps.py ingest maps/ [--workers 4] [--lang jpn+eng] [--dpi 300]
+    python rosenka_maps.py show 13101_01.pdf
+    python rosenka_maps.py export-index [-o data/rosenka.idx]
+
+環境変数:
+    ROSENKA_MAPS_PATH: 路線価テーブルのSQLiteファイル（デフォルト: data/rosenka_maps.sqlite3）
+
+PDFの読み込みには pypdfium2 が必要（任意の依存関係）。
+"""
+import argparse
+import csv
+import functools
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from ocr_engine import OCREngineError
+from ocr_preprocess import PreprocessConfig
+
+try:
+    import pypdfium2
+except ImportError:  # pypdfium2は任意の依存関係（PDFのシートを読み込む場合のみ必要）
+    pypdfium2 = None
+
+
+DEFAULT_MAPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rosenka_maps.sqlite3')
+
+MANIFEST_NAME = 'sheets.csv'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+SHEET_EXTENSIONS = ('.pdf',) + IMAGE_EXTENSIONS
+
+# 借地権割合の記号
+LEASEHOLD_RATIOS = {'A': 0.9, 'B': 0.8, 'C': 0.7, 'D': 0.6, 'E': 0.5, 'F': 0.4, 'G': 0.3}
+
+# 路線価図は細かい数字が多いため縮小しない
+MAP_PREPROCESS = PreprocessConfig(max_dimension=None, target_dpi=None)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    sheet TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    prefecture TEXT,
+    city TEXT,
+    town TEXT,
+    pages INTEGER NOT NULL,
+    price_count INTEGER NOT NULL,
+    ocr_seconds REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS road_prices (
+    sheet TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    ratio_code TEXT NOT NULL,
+    leasehold_ratio REAL NOT NULL,
+    raw TEXT NOT NULL,
+    confidence REAL,
+    PRIMARY KEY (sheet, page, position)
+);
+"""
+
+
+# ============================================================
+# 路線価の表記の読み取り
+# ============================================================
+
+# 「520C」「1,200D」: 路線価（千円/㎡）の直後に借地権割合の記号
+_PRICE_MARK = re.compile(
+    r'(?<![0-9A-Za-z,.])([1-9][0-9]{0,2}(?:,[0-9]{3})+|[1-9][0-9]{0,4}) ?([A-G])(?![0-9A-Za-z])'
+)
+
+
+def parse_price_marks(text: str) -> List[dict]:
+    """
+    OCRテキストから路線価の表記を出現順に読み取る
+
+    Returns:
+        [{'price': 路線価（円/㎡）, 'ratio_code': 借地権割合の記号,
+          'leasehold_ratio': 借地権割合, 'raw': 元の表記}, ...]
+    """
+    text = unicodedata.normalize('NFKC', text)
+    marks = []
+    for match in _PRICE_MARK.finditer(text):
+        code = match.group(2)
+        marks.append({
+            'price': int(match.group(1).replace(',', '')) * 1000,
+            'ratio_code': code,
+            'leasehold_ratio': LEASEHOLD_RATIOS[code],
+            'raw': match.group(0),
+        })
+    return marks
+
+
+# ============================================================
+# シートの読み込み
+# ============================================================
+
+_pdfium_lock = threading.Lock()
+
+
+def find_sheets(input_dir: str) -> List[str]:
+    """入力ディレクトリ内のシート（入力ディレクトリからの相対パス、'/'区切り）を名前順に返す"""
+    sheets = []
+    for dirpath, _, filenames in os.walk(input_dir):
+        for filename in filenames:
+            if filename.lower().endswith(SHEET_EXTENSIONS):
+                path = os.path.relpath(os.path.join(dirpath, filename), input_dir)
+                sheets.append(path.replace(os.sep, '/'))
+    return sorted(sheets)
+
+
+def read_manifest(input_dir: str) -> Dict[str, dict]:
+    """sheets.csv から {シート: {'prefecture', 'city', 'town'}} を読み込む（ファイルがなければ空）"""
+    path = os.path.join(input_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return {
+            row['file']: {key: (row.get(key) or None) for key in ('prefecture', 'city', 'town')}
+            for row in csv.DictReader(f)
+        }
+
+
+def file_sha256(path: str) -> str:
+    """ファイルのSHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _require_pdfium(path: str) -> None:
+    if pypdfium2 is None:
+        raise ValueError(f'PDFの読み込みには pypdfium2 が必要です: {path}')
+
+
+def count_pages(path: str) -> int:
+    """シートのページ数"""
+    if path.lower().endswith('.pdf'):
+        _require_pdfium(path)
+        # PDFiumはスレッドセーフではないため、呼び出しを直列化する
+        with _pdfium_lock:
+            pdf = pypdfium2.PdfDocument(path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+
+    with Image.open(path) as image:
+        return getattr(image, 'n_frames', 1)
+
+
+def render_page(path: str, page: int, dpi: int = 300) -> bytes:
+    """
+    シートの1ページをPNGのバイト列にする
+
+    Args:
+        path: シートのファイル
+        page: ページ番号（0始まり）
+        dpi: PDFを画像にするときの解像度
+    """
+    if path.lower().endswith('.pdf'):
+        _require_pdfium(path)
+        with _pdfium_lock:
+            pdf = pypdfium2.PdfDocument(path)
+            try:
+                image = pdf[page].render(scale=dpi / 72).to_pil()
+            finally:
+                pdf.close()
+    else:
+        with Image.open(path) as source:
+            source.seek(page)
+            image = source.copy()
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def default_ocr(lang: str = 'jpn+eng') -> Callable[[bytes], dict]:
+    """ocr_utils.extract_text_with_confidence を路線価図向けの前処理で呼び出す関数"""
+    from ocr_utils import extract_text_with_confidence
+
+    return functools.partial(extract_text_with_confidence, lang=lang, preprocess=MAP_PREPROCESS)
+
+
+# ============================================================
+# 路線価テーブル
+# ============================================================
+
+class RoadPriceTable:
+    """路線価図から読み取った路線価のテーブル"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM road_prices').fetchone()[0]
+
+    def sheet_hash(self, sheet: str) -> Optional[str]:
+        """保存済みのシートのハッシュ（未処理ならNone）"""
+        with self._lock:
+            row = self._conn.execute('SELECT sha256 FROM sheets WHERE sheet = ?', (sheet,)).fetchone()
+        return row[0] if row else None
+
+    def save_sheet(self, sheet: str, sha256: str, location: dict, pages: List[dict], ocr_seconds: float) -> int:
+        """
+        1シート分の結果を保存する（以前の結果は置き換える）
+
+        Args:
+            sheet: シート（入力ディレクトリからの相対パス）
+            sha256: シートのファイルのハッシュ
+            location: {'prefecture', 'city', 'town'}
+            pages: ページごとの {'marks': parse_price_marksの結果, 'confidence': OCRの信頼度}
+            ocr_seconds: OCRにかかった時間の合計
+
+        Returns:
+            保存した路線価の件数
+        """
+        rows = [
+            (sheet, page, position, mark['price'], mark['ratio_code'], mark['leasehold_ratio'],
+             mark['raw'], result.get('confidence'))
+            for page, result in enumerate(pages, 1)
+            for position, mark in enumerate(result['marks'])
+        ]
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM road_prices WHERE sheet = ?', (sheet,))
+            self._conn.executemany('INSERT INTO road_prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sheets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (sheet, sha256, location.get('prefecture'), location.get('city'), location.get('town'),
+                 len(pages), len(rows), ocr_seconds, time.time())
+            )
+        return len(rows)
+
+    def prices(self, sheet: Optional[str] = None) -> List[dict]:
+        """保存済みの路線価（シート・ページ・出現順）"""
+        query = ('SELECT p.sheet, s.prefecture, s.city, s.town, p.page, p.price, p.ratio_code, '
+                 'p.leasehold_ratio, p.raw, p.confidence '
+                 'FROM road_prices p JOIN sheets s ON s.sheet = p.sheet')
+        params = ()
+        if sheet is not None:
+            query += ' WHERE p.sheet = ?'
+            params = (sheet,)
+        query += ' ORDER BY p.sheet, p.page, p.position'
+        columns = ['sheet', 'prefecture', 'city', 'town', 'page', 'price', 'ratio_code',
+                   'leasehold_ratio', 'raw', 'confidence']
+        with self._lock:
+            return [dict(zip(columns, row)) for row in self._conn.execute(query, params)]
+
+    def index_records(self) -> Iterable[Tuple[str, int]]:
+        """
+        町名ごとの (所在地, 路線価の中央値) の組（rosenka_index.RosenkaIndex.build に渡す）
+
+        所在地が指定されていないシートは含まない。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT s.prefecture, s.city, s.town, p.price FROM road_prices p '
+                'JOIN sheets s ON s.sheet = p.sheet WHERE s.city IS NOT NULL'
+            ).fetchall()
+        grouped = {}
+        for prefecture, city, town, price in rows:
+            address = ''.join(part for part in (prefecture, city, town) if part)
+            grouped.setdefault(address, []).append(price)
+        return [(address, int(statistics.median(prices))) for address, prices in sorted(grouped.items())]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ============================================================
+# 取り込み
+# ============================================================
+
+def _ocr_page(path: str, page: int, dpi: int, ocr: Callable[[bytes], dict]) -> dict:
+    """1ページをOCRして路線価の表記を読み取る"""
+    start = time.perf_counter()
+    result = ocr(render_page(path, page, dpi))
+    if result.get('error'):
+        raise OCREngineError(f'{page + 1}ページ目: {result["error"]}')
+    return {
+        'marks': parse_price_marks(result['text']),
+        'confidence': result.get('confidence'),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def ingest(input_dir: str, table: RoadPriceTable, workers: int = 4, lang: str = 'jpn+eng', dpi: int = 300,
+           ocr: Optional[Callable[[bytes], dict]] = None, verbose: bool = True) -> dict:
+    """
+    入力ディレクトリのシートをOCRして路線価テーブルに保存する
+
+    保存済みでハッシュが同じシートは読み飛ばす。ページのOCRはシートをまたいで並行して行い、
+    シートの全ページがそろった時点でそのシートを保存する。
+
+    Args:
+        input_dir: シートを置いたディレクトリ
+        table: 保存先の路線価テーブル
+        workers: 並行してOCRするページ数
+        lang: OCRの言語
+        dpi: PDFを画像にするときの解像度
+        ocr: ページのPNGバイト列を受け取り {'text', 'confidence'} を返す関数
+            （省略時は ocr_utils.extract_text_with_confidence）
+        verbose: 進捗を表示するか
+
+    Returns:
+        {'processed': 処理したシート数, 'skipped': 読み飛ばしたシート数, 'pages': OCRしたページ数,
+         'prices': 保存した路線価の件数, 'failed': {シート: エラー}, 'elapsed': 秒}
+    """
+    if ocr is None:
+        ocr = default_ocr(lang)
+    manifest = read_manifest(input_dir)
+
+    start = time.perf_counter()
+    stats = {'processed': 0, 'skipped': 0, 'pages': 0, 'prices': 0, 'failed': {}}
+    # 処理中のシート（先に投入した順に保存する）
+    in_flight = deque()
+    in_flight_pages = 0
+
+    def finish() -> None:
+        nonlocal in_flight_pages
+        sheet, digest, futures = in_flight.popleft()
+        in_flight_pages -= len(futures)
+        try:
+            pages = [future.result() for future in futures]
+        except Exception as e:
+            stats['failed'][sheet] = str(e)
+            if verbose:
+                print(f"✗ {sheet}: {e}")
+            return
+        count = table.save_sheet(sheet, digest, manifest.get(sheet, {}), pages,
+                                 sum(page['seconds'] for page in pages))
+        stats['processed'] += 1
+        stats['pages'] += len(pages)
+        stats['prices'] += count
+        if verbose:
+            print(f"✓ {sheet}: {len(pages)}ページ、路線価 {count}件")
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rosenka-maps')
+    try:
+        for sheet in find_sheets(input_dir):
+            path = os.path.join(input_dir, sheet)
+            try:
+                digest = file_sha256(path)
+                if table.sheet_hash(sheet) == digest:
+                    stats['skipped'] += 1
+                    continue
+                page_count = count_pages(path)
+            except Exception as e:
+                stats['failed'][sheet] = str(e)
+                if verbose:
+                    print(f"✗ {sheet}: {e}")
+                continue
+
+            futures = [executor.submit(_ocr_page, path, page, dpi, ocr) for page in range(page_count)]
+            in_flight.append((sheet, digest, futures))
+            in_flight_pages += len(futures)
+            # 画像をメモリに溜め込まないよう、投入済みのページ数を抑える
+            while in_flight_pages > workers * 2 and len(in_flight) > 1:
+                finish()
+
+        while in_flight:
+            finish()
+    finally:
+        # 中断時は未実行のページを取り消す（保存済みのシートは再実行時に読み飛ばす）
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='路線価図（地図シート）の取り込み')
+    parser.add_argument('--path', default=os.environ.get('ROSENKA_MAPS_PATH') or DEFAULT_MAPS_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='シートをOCRして保存（処理済みのシートは読み飛ばす）')
+    ingest_parser.add_argument('input_dir')
+    ingest_parser.add_argument('--workers', type=int, default=4)
+    ingest_parser.add_argument('--lang', default='jpn+eng')
+    ingest_parser.add_argument('--dpi', type=int, default=300, help='PDFを画像にするときの解像度')
+
+    show_parser = subparsers.add_parser('show', help='シートの路線価を表示')
+    show_parser.add_argument('sheet')
+
+    export_parser = subparsers.add_parser('export-index', help='町名ごとの路線価を路線価インデックスに書き出す')
+    export_parser.add_argument('-o', '--output', default=None)
+    args = parser.parse_args()
+
+    table = RoadPriceTable(args.path)
+
+    if args.command == 'ingest':
+        print("=" * 60)
+        print("路線価図の取り込み")
+        print("=" * 60)
+        result = ingest(args.input_dir, table, args.workers, args.lang, args.dpi)
+        print("-" * 60)
+        print(f"処理: {result['processed']}シート（{result['pages']}ページ）、"
+              f"スキップ: {result['skipped']}シート、失敗: {len(result['failed'])}シート")
+        print(f"路線価: {result['prices']:,}件 / {result['elapsed']:.1f}秒")
+        print(f"保存先: {args.path}")
+        print("=" * 60)
+        if result['failed']:
+            sys.exit(1)
+
+    elif args.command == 'show':
+        prices = table.prices(args.sheet)
+        if not prices:
+            print(f"✗ 見つかりません: {args.sheet}")
+            sys.exit(1)
+        for row in prices:
+            location = ''.join(part for part in (row['prefecture'], row['city'], row['town']) if part)
+            print(f"{location} p{row['page']}: {row['price']:,}円/㎡ 借地権割合{row['ratio_code']}"
+                  f"（{row['leasehold_ratio']:.0%}）")
+
+    else:
+        from rosenka_index import DEFAULT_INDEX_PATH, RosenkaIndex
+
+        output = args.output or os.environ.get('ROSENKA_INDEX_PATH') or DEFAULT_INDEX_PATH
+        count = RosenkaIndex.build(table.index_records(), output)
+        print(f"✓ {count:,}件を書き出しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
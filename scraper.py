@@ -1,106 +1,186 @@
 """
 国税庁ウェブサイトから路線価情報を取得するスクレイピング機能
+
+ページの取得は http_cache.CachedSession、リンクの抽出は link_extractor を使う。
+同じ都道府県の市区町村を続けて検索しても、トップページ・都道府県ページは
+キャッシュから読み込むためネットワークにアクセスしない。
 """
 import requests
-from bs4 import BeautifulSoup
-from typing import Optional
-from urllib.parse import urljoin
-import time
+from typing import List, Optional, Tuple
+
+from http_cache import CachedSession, get_default_session
+from link_extractor import extract_links, find_link, find_links
+from rosenka_directory import RosenkaDirectory, get_default_directory
+
+
+BASE_URL = "https://www.rosenka.nta.go.jp/"
+
+PREFECTURES = [
+    '北海道', '青森県', '岩手県', '宮城県', '秋田県', '山形県', '福島県',
+    '茨城県', '栃木県', '群馬県', '埼玉県', '千葉県', '東京都', '神奈川県',
+    '新潟県', '富山県', '石川県', '福井県', '山梨県', '長野県', '岐阜県',
+    '静岡県', '愛知県', '三重県', '滋賀県', '京都府', '大阪府', '兵庫県',
+    '奈良県', '和歌山県', '鳥取県', '島根県', '岡山県', '広島県', '山口県',
+    '徳島県', '香川県', '愛媛県', '高知県', '福岡県', '佐賀県', '長崎県',
+    '熊本県', '大分県', '宮崎県', '鹿児島県', '沖縄県',
+]
+
 
+# ============================================================
+# ページ内のリンク
+# ============================================================
 
-def get_rosenka_page_url(prefecture: str, city: str) -> Optional[str]:
+def fetch_page(url: str, session: CachedSession) -> bytes:
+    """
+    ページを取得して本文を返す
+
+    Raises:
+        requests.RequestException: 取得に失敗した場合
+    """
+    response = session.get(url)
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_links(url: str, session: CachedSession) -> List[Tuple[str, str]]:
+    """
+    ページを取得して、リンクの (テキスト, 絶対URL) の一覧を返す
+
+    Raises:
+        requests.RequestException: 取得に失敗した場合
+    """
+    return extract_links(fetch_page(url, session), url)
+
+
+def find_prefecture_link(links: List[Tuple[str, str]], prefecture: str) -> Optional[str]:
+    """トップページのリンクから都道府県ページのURLを探す"""
+    return find_link(links, contains=prefecture)
+
+
+def find_rosenka_list_link(links: List[Tuple[str, str]]) -> Optional[str]:
+    """都道府県ページのリンクから路線価図（市区町村選択）ページのURLを探す"""
+    # 「路線価図」と完全一致、かつ市区町村選択ページ（prices/city_frm.htm等）へのリンク
+    return find_link(links, text='路線価図', href_contains='city_frm.htm')
+
+
+def find_city_link(links: List[Tuple[str, str]], city: str) -> Optional[Tuple[str, str]]:
+    """
+    路線価図ページのリンクから市区町村ページを探す
+
+    Returns:
+        最初に市区町村名を含むリンクの (サイト上の市区町村名, URL)、見つからない場合はNone
+    """
+    found = find_links(links, contains=city)
+    return found[0] if found else None
+
+
+def list_prefecture_links(links: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """トップページのリンクから全都道府県の (都道府県名, URL) を取得"""
+    found = {}
+    for text, href in links:
+        if text in PREFECTURES and text not in found:
+            found[text] = href
+    return list(found.items())
+
+
+def list_city_links(links: List[Tuple[str, str]], list_url: str) -> List[Tuple[str, str]]:
+    """
+    路線価図ページのリンクから全市区町村の (市区町村名, URL) を取得
+
+    市区町村ページは路線価図ページと同じディレクトリにあるため、
+    それ以外（戻る・トップページなど）へのリンクは除く。
+    """
+    directory = list_url.rsplit('/', 1)[0] + '/'
+    found = {}
+    for text, href in links:
+        if not text or href == list_url or not href.startswith(directory):
+            continue
+        if '/' in href[len(directory):] or text in found:
+            continue
+        found[text] = href
+    return list(found.items())
+
+
+# ============================================================
+# 路線価図ページの検索
+# ============================================================
+
+def get_rosenka_page_url(prefecture: str, city: str, base_url: str = BASE_URL,
+                         session: Optional[CachedSession] = None,
+                         directory: Optional[RosenkaDirectory] = None) -> Optional[str]:
     """
     国税庁のウェブサイトから指定された都道府県・市区町村の路線価図ページURLを取得
 
+    ローカルのディレクトリ（rosenka_directory.py）にあればネットワークにアクセスせずに返し、
+    見つからない場合のみサイトをたどる（見つけたURLはディレクトリに追加する）。
+
     Args:
         prefecture: 都道府県名（例: '東京都'）
         city: 市区町村名（例: '千代田区'）
+        base_url: サイトのトップページURL（テストではローカルサーバーを指定）
+        session: 取得に使うセッション（省略時は共有セッション）
+        directory: 検索するディレクトリ（省略時は共有ディレクトリ、作成済みの場合のみ）
 
     Returns:
         路線価図ページのURL、見つからない場合はNone
     """
-    base_url = "https://www.rosenka.nta.go.jp/"
+    if directory is None:
+        directory = get_default_directory()
+    # 同じサイトから作成したディレクトリだけを使う
+    if directory is not None and directory.base_url != base_url:
+        directory = None
+
+    if directory is not None:
+        city_link = directory.lookup(prefecture, city)
+        if city_link:
+            print(f"ディレクトリから取得: {city_link}")
+            return city_link
+
+    if session is None:
+        session = get_default_session()
 
     try:
         # 1. トップページにアクセス
         print(f"トップページにアクセス中: {base_url}")
-        response = requests.get(base_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        links = fetch_links(base_url, session)
 
         # 2. 指定された都道府県のリンクを探す
         print(f"都道府県を検索中: {prefecture}")
-        prefecture_link = None
-
-        # 全てのリンクを探索
-        for link in soup.find_all('a', href=True):
-            link_text = link.get_text(strip=True)
-            if prefecture in link_text:
-                prefecture_link = urljoin(base_url, link['href'])
-                print(f"都道府県リンクを発見: {prefecture_link}")
-                break
-
+        prefecture_link = find_prefecture_link(links, prefecture)
         if not prefecture_link:
             print(f"都道府県 '{prefecture}' のリンクが見つかりませんでした")
             return None
-
-        # 少し待機（サーバーへの負荷軽減）
-        time.sleep(1)
+        print(f"都道府県リンクを発見: {prefecture_link}")
 
         # 3. 都道府県ページにアクセス
+        # （サーバーへの負荷軽減のためのアクセス間隔はセッションが管理する）
         print(f"都道府県ページにアクセス中: {prefecture_link}")
-        response = requests.get(prefecture_link, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        links = fetch_links(prefecture_link, session)
 
         # 4. 路線価図のリンクを探す
         print("路線価図のリンクを検索中...")
-        rosenka_link = None
-
-        # 都道府県ページのベースURLを取得（相対パスの解決に使用）
-        prefecture_base = '/'.join(prefecture_link.split('/')[:-1]) + '/'
-
-        # 「路線価図」というテキストを持つリンクを探す（より厳密にマッチング）
-        for link in soup.find_all('a', href=True):
-            link_text = link.get_text(strip=True)
-            href = link['href']
-            # 「路線価図」と完全一致、かつ相対パス（prices/city_frm.htm等）を含むリンクを探す
-            if link_text == '路線価図' and 'city_frm.htm' in href:
-                rosenka_link = urljoin(prefecture_base, href)
-                print(f"路線価図リンクを発見: {rosenka_link}")
-                break
-
+        rosenka_link = find_rosenka_list_link(links)
         if not rosenka_link:
             print("路線価図のリンクが見つかりませんでした")
             return None
-
-        # 少し待機
-        time.sleep(1)
+        print(f"路線価図リンクを発見: {rosenka_link}")
 
         # 5. 路線価図ページにアクセス
         print(f"路線価図ページにアクセス中: {rosenka_link}")
-        response = requests.get(rosenka_link, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        links = fetch_links(rosenka_link, session)
 
         # 6. 指定された市区町村のリンクを探す
         print(f"市区町村を検索中: {city}")
-        city_link = None
-
-        # 路線価図ページのベースURLを取得
-        rosenka_base = '/'.join(rosenka_link.split('/')[:-1]) + '/'
-
-        for link in soup.find_all('a', href=True):
-            link_text = link.get_text(strip=True)
-            if city in link_text:
-                city_link = urljoin(rosenka_base, link['href'])
-                print(f"市区町村リンクを発見: {city_link}")
-                break
-
-        if not city_link:
+        found = find_city_link(links, city)
+        if not found:
             print(f"市区町村 '{city}' のリンクが見つかりませんでした")
             return None
+        city_name, city_link = found
+        print(f"市区町村リンクを発見: {city_name} {city_link}")
 
+        # 検索した文字列（例: '渋谷'）ではなくサイト上の名前（'渋谷区'）で登録する
+        if directory is not None:
+            directory.add(prefecture, city_name, city_link)
         return city_link
 
     except requests.RequestException as e:
@@ -134,7 +214,8 @@ def test_scraper():
             print(f"✗ 失敗: URLが取得できませんでした")
 
         print("-"*60)
-        time.sleep(2)  # 次のテストまで待機
+
+    print(f"\nHTTP統計: {get_default_session().stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""
+Flaskアプリの共通モジュール読み込みのテスト（一時ディレクトリのSQLiteを使用）
+
+評価のリクエストを並行して繰り返しても sys.path が変わらず、
+共通モジュール（property_data・valuation・ocr_utils・text_parser）が
+Streamlit版と同じ1つのモジュールとして共有されていることを確認する。
+"""
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+FLASK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_app')
+
+PROPERTY = {
+    'address': '東京都渋谷区渋谷1-1-1',
+    'land_area': 120.5,
+    'total_floor_area': 95.0,
+    'building_structure': '木造',
+    'build_year': 2005,
+}
+
+
+def load_flask_app(database_path: str):
+    """一時データベースを使うFlaskアプリを読み込み、ユーザーIDを返す"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    # ルートの app.py（Streamlit版）ではなく flask_app/app.py を読み込む
+    if sys.path[0] != FLASK_DIR:
+        sys.path.insert(0, FLASK_DIR)
+    from app import app
+    from models import db, User
+
+    with app.app_context():
+        db.create_all()
+        user = User(email='imports@example.com')
+        db.session.add(user)
+        db.session.commit()
+        return app, user.id
+
+
+def test_sys_path_stable():
+    """評価のリクエストを並行して繰り返しても sys.path が増えないことを確認"""
+    print("="*60)
+    print("共通モジュールの読み込み（sys.path）のテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app, user_id = load_flask_app(os.path.join(tmpdir, 'imports.db'))
+        before = list(sys.path)
+
+        def worker(requests: int) -> int:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            ok = 0
+            for _ in range(requests):
+                responses = [
+                    client.post('/api/valuate', json=PROPERTY),
+                    client.post('/api/valuate/batch', json=[PROPERTY, PROPERTY]),
+                    client.post('/valuation', data=dict(PROPERTY, input_method='manual')),
+                    client.post('/evaluate', data=PROPERTY),
+                ]
+                ok += sum(response.status_code in (200, 302) for response in responses)
+            return ok
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            ok = sum(executor.map(worker, [25] * 4))
+
+        print(f"リクエスト: {ok}件成功、sys.path: {len(before)} → {len(sys.path)}件")
+        assert ok == 4 * 25 * 4
+        assert sys.path == before
+
+    # 共通モジュールはルートのモジュールと同じもの（1回だけ読み込まれる）
+    import core
+    import valuation
+    assert core.calculate_land_valuation is valuation.calculate_land_valuation
+    assert sys.modules['property_data'].PropertyData is core.PropertyData
+    print("共通モジュール: 共有")
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_sys_path_stable()
@@ -0,0 +1,188 @@
+"""
+メモリの診断（flask_app/memory_diagnostics.py）のテスト
+
+スナップショットの差分でメモリを確保した箇所がわかることと、
+リクエストごとのRSSの記録、RSSの上限を超えたワーカーの入れ替え（SIGTERM）を確認する。
+"""
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import tracemalloc
+
+from flask import Flask
+
+
+FLASK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_app')
+if FLASK_DIR not in sys.path:
+    sys.path.append(FLASK_DIR)
+
+import memory_diagnostics  # noqa: E402
+from metrics import init_app as init_metrics  # noqa: E402
+
+
+def load_flask_app():
+    """flask_app/app.py を読み込む（ルートの app.py はStreamlit版）"""
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    if sys.path[0] != FLASK_DIR:
+        sys.path.insert(0, FLASK_DIR)
+    import app
+    return app
+
+
+def allocate_blocks(count):
+    """差分に出るようにメモリを確保する（1ブロック100KB）"""
+    return [bytes(100 * 1024) for _ in range(count)]
+
+
+def test_snapshot_diff():
+    """2つのスナップショットの差分で、メモリを確保した行が先頭に出ることを確認"""
+    print("="*60)
+    print("tracemalloc のスナップショット・差分のテスト")
+    print("="*60)
+
+    was_tracing = tracemalloc.is_tracing()
+    memory_diagnostics.start_tracing(5)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            before_id, _ = memory_diagnostics.take_snapshot(tmpdir, keep=2)
+            blocks = allocate_blocks(50)
+            after_id, after = memory_diagnostics.take_snapshot(tmpdir, keep=2)
+
+            top = memory_diagnostics.top_allocations(after, limit=3)
+            print(f"上位: {top[0]}")
+            assert top[0]['site'].startswith('test_memory_diagnostics.py:')
+            assert top[0]['size_kb'] >= 50 * 100
+
+            diff = memory_diagnostics.diff_allocations(
+                memory_diagnostics.load_snapshot(before_id, tmpdir),
+                memory_diagnostics.load_snapshot(after_id, tmpdir),
+                limit=3, group_by='traceback'
+            )
+            print(f"差分: {diff[0]}")
+            assert diff[0]['size_diff_kb'] >= 50 * 100 and diff[0]['count_diff'] >= 50
+            assert any(site.startswith('test_memory_diagnostics.py:') for site in diff[0]['traceback'])
+            del blocks
+
+            # 保存しておく数を超えたら古いものから削除する
+            third_id, _ = memory_diagnostics.take_snapshot(tmpdir, keep=2)
+            assert memory_diagnostics.list_snapshots(tmpdir) == [third_id, after_id]
+
+            # IDの形式でないファイルは一覧に含めない
+            open(os.path.join(tmpdir, 'copied' + memory_diagnostics.SNAPSHOT_SUFFIX), 'wb').close()
+            assert memory_diagnostics.list_snapshots(tmpdir) == [third_id, after_id]
+
+            for bad_id in ('../app', ''):
+                try:
+                    memory_diagnostics.load_snapshot(bad_id, tmpdir)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f'不正なIDを受け付けました: {bad_id!r}')
+    finally:
+        if not was_tracing:
+            memory_diagnostics.stop_tracing()
+
+    print("="*60)
+
+
+class CapturedLog(logging.Handler):
+    """ロガーに書き出されたメッセージを保存する"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_request_rss_and_recycle():
+    """リクエストのJSONログにRSSが出ることと、上限を超えたらSIGTERMで入れ替えることを確認"""
+    print("="*60)
+    print("リクエストごとのRSS・ワーカーの入れ替えのテスト")
+    print("="*60)
+
+    app = Flask(__name__)
+    init_metrics(app)
+    memory_diagnostics.init_app(app)
+
+    @app.route('/work')
+    def work():
+        return str(len(allocate_blocks(10)))
+
+    received = []
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+    previous_limit = memory_diagnostics.MEMORY_LIMIT_MB
+    captured = CapturedLog()
+    logger = logging.getLogger('roadprice.request')
+    logger.addHandler(captured)
+    try:
+        client = app.test_client()
+        client.get('/work').close()
+        assert received == []
+
+        # 上限を超えても、gunicorn以外（開発サーバー）では警告だけで終了しない
+        memory_diagnostics.MEMORY_LIMIT_MB = 1
+        client.get('/work').close()
+        assert received == []
+
+        memory_diagnostics._recycling = False
+        environ = {'SERVER_SOFTWARE': 'gunicorn/21.2.0'}
+        for _ in range(2):
+            client.get('/work', environ_base=environ).close()
+        print(f"受け取ったシグナル: {received}")
+        assert received == [signal.SIGTERM]
+    finally:
+        memory_diagnostics.MEMORY_LIMIT_MB = previous_limit
+        memory_diagnostics._recycling = False
+        signal.signal(signal.SIGTERM, previous_handler)
+        logger.removeHandler(captured)
+
+    entry = json.loads(captured.messages[0])
+    print(f"ログ: rss_mb={entry['rss_mb']} max_rss_mb={entry['max_rss_mb']} "
+          f"max_rss_growth_mb={entry['max_rss_growth_mb']}")
+    assert entry['rss_mb'] > 0
+    assert entry['max_rss_mb'] >= entry['rss_mb'] - 1
+    assert entry['max_rss_growth_mb'] >= 0
+
+    print("="*60)
+
+
+def test_admin_params():
+    """/admin/memory がJSONのオブジェクト以外や範囲外の limit を400で返すことを確認（管理者の確認の後の処理を直接呼び出す）"""
+    print("="*60)
+    print("/admin/memory のパラメータのテスト")
+    print("="*60)
+
+    app_module = load_flask_app()
+    views = {
+        '/admin/memory/tracemalloc': app_module.admin_memory_tracemalloc.__wrapped__,
+        '/admin/memory/snapshots': app_module.admin_memory_snapshot.__wrapped__,
+    }
+    for path, view in views.items():
+        for body in ([1], 5):
+            with app_module.app.test_request_context(path, method='POST', json=body):
+                response, status = view()
+                print(f"{path} {body!r}: {status} {response.get_json()['error']}")
+                assert status == 400
+
+    # limit は1〜200（負の数で末尾を除いたり、0で既定の件数になったりしない）
+    for limit in (-5, 0, 201):
+        with app_module.app.test_request_context('/admin/memory/snapshots', method='POST', json={'limit': limit}):
+            response, status = app_module.admin_memory_snapshot.__wrapped__()
+            print(f"limit={limit}: {status} {response.get_json()['error']}")
+            assert status == 400
+        with app_module.app.test_request_context(f'/admin/memory/snapshots/x?limit={limit}'):
+            response, status = app_module.admin_memory_snapshot_detail.__wrapped__('x')
+            assert status == 400
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_snapshot_diff()
+    test_request_rss_and_recycle()
+    test_admin_params()
@@ -0,0 +1,205 @@
+"""
+処理時間の計測（flask_app/metrics.py）のテスト
+
+複数のプロセスの記録が /metrics の出力で合算され、
+終了したプロセスの記録も合算済みのファイルに残ることと、
+Server-Timing ヘッダー・リクエストごとのJSONログに処理段階の内訳が出ることを確認する。
+"""
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+
+FLASK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_app')
+if FLASK_DIR not in sys.path:
+    sys.path.append(FLASK_DIR)
+
+from metrics import BUCKETS, STAGE_METRIC, Metrics, annotate, init_app, render, stage  # noqa: E402
+
+LABELS = (('route', '/api/valuate'), ('stage', 'valuation'))
+
+# 別のプロセス（終了したgunicornのワーカーに相当）で3件記録して書き出す
+WORKER_CODE = f'''
+import sys
+sys.path.append({FLASK_DIR!r})
+from metrics import STAGE_METRIC, Metrics
+metrics = Metrics(sys.argv[1])
+for seconds in (0.004, 0.2, 50.0):
+    metrics.observe(STAGE_METRIC, {LABELS!r}, seconds)
+metrics.flush()
+'''
+
+
+def test_collect_across_processes():
+    """別のプロセスの記録と合算し、Prometheusのテキスト形式で出力できることを確認"""
+    print("="*60)
+    print("メトリクスの合算のテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        subprocess.run([sys.executable, '-c', WORKER_CODE, tmpdir], check=True)
+
+        metrics = Metrics(tmpdir)
+        metrics.observe(STAGE_METRIC, LABELS, 0.2)
+        series = metrics.collect()
+        values = series[(STAGE_METRIC, LABELS)]
+        print(f"バケットごとの件数: {values[:-1]}、合計: {values[-1]:.3f}秒")
+        assert sum(values[:-1]) == 4
+        assert values[0] == 1                                  # 0.005秒以下
+        assert values[BUCKETS.index(0.25)] == 2                # 0.1秒超 0.25秒以下
+        assert values[len(BUCKETS)] == 1                       # +Inf
+        assert abs(values[-1] - 50.404) < 1e-9
+
+        # 終了したプロセスのファイルは合算済みのファイルにまとめる
+        names = sorted(name for name in os.listdir(tmpdir) if not name.startswith('.'))
+        print(f"ファイル: {names}")
+        assert 'archive.json' in names and len(names) == 2
+
+        # まとめた後も合計は変わらない
+        assert metrics.collect()[(STAGE_METRIC, LABELS)] == values
+
+        text = render(series)
+        print(text.splitlines()[2])
+        assert f'# TYPE {STAGE_METRIC} histogram' in text
+        assert f'{STAGE_METRIC}_bucket{{route="/api/valuate",stage="valuation",le="0.25"}} 3' in text
+        assert f'{STAGE_METRIC}_bucket{{route="/api/valuate",stage="valuation",le="+Inf"}} 4' in text
+        assert f'{STAGE_METRIC}_count{{route="/api/valuate",stage="valuation"}} 4' in text
+
+    print("="*60)
+
+
+def test_collect_waits_for_archive():
+    """他のプロセスが合算済みのファイルにまとめている間（排他ロック中）は、読み込みを待つことを確認"""
+    print("="*60)
+    print("合算とまとめる処理のロックのテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        metrics = Metrics(tmpdir)
+        metrics.observe(STAGE_METRIC, LABELS, 0.2)
+        results = []
+        with open(os.path.join(tmpdir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            reader = threading.Thread(target=lambda: results.append(metrics.collect()))
+            reader.start()
+            time.sleep(0.3)
+            waiting = reader.is_alive()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        reader.join(timeout=5)
+
+        print(f"ロック中に待機: {waiting}、読み込み後: {len(results)}件")
+        assert waiting and len(results) == 1
+
+    print("="*60)
+
+
+def test_unwritable_directory():
+    """METRICS_DIR に書き込めなくても、記録・書き出し・合算が例外にならないことを確認"""
+    print("="*60)
+    print("書き込めないディレクトリのテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # ファイルの下のディレクトリは作成できない（NotADirectoryError）
+        blocker = os.path.join(tmpdir, 'file')
+        open(blocker, 'w').close()
+        metrics = Metrics(os.path.join(blocker, 'metrics'), flush_seconds=0)
+
+        captured = CapturedLog()
+        logger = logging.getLogger('roadprice.metrics')
+        logger.addHandler(captured)
+        try:
+            for _ in range(3):
+                metrics.observe(STAGE_METRIC, LABELS, 0.2)
+            metrics.flush()
+            series = metrics.collect()
+        finally:
+            logger.removeHandler(captured)
+
+        print(f"警告: {captured.messages}")
+        assert sum(series[(STAGE_METRIC, LABELS)][:-1]) == 3
+        # 書き出しの失敗の警告は1回だけ
+        assert sum('書き出せませんでした' in message for message in captured.messages) == 1
+
+    print("="*60)
+
+
+class CapturedLog(logging.Handler):
+    """ロガーに書き出されたメッセージを保存する"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_server_timing_and_request_log():
+    """処理段階の内訳が Server-Timing ヘッダーとJSONログの両方に出ることを確認"""
+    print("="*60)
+    print("Server-Timing・リクエストログのテスト")
+    print("="*60)
+
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route('/work')
+    def work():
+        annotate(input_method='manual')
+        with stage('parse'):
+            time.sleep(0.002)
+        for _ in range(2):
+            with stage('valuation'):
+                time.sleep(0.001)
+        return 'ok'
+
+    captured = CapturedLog()
+    logger = logging.getLogger('roadprice.request')
+    logger.addHandler(captured)
+    try:
+        client = app.test_client()
+        response = client.get('/work', headers={'X-Request-ID': 'req-0001'})
+        response.close()
+        generated = client.get('/work', headers={'X-Request-ID': 'bad id;x'})
+        generated.close()
+    finally:
+        logger.removeHandler(captured)
+
+    header = response.headers['Server-Timing']
+    print(f"Server-Timing: {header}")
+    durations = dict(entry.split(';dur=') for entry in header.split(', '))
+    assert list(durations) == ['parse', 'valuation', 'total']
+    assert float(durations['parse']) >= 2.0
+    assert float(durations['valuation']) >= 2.0
+    assert float(durations['total']) >= float(durations['parse']) + float(durations['valuation'])
+    assert response.headers['X-Request-ID'] == 'req-0001'
+
+    # 不正なリクエストIDは使わずに新しく作成する
+    assert len(generated.headers['X-Request-ID']) == 32
+
+    entry = json.loads(captured.messages[0])
+    print(f"ログ: {captured.messages[0]}")
+    assert entry['request_id'] == 'req-0001'
+    assert entry['route'] == '/work' and entry['status'] == 200
+    assert entry['input_method'] == 'manual'
+    assert set(entry['stages']) == {'parse', 'valuation'}
+    assert entry['duration_ms'] >= entry['stages']['parse'] + entry['stages']['valuation']
+    assert len(captured.messages) == 2
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_collect_across_processes()
+    test_collect_waits_for_archive()
+    test_unwritable_directory()
+    test_server_timing_and_request_log()
@@ -0,0 +1,66 @@
+"""
+OCR計測用のコーパス（ocr_corpus.py）のテスト
+
+同じシードで同じコーパスになることと、描画したテキストの正解ラベルが
+parse_property_info の結果と一致する（全角数字・元年を除く）ことを確認する。
+"""
+import os
+import tempfile
+
+from PIL import Image
+
+from ocr_corpus import FIELDS, field_matches, generate_corpus, load_labels, make_spec, spec_text
+from text_parser import parse_property_info
+
+
+def test_generate_corpus():
+    """画像と labels.jsonl が作成され、同じシードなら同じ内容になることを確認"""
+    print("="*60)
+    print("コーパスの作成のテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        labels = generate_corpus(tmpdir, count=4, seed=7, workers=1, fonts=[])
+        assert load_labels(tmpdir) == labels
+        for label in labels:
+            with Image.open(os.path.join(tmpdir, label['file'])) as image:
+                print(f"{label['file']}: {image.size} {label['variation']['layout']} {label['truth']}")
+                assert round(image.info['dpi'][0]) == label['variation']['dpi']
+
+    assert make_spec(3, seed=7) == make_spec(3, seed=7)
+    assert make_spec(3, seed=7) != make_spec(3, seed=8)
+
+    print("="*60)
+
+
+def test_labels_match_parser():
+    """描画したテキストの解析結果が正解ラベルと一致することを確認"""
+    print("="*60)
+    print("正解ラベルと解析結果のテスト")
+    print("="*60)
+
+    checked = 0
+    for index in range(200):
+        spec = make_spec(index)
+        variation = spec['variation']
+        # 全角数字と「元年」は parse_property_info が対応していない
+        if variation['full_width'] or variation['year_format'] == 'wareki_gannen':
+            continue
+        text = spec_text(spec)
+        parsed = parse_property_info(text)
+        mismatched = [name for name in FIELDS if not field_matches(name, spec['truth'][name], parsed[name])]
+        assert not mismatched, (text, mismatched)
+        checked += 1
+    print(f"一致した枚数: {checked}")
+    assert checked > 100
+
+    # 所在地は全角・半角と空白の違いを無視する
+    assert field_matches('address', '東京都渋谷区渋谷1-2-3', '東京都 渋谷区 渋谷１－２－３')
+    assert not field_matches('land_area', 150.5, None)
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_generate_corpus()
+    test_labels_match_parser()
@@ -0,0 +1,62 @@
+"""
+OCRエンジンの常駐ワーカープール（ocr_engine.py）のテスト
+
+ワーカー数の上限まで使われているときに待っていた呼び出し元が、ワーカーの再起動（上限ジョブ数）で
+新しいワーカーを起動して処理を続けられること（タイムアウトまで待たされないこと）を確認する。
+tesserocr がない環境では省略する。
+"""
+import threading
+import time
+
+from PIL import Image
+
+import ocr_engine
+from ocr_engine import OCRTimeoutError, WorkerPoolEngine
+
+
+def test_waiting_caller_after_recycle():
+    """size=1・max_jobs_per_worker=1 で2つのジョブを同時に実行しても、どちらもタイムアウトしないことを確認"""
+    print("="*60)
+    print("ワーカープールの待機・再起動のテスト")
+    print("="*60)
+
+    if ocr_engine.tesserocr is None:
+        print("tesserocr がないため省略します")
+        return
+
+    pool = WorkerPoolEngine(size=1, job_timeout=30, max_jobs_per_worker=1)
+    image = Image.new('L', (200, 60), 255)
+    outcomes = []
+
+    def job():
+        start = time.perf_counter()
+        try:
+            pool.image_to_string(image, 'eng')
+            outcome = 'ok'
+        except OCRTimeoutError as e:
+            outcome = f'timeout: {e}'
+        except ocr_engine.OCREngineError:
+            # traineddata がない環境ではワーカー内のエラーになる（待機とは関係ない）
+            outcome = 'engine error'
+        outcomes.append((outcome, time.perf_counter() - start))
+
+    try:
+        threads = [threading.Thread(target=job) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.shutdown()
+
+    print(f"結果: {outcomes}")
+    assert len(outcomes) == 2
+    assert not any(outcome.startswith('timeout') for outcome, _ in outcomes)
+    assert max(seconds for _, seconds in outcomes) < 20
+    assert pool._spawned == 0
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_waiting_caller_after_recycle()
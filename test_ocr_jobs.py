@@ -0,0 +1,167 @@
+"""
+画像アップロードによる評価のバックグラウンド処理（flask_app/ocr_jobs.py）のテスト（一時ディレクトリのSQLiteを使用）
+
+更新が止まったとして失敗扱いにした順番待ちのジョブが後から実行されないこと、
+実行中に失敗扱いにしたジョブが処理の結果で上書きされないことと、
+同じプロセスで順番待ちのジョブは処理が進むたびに更新日時が進み、失敗扱いにならないことを確認する。
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+
+FLASK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_app')
+if FLASK_DIR not in sys.path:
+    sys.path.append(FLASK_DIR)
+
+import ocr_jobs  # noqa: E402
+from models import db, OCRJob, User  # noqa: E402
+
+
+def make_app(database_path):
+    """一時データベースを使う最小のFlaskアプリを作成し、ユーザーIDを返す"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(email='jobs@example.com')
+        db.session.add(user)
+        db.session.commit()
+        return app, user.id
+
+
+def add_queued_job(user_id, age_seconds):
+    """更新日時が age_seconds 秒前の順番待ちのジョブを登録する"""
+    job = OCRJob(user_id=user_id, status='queued', progress=0, stage='順番待ちです',
+                 updated_at=datetime.utcnow() - timedelta(seconds=age_seconds))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def failing_extract(started):
+    """呼び出された画像を started に記録して、抽出に失敗する extract_property_info を作る"""
+    def extract(image_bytes):
+        started.append(image_bytes)
+        raise ValueError('抽出できませんでした')
+    return extract
+
+
+def test_expired_job_never_runs():
+    """失敗扱いにした順番待ちのジョブは、ワーカースレッドに回ってきても実行しないことを確認"""
+    print("="*60)
+    print("失敗扱いにした順番待ちのジョブのテスト")
+    print("="*60)
+
+    started = []
+    previous_extract = ocr_jobs.extract_property_info
+    ocr_jobs.extract_property_info = failing_extract(started)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            app, user_id = make_app(os.path.join(tmpdir, 'jobs.db'))
+            with app.app_context():
+                stale_id = add_queued_job(user_id, ocr_jobs.STALE_SECONDS + 60)
+                assert ocr_jobs.expire_if_stale(db.session.get(OCRJob, stale_id))
+
+                ocr_jobs.run_ocr_job(app, stale_id, b'stale')
+                db.session.expire_all()
+                job = db.session.get(OCRJob, stale_id)
+                print(f"失敗扱いにしたジョブ: {job.status} {job.error}")
+                assert started == []
+                assert job.status == 'failed' and job.error.startswith('処理が中断されました')
+
+                # 順番待ちのままのジョブは実行する
+                fresh_id = add_queued_job(user_id, 0)
+                ocr_jobs.run_ocr_job(app, fresh_id, b'fresh')
+                db.session.expire_all()
+                job = db.session.get(OCRJob, fresh_id)
+                print(f"順番待ちのジョブ: {job.status} {job.error}")
+                assert started == [b'fresh']
+                assert job.status == 'failed' and job.error == '抽出できませんでした'
+                db.engine.dispose()
+    finally:
+        ocr_jobs.extract_property_info = previous_extract
+
+    print("="*60)
+
+
+def test_expired_while_running():
+    """実行中に失敗扱いにしたジョブは、評価額の計算が終わっても成功で上書きしないことを確認"""
+    print("="*60)
+    print("実行中に失敗扱いにしたジョブのテスト")
+    print("="*60)
+
+    def extract(image_bytes):
+        return {'address': '東京都千代田区', 'land_area': 100.0, 'total_floor_area': 80.0,
+                'building_structure': '木造', 'build_year': 2000}
+
+    def calculate(**property_info):
+        # 評価額の計算中に、別のワーカーが更新の止まったジョブとして失敗扱いにする
+        job = db.session.get(OCRJob, running_id)
+        job.updated_at = datetime.utcnow() - timedelta(seconds=ocr_jobs.STALE_SECONDS + 60)
+        db.session.commit()
+        assert ocr_jobs.expire_if_stale(job)
+        return {'total_valuation': 1}
+
+    previous = ocr_jobs.extract_property_info, ocr_jobs.calculate_valuation_result
+    ocr_jobs.extract_property_info, ocr_jobs.calculate_valuation_result = extract, calculate
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            app, user_id = make_app(os.path.join(tmpdir, 'jobs.db'))
+            with app.app_context():
+                running_id = add_queued_job(user_id, 0)
+
+                ocr_jobs.run_ocr_job(app, running_id, b'running')
+                db.session.expire_all()
+                job = db.session.get(OCRJob, running_id)
+                print(f"実行中に失敗扱いにしたジョブ: {job.status} {job.error}")
+                assert job.status == 'failed' and job.error.startswith('処理が中断されました')
+                assert job.result is None
+                db.engine.dispose()
+    finally:
+        ocr_jobs.extract_property_info, ocr_jobs.calculate_valuation_result = previous
+
+    print("="*60)
+
+
+def test_queued_job_kept_alive():
+    """同じプロセスで順番待ちのジョブは、他のジョブの処理が進むたびに更新日時が進むことを確認"""
+    print("="*60)
+    print("順番待ちのジョブの更新日時のテスト")
+    print("="*60)
+
+    previous_extract = ocr_jobs.extract_property_info
+    ocr_jobs.extract_property_info = failing_extract([])
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            app, user_id = make_app(os.path.join(tmpdir, 'jobs.db'))
+            with app.app_context():
+                waiting_id = add_queued_job(user_id, ocr_jobs.STALE_SECONDS + 60)
+                running_id = add_queued_job(user_id, 0)
+                with ocr_jobs._queued_lock:
+                    ocr_jobs._queued.add(waiting_id)
+
+                ocr_jobs.run_ocr_job(app, running_id, b'running')
+                db.session.expire_all()
+                job = db.session.get(OCRJob, waiting_id)
+                print(f"順番待ちのジョブの更新日時: {job.updated_at}")
+                assert job.updated_at > datetime.utcnow() - timedelta(seconds=60)
+                assert not ocr_jobs.expire_if_stale(job)
+                assert job.status == 'queued'
+                db.engine.dispose()
+    finally:
+        ocr_jobs.extract_property_info = previous_extract
+        with ocr_jobs._queued_lock:
+            ocr_jobs._queued.clear()
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_expired_job_never_runs()
+    test_expired_while_running()
+    test_queued_job_kept_alive()
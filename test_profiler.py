@@ -0,0 +1,143 @@
+"""
+サンプリングプロファイラ（flask_app/profiler.py）のテスト
+
+計測中に処理していた関数が collapsed stack 形式の結果に出ることと、
+リクエスト数を指定した計測がその件数で停止することを確認する。
+"""
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+
+FLASK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_app')
+if FLASK_DIR not in sys.path:
+    sys.path.append(FLASK_DIR)
+
+import profiler  # noqa: E402
+from profiler import SamplingProfiler, init_app, list_profiles  # noqa: E402
+
+
+def load_flask_app():
+    """flask_app/app.py を読み込む（ルートの app.py はStreamlit版）"""
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    if sys.path[0] != FLASK_DIR:
+        sys.path.insert(0, FLASK_DIR)
+    import app
+    return app
+
+
+def busy_loop(seconds):
+    """計測される側の処理（CPUを使い続ける）"""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(1000))
+    return total
+
+
+def read_folded(path):
+    """collapsed stack 形式のファイルを {スタック: 回数} で読み込む"""
+    stacks = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] = int(count)
+    return stacks
+
+
+def test_profile_seconds():
+    """秒数を指定した計測で、処理していた関数のスタックが記録されることを確認"""
+    print("="*60)
+    print("サンプリングプロファイラ（秒数指定）のテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sampler = SamplingProfiler(tmpdir, interval=0.005)
+        sampler.start(seconds=0.3)
+        busy_loop(0.5)
+        result = sampler.stop()
+        print(f"結果: {result}")
+        assert result['samples'] > 10
+        assert 0.25 <= result['seconds'] < 0.5
+
+        stacks = read_folded(result['path'])
+        main = {stack: count for stack, count in stacks.items() if stack.startswith('MainThread;')}
+        busy = sum(count for stack, count in main.items() if 'busy_loop (test_profiler.py:' in stack)
+        print(f"MainThread: {sum(main.values())}回、うち busy_loop: {busy}回")
+        assert busy >= 0.8 * sum(main.values())
+        # プロファイラ自身のスレッドは記録しない
+        assert not any(stack.startswith('sampling-profiler;') for stack in stacks)
+        assert list_profiles(tmpdir) == [os.path.basename(result['path'])]
+
+    print("="*60)
+
+
+def test_profile_requests():
+    """リクエスト数を指定した計測が、その件数を処理し終えた時点で停止することを確認"""
+    print("="*60)
+    print("サンプリングプロファイラ（リクエスト数指定）のテスト")
+    print("="*60)
+
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route('/work')
+    def work():
+        busy_loop(0.05)
+        return 'ok'
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sampler = profiler._default_profiler = SamplingProfiler(tmpdir, interval=0.005)
+        try:
+            sampler.start(requests=3)
+            client = app.test_client()
+            for _ in range(2):
+                client.get('/work').close()
+            assert sampler.running and sampler.status()['remaining_requests'] == 1
+
+            client.get('/work').close()
+            sampler._thread.join(timeout=5)
+            assert not sampler.running
+            result = sampler.last_result
+            print(f"結果: {result}")
+            assert result['samples'] > 0
+            assert any('work (test_profiler.py:' in stack for stack in read_folded(result['path']))
+
+            # 停止した後のリクエストは数えない
+            client.get('/work').close()
+            assert sampler.status()['last_result'] == result
+        finally:
+            profiler._default_profiler = None
+
+    print("="*60)
+
+
+def test_admin_params():
+    """/admin/profiler がJSONのオブジェクト以外を400で返すことを確認（管理者の確認の後の処理を直接呼び出す）"""
+    print("="*60)
+    print("/admin/profiler のパラメータのテスト")
+    print("="*60)
+
+    app_module = load_flask_app()
+    view = app_module.admin_profiler.__wrapped__
+    for body in ([1], 5, {'seconds': 'x'}):
+        with app_module.app.test_request_context('/admin/profiler', method='POST', json=body):
+            response, status = view()
+            print(f"{body!r}: {status} {response.get_json()['error']}")
+            assert status == 400
+
+    # 別のワーカーを指定した場合は開始しない
+    with app_module.app.test_request_context('/admin/profiler', method='POST', json={'pid': os.getpid() + 1}):
+        response, status = view()
+        assert status == 409
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_profile_seconds()
+    test_profile_requests()
+    test_admin_params()
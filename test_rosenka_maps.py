@@ -0,0 +1,120 @@
+"""
+路線価図の取り込みパイプラインのテスト（ローカルの保存済みシートを使用）
+
+OCRは fixtures/rosenka_maps/ocr/ に保存した認識結果（<シート名>_p<ページ>.txt）を返す。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from PIL import Image
+
+from rosenka_index import RosenkaIndex
+from rosenka_maps import RoadPriceTable, count_pages, find_sheets, ingest, parse_price_marks, render_page
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'rosenka_maps')
+
+
+class RecordedOCR:
+    """ページ画像ごとに保存済みの認識結果を返すOCR"""
+
+    def __init__(self, input_dir: str):
+        self.texts = {}
+        self.calls = 0
+        self.fail = set()
+        self._lock = threading.Lock()
+        for sheet in find_sheets(input_dir):
+            path = os.path.join(input_dir, sheet)
+            for page in range(count_pages(path)):
+                name = f"{os.path.splitext(sheet)[0]}_p{page + 1}.txt"
+                with open(os.path.join(FIXTURE_DIR, 'ocr', name), 'r', encoding='utf-8') as f:
+                    key = hashlib.sha256(render_page(path, page)).hexdigest()
+                    self.texts[key] = f.read()
+
+    def __call__(self, image_bytes: bytes) -> dict:
+        with self._lock:
+            self.calls += 1
+        key = hashlib.sha256(image_bytes).hexdigest()
+        if key in self.fail:
+            return {'text': '', 'confidence': 0, 'error': 'OCRに失敗しました'}
+        return {'text': self.texts[key], 'confidence': 90.0}
+
+
+def test_parse_price_marks():
+    """路線価の表記（千円/㎡ + 借地権割合）の読み取りを確認"""
+    marks = parse_price_marks('丸の内 5,120C　４３６０Ｃ 850 D\n13101 令和6年 2024A1 (1/2)')
+    print(f"読み取り: {[mark['raw'] for mark in marks]}")
+    assert [mark['price'] for mark in marks] == [5120000, 4360000, 850000]
+    assert [mark['ratio_code'] for mark in marks] == ['C', 'C', 'D']
+    assert marks[2]['leasehold_ratio'] == 0.6
+
+
+def test_ingest_resume():
+    """シートごとに保存され、再実行時は未処理・変更されたシートだけをOCRすることを確認"""
+    print("="*60)
+    print("路線価図取り込みのテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_dir = os.path.join(tmpdir, 'maps')
+        shutil.copytree(FIXTURE_DIR, input_dir, ignore=shutil.ignore_patterns('ocr'))
+        table = RoadPriceTable(os.path.join(tmpdir, 'rosenka_maps.sqlite3'))
+
+        # 2枚目のシートの2ページ目で失敗 → 1枚目だけ保存される
+        ocr = RecordedOCR(input_dir)
+        ocr.fail.add(hashlib.sha256(render_page(os.path.join(input_dir, '13101_02.tif'), 1)).hexdigest())
+        result = ingest(input_dir, table, workers=2, ocr=ocr, verbose=False)
+        print(f"1回目: {result}")
+        assert result['processed'] == 1 and list(result['failed']) == ['13101_02.tif']
+        assert len(table) == 4
+
+        # 再実行: 失敗したシートだけを処理
+        ocr.fail.clear()
+        ocr.calls = 0
+        result = ingest(input_dir, table, workers=2, ocr=ocr, verbose=False)
+        print(f"2回目: {result}")
+        assert result['skipped'] == 1 and result['processed'] == 1 and not result['failed']
+        assert ocr.calls == 2
+        assert len(table) == 9
+
+        prices = table.prices('13101_02.tif')
+        assert [(row['page'], row['price'], row['ratio_code']) for row in prices] == [
+            (1, 4210000, 'C'), (1, 3990000, 'C'), (1, 2780000, 'D'), (2, 3100000, 'C'), (2, 2950000, 'D'),
+        ]
+        assert prices[0]['town'] == '大手町1丁目'
+
+        # すべて処理済み: OCRしない
+        ocr.calls = 0
+        result = ingest(input_dir, table, workers=2, ocr=ocr, verbose=False)
+        assert result['skipped'] == 2 and ocr.calls == 0
+
+        # シートが差し替えられた場合は処理し直す
+        path = os.path.join(input_dir, '13101_01.png')
+        with Image.open(path) as image:
+            image.load()
+            image.putpixel((0, 0), 0)
+            image.save(path)
+        ocr = RecordedOCR(input_dir)
+        result = ingest(input_dir, table, workers=2, ocr=ocr, verbose=False)
+        print(f"差し替え後: {result}")
+        assert result['processed'] == 1 and result['skipped'] == 1 and ocr.calls == 1
+        assert len(table) == 9
+
+        # 町名ごとの中央値を路線価インデックスに書き出す
+        index_path = os.path.join(tmpdir, 'rosenka.idx')
+        assert RosenkaIndex.build(table.index_records(), index_path) == 2
+        index = RosenkaIndex(index_path)
+        assert index.lookup('東京都千代田区丸の内1丁目9-1') == 4190000
+        assert index.lookup('東京都千代田区大手町一丁目1番1号') == 3100000
+        index.close()
+        table.close()
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_parse_price_marks()
+    test_ingest_resume()
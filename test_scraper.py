@@ -0,0 +1,160 @@
+"""
+スクレイパーのテスト（ローカルの保存済みページを使用、ネットワーク不要）
+"""
+import json
+import os
+import shutil
+import tempfile
+
+from crawler import crawl
+from http_cache import CachedSession
+from nta_fixture_server import DEFAULT_FIXTURE_DIR, FixtureServer
+from rosenka_directory import RosenkaDirectory, crawl_results
+from scraper import get_rosenka_page_url
+
+
+def test_cached_lookup():
+    """同じ都道府県の2件目以降はネットワークにアクセスしないことを確認"""
+    print("="*60)
+    print("スクレイパー（HTTPキャッシュ）のテスト")
+    print("="*60)
+
+    with FixtureServer() as server, tempfile.TemporaryDirectory() as cache_dir:
+        session = CachedSession(cache_dir=cache_dir, rate=0)
+
+        # 1件目: トップ・都道府県・路線価図ページの3回
+        url = get_rosenka_page_url('東京都', '千代田区', base_url=server.url, session=session)
+        print(f"千代田区: {url}（リクエスト {server.request_count()}回）")
+        assert url == f'{server.url}main_r06/tokyo/tokyo/prices/c13101rf.htm'
+        assert server.request_count() == 3
+
+        # 2件目: すべてキャッシュから
+        url = get_rosenka_page_url('東京都', '渋谷区', base_url=server.url, session=session)
+        print(f"渋谷区: {url}（リクエスト {server.request_count()}回）")
+        assert url == f'{server.url}main_r06/tokyo/tokyo/prices/c13113rf.htm'
+        assert server.request_count() == 3
+
+        # 有効期限切れ: 条件付きリクエストで再検証し、本文は再送されない
+        expired = CachedSession(cache_dir=cache_dir, ttl=0, rate=0)
+        url = get_rosenka_page_url('東京都', '港区', base_url=server.url, session=expired)
+        print(f"港区: {url}（304応答 {server.not_modified_count()}回）")
+        assert url == f'{server.url}main_r06/tokyo/tokyo/prices/c13103rf.htm'
+        assert server.not_modified_count() == 3
+
+        # 見つからない市区町村
+        assert get_rosenka_page_url('大阪府', '堺市', base_url=server.url, session=session) is None
+
+        print(f"統計: {session.stats()}")
+
+    print("="*60)
+
+
+def test_crawler_resume():
+    """全都道府県を並行して収集し、中断後は未完了の都道府県だけを取得することを確認"""
+    print("="*60)
+    print("クローラー（並行取得・チェックポイント）のテスト")
+    print("="*60)
+
+    with FixtureServer(latency=0.05) as server, tempfile.TemporaryDirectory() as tmpdir:
+        checkpoint_path = os.path.join(tmpdir, 'checkpoint.json')
+        session = CachedSession(cache_dir=None, rate=0)
+
+        result = crawl(server.url, session, workers=4, checkpoint_path=checkpoint_path)
+        print(f"市区町村: {len(result['entries'])}件、{result['pages_per_sec']:.1f} ページ/秒")
+        assert not result['failed']
+        assert len(result['entries']) == 12
+        assert server.request_count() == 7
+
+        # 大阪府の途中で中断した状態にする
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        del data['prefectures']['大阪府']
+        with open(checkpoint_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+        server.reset_counts()
+        result = crawl(server.url, session, workers=4, checkpoint_path=checkpoint_path)
+        print(f"再開: スキップ {result['skipped']}件、リクエスト {server.request_count()}回")
+        assert result['skipped'] == 2
+        assert server.request_count() == 3
+        assert len(result['entries']) == 12
+
+    print("="*60)
+
+
+def test_directory():
+    """ディレクトリ作成後の検索がネットワークを使わず、更新は変わった都道府県だけになることを確認"""
+    print("="*60)
+    print("路線価図ページディレクトリのテスト")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        site_dir = os.path.join(tmpdir, 'site')
+        shutil.copytree(DEFAULT_FIXTURE_DIR, site_dir)
+
+        with FixtureServer(site_dir) as server:
+            session = CachedSession(cache_dir=None, rate=0)
+            directory = RosenkaDirectory(os.path.join(tmpdir, 'directory.sqlite3'))
+            directory.apply(server.url, crawl_results(server.url, session, verbose=False), replace=True)
+            print(f"登録: {len(directory)}件")
+            assert len(directory) == 12
+
+            # 登録済みの市区町村はネットワークにアクセスしない
+            server.reset_counts()
+            url = get_rosenka_page_url('大阪府', '北区', base_url=server.url, session=session, directory=directory)
+            assert url == f'{server.url}main_r06/osaka/osaka/prices/c27127rf.htm'
+            assert server.request_count() == 0
+
+            # 東京都の市区町村一覧だけを変更して更新
+            list_path = os.path.join(site_dir, 'main_r06', 'tokyo', 'tokyo', 'prices', 'city_frm.htm')
+            with open(list_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write(html.replace('<a href="c13201rf.htm">八王子市</a>', '<a href="c13202rf.htm">立川市</a>'))
+
+            changes = directory.apply(server.url, crawl_results(server.url, session, verbose=False))
+            print(f"差分: {changes}")
+            assert changes == {'東京都': {'added': ['立川市'], 'removed': ['八王子市'], 'changed': []}}
+            assert directory.lookup('東京都', '立川市') == f'{server.url}main_r06/tokyo/tokyo/prices/c13202rf.htm'
+            assert directory.lookup('東京都', '八王子市') is None
+            directory.close()
+
+    print("="*60)
+
+
+def test_directory_live_lookup():
+    """ディレクトリにない市区町村をサイトで見つけた場合、サイト上の名前で登録することを確認"""
+    print("="*60)
+    print("ディレクトリへの追加（サイト上の名前）のテスト")
+    print("="*60)
+
+    with FixtureServer() as server, tempfile.TemporaryDirectory() as tmpdir:
+        session = CachedSession(cache_dir=None, rate=0)
+        results = crawl_results(server.url, session, verbose=False)
+        results['東京都']['cities'] = [(city, url) for city, url in results['東京都']['cities'] if city != '渋谷区']
+        directory = RosenkaDirectory(os.path.join(tmpdir, 'directory.sqlite3'))
+        directory.apply(server.url, results, replace=True)
+
+        url = get_rosenka_page_url('東京都', '渋谷', base_url=server.url, session=session, directory=directory)
+        print(f"渋谷: {url}")
+        assert url == f'{server.url}main_r06/tokyo/tokyo/prices/c13113rf.htm'
+        assert ('東京都', '渋谷区', url) in directory.entries()
+        assert ('東京都', '渋谷', url) not in directory.entries()
+
+        # 完全一致でも部分一致でも、次からはネットワークにアクセスしない
+        server.reset_counts()
+        assert get_rosenka_page_url('東京都', '渋谷区', base_url=server.url, session=session,
+                                    directory=directory) == url
+        assert get_rosenka_page_url('東京都', '渋谷', base_url=server.url, session=session,
+                                    directory=directory) == url
+        assert server.request_count() == 0
+        directory.close()
+
+    print("="*60)
+
+
+if __name__ == "__main__":
+    test_cached_lookup()
+    test_crawler_resume()
+    test_directory()
+    test_directory_live_lookup()
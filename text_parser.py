@@ -1,9 +1,156 @@
 """
 OCR抽出テキストから不動産情報を解析するパーサー
+
+キーワード・正規表現はimport時に一度だけコンパイルする。
+解析時は各キーワードの出現位置を1回だけ検索して全項目で共有し、
+出現したキーワードのパターンだけをその位置から照合する。
 """
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+
+# ============================================================
+# キーワード・パターン定義
+# ============================================================
+
+ADDRESS_KEYWORDS = ['所在地', 'Address', '住所', '物件所在地', '所在']
+LAND_AREA_KEYWORDS = ['土地面積', 'Land Area', '敷地面積', '土地', '敷地']
+FLOOR_AREA_KEYWORDS = ['延床面積', 'Total Floor Area', '延べ床面積', '建物面積', '床面積', '延床']
+STRUCTURE_KEYWORDS = ['構造', 'Building Structure', '建物構造', 'Structure', '規模構造', '規模']
+BUILD_YEAR_KEYWORDS = ['建築年', 'Construction Year', '築年月', '建築', '築', '竣工年', '竣工', 'Year']
+
+# 構造のパターンマッピング
+STRUCTURE_PATTERNS = {
+    '木造': ['木造', 'W造', '木', 'Wood', 'Wooden'],
+    '鉄骨造': ['鉄骨造', 'S造', '鉄骨', '軽量鉄骨', 'Steel'],
+    '鉄筋コンクリート造': ['鉄筋コンクリート造', 'RC造', 'ＲＣ造', 'RC', '鉄筋コンクリート', 'SRC造', 'Reinforced Concrete']
+}
+
+# 和暦変換テーブル（簡略版）
+ERA_CONVERSION = {
+    '令和': 2018,
+    '平成': 1988,
+    '昭和': 1925,
+    '大正': 1911,
+    '明治': 1867
+}
+
+ADDRESS_MARKERS = ['都', '道', '府', '県', '区', '市', '町', '村', 'Tokyo', 'Osaka']
+
+
+def _compile_keyword_patterns(keywords: List[str], templates: List[str],
+                              flags: int = re.IGNORECASE) -> List[Tuple[str, List[re.Pattern]]]:
+    """キーワードごとに、テンプレートの {kw} を置き換えたパターンをコンパイル"""
+    return [
+        (keyword, [re.compile(template.replace('{kw}', keyword), flags) for template in templates])
+        for keyword in keywords
+    ]
+
+
+_AREA_TEMPLATES = [
+    r'{kw}[：:\s]*([0-9]+\.?[0-9]*)\s*[㎡m²平方メートルsquare meters]',
+    r'{kw}[：:\s]*([0-9]+\.?[0-9]*)\s*平方メートル',
+    r'{kw}[：:\s]*([0-9]+\.?[0-9]*)',
+]
+
+_ADDRESS_RULES = _compile_keyword_patterns(ADDRESS_KEYWORDS, [
+    r'{kw}[：:]\s*([^\n]+)',
+    r'{kw}\s+([^\n]+)',
+])
+_LAND_AREA_RULES = _compile_keyword_patterns(LAND_AREA_KEYWORDS, _AREA_TEMPLATES)
+_FLOOR_AREA_RULES = _compile_keyword_patterns(FLOOR_AREA_KEYWORDS, _AREA_TEMPLATES)
+_STRUCTURE_RULES = _compile_keyword_patterns(STRUCTURE_KEYWORDS, [
+    r'{kw}[：:\s]*([^\n]+)',
+    r'{kw}\s+([^\n]+)',
+])
+_BUILD_YEAR_RULES = _compile_keyword_patterns(BUILD_YEAR_KEYWORDS, [
+    r'{kw}[：:\s]*(19[0-9]{2}|20[0-9]{2})',
+    r'{kw}\s+(19[0-9]{2}|20[0-9]{2})',
+])
+# 和暦パターンは大文字・小文字を区別する
+_BUILD_YEAR_ERA_RULES = {
+    keyword: [(base_year, re.compile(rf'{keyword}[：:\s]*{era}\s*([0-9]+)'))
+              for era, base_year in ERA_CONVERSION.items()]
+    for keyword in BUILD_YEAR_KEYWORDS
+}
+
+_ADDRESS_CLEANUP = re.compile(r'[・･]')
+_AREA_UNIT_FALLBACK = re.compile(r'([0-9]+\.?[0-9]*)\s*[㎡平方メートル]')
+_YEAR_FALLBACK = re.compile(r'(19[5-9][0-9]|20[0-2][0-9])\s*年')
+
+_STRUCTURE_PATTERNS_LOWER = [
+    (standard_name, [pattern.lower() for pattern in patterns])
+    for standard_name, patterns in STRUCTURE_PATTERNS.items()
+]
+
+
+# ============================================================
+# キーワードの一括検索
+# ============================================================
+
+_ALL_KEYWORDS = list(dict.fromkeys(
+    ADDRESS_KEYWORDS + LAND_AREA_KEYWORDS + FLOOR_AREA_KEYWORDS + STRUCTURE_KEYWORDS + BUILD_YEAR_KEYWORDS
+))
+
+# 大文字・小文字の区別がないキーワード（漢字のみ）は str.find で、
+# それ以外は大文字・小文字を無視する正規表現で最初の出現位置を求める
+_KEYWORD_PATTERNS = {
+    keyword: None if keyword.lower() == keyword.upper() else re.compile(re.escape(keyword), re.IGNORECASE)
+    for keyword in _ALL_KEYWORDS
+}
+
+
+class KeywordPositions(dict):
+    """
+    キーワードの最初の出現位置（出現しない場合は-1）
+
+    位置は参照された時点で一度だけ検索して記録する。
+    各項目は先頭のキーワードで見つかることがほとんどのため、
+    全キーワードをまとめて走査するより検索量が少なく、長いテキストでも遅くならない。
+    """
+
+    def __init__(self, text: str):
+        super().__init__()
+        self.text = text
+
+    def __missing__(self, keyword: str) -> int:
+        pattern = _KEYWORD_PATTERNS[keyword]
+        if pattern is None:
+            pos = self.text.find(keyword)
+        else:
+            match = pattern.search(self.text)
+            pos = match.start() if match else -1
+        self[keyword] = pos
+        return pos
+
 
+def find_keywords(text: str) -> KeywordPositions:
+    """
+    キーワードの出現位置の検索結果を作成（大文字・小文字は区別しない）
+
+    パターンの検索をキーワードの出現位置から始めれば、先頭から検索した場合と同じ結果になる。
+    同じテキストに対する複数項目の抽出で共有すれば、キーワードごとの検索は1回で済む。
+
+    Args:
+        text: OCRで抽出したテキスト
+
+    Returns:
+        {キーワード: 最初の出現位置} の辞書（出現しない場合は-1）
+    """
+    return KeywordPositions(text)
+
+
+def _search(pattern: re.Pattern, text: str, keyword: str, positions: KeywordPositions):
+    """キーワードの出現位置からパターンを検索（キーワードが無ければNone）"""
+    pos = positions[keyword]
+    if pos < 0:
+        return None
+    return pattern.search(text, pos)
+
+
+# ============================================================
+# 解析
+# ============================================================
 
 def parse_property_info(text: str) -> Dict[str, Any]:
     """
@@ -21,72 +168,49 @@ def parse_property_info(text: str) -> Dict[str, Any]:
             'build_year': 建築年
         }
     """
-    result = {
-        'address': None,
-        'land_area': None,
-        'total_floor_area': None,
-        'building_structure': None,
-        'build_year': None
+    # キーワードの出現位置は全項目で共有する
+    positions = find_keywords(text)
+
+    return {
+        # 1. 所在地の抽出
+        'address': extract_address(text, positions),
+        # 2. 土地面積の抽出
+        'land_area': extract_land_area(text, positions),
+        # 3. 延床面積の抽出
+        'total_floor_area': extract_floor_area(text, positions),
+        # 4. 建物構造の抽出
+        'building_structure': extract_structure(text, positions),
+        # 5. 建築年の抽出
+        'build_year': extract_build_year(text, positions),
     }
 
-    # 1. 所在地の抽出
-    result['address'] = extract_address(text)
-
-    # 2. 土地面積の抽出
-    result['land_area'] = extract_land_area(text)
-
-    # 3. 延床面積の抽出
-    result['total_floor_area'] = extract_floor_area(text)
 
-    # 4. 建物構造の抽出
-    result['building_structure'] = extract_structure(text)
-
-    # 5. 建築年の抽出
-    result['build_year'] = extract_build_year(text)
-
-    return result
-
-
-def extract_address(text: str) -> Optional[str]:
+def extract_address(text: str, positions: Optional[KeywordPositions] = None) -> Optional[str]:
     """所在地を抽出"""
-    # キーワードパターン
-    keywords = ['所在地', 'Address', '住所', '物件所在地', '所在']
+    if positions is None:
+        positions = find_keywords(text)
 
-    for keyword in keywords:
+    for keyword, patterns in _ADDRESS_RULES:
         # キーワードの後の文字列を抽出（改行または次のキーワードまで）
-        patterns = [
-            rf'{keyword}[：:]\s*([^\n]+)',
-            rf'{keyword}\s+([^\n]+)',
-        ]
-
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = _search(pattern, text, keyword, positions)
             if match:
                 address = match.group(1).strip()
                 # 余分な記号や数字のみの文字列を除去
-                address = re.sub(r'[・･]', '', address)
+                address = _ADDRESS_CLEANUP.sub('', address)
                 # 都道府県名や区市町村が含まれているかチェック
-                if any(pref in address for pref in ['都', '道', '府', '県', '区', '市', '町', '村', 'Tokyo', 'Osaka']):
+                if any(pref in address for pref in ADDRESS_MARKERS):
                     if len(address) > 5:  # 最低限の長さチェック
                         return address
 
     return None
 
 
-def extract_land_area(text: str) -> Optional[float]:
-    """土地面積を抽出（㎡）"""
-    keywords = ['土地面積', 'Land Area', '敷地面積', '土地', '敷地']
-
-    for keyword in keywords:
-        # パターン1: "土地面積：150.5㎡" や "Land Area: 180.5 square meters"
-        patterns = [
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)\s*[㎡m²平方メートルsquare meters]',
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)\s*平方メートル',
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)',
-        ]
-
+def _extract_area(text: str, rules, positions: KeywordPositions) -> Optional[float]:
+    """面積パターンに一致する最初の妥当な値（10-10000㎡）を返す"""
+    for keyword, patterns in rules:
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = _search(pattern, text, keyword, positions)
             if match:
                 try:
                     value = float(match.group(1))
@@ -95,13 +219,24 @@ def extract_land_area(text: str) -> Optional[float]:
                         return value
                 except ValueError:
                     continue
+    return None
+
+
+def extract_land_area(text: str, positions: Optional[KeywordPositions] = None) -> Optional[float]:
+    """土地面積を抽出（㎡）"""
+    if positions is None:
+        positions = find_keywords(text)
+
+    # パターン1: "土地面積：150.5㎡" や "Land Area: 180.5 square meters"
+    value = _extract_area(text, _LAND_AREA_RULES, positions)
+    if value is not None:
+        return value
 
     # パターン2: 数値のみで㎡が明記されている場合
-    pattern = r'([0-9]+\.?[0-9]*)\s*[㎡平方メートル]'
-    matches = re.findall(pattern, text)
-    if matches:
+    match = _AREA_UNIT_FALLBACK.search(text)
+    if match:
         try:
-            value = float(matches[0])
+            value = float(match.group(1))
             if 10 <= value <= 10000:
                 return value
         except ValueError:
@@ -110,92 +245,50 @@ def extract_land_area(text: str) -> Optional[float]:
     return None
 
 
-def extract_floor_area(text: str) -> Optional[float]:
+def extract_floor_area(text: str, positions: Optional[KeywordPositions] = None) -> Optional[float]:
     """延床面積を抽出（㎡）"""
-    keywords = ['延床面積', 'Total Floor Area', '延べ床面積', '建物面積', '床面積', '延床']
-
-    for keyword in keywords:
-        # 複数のパターンを試す
-        patterns = [
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)\s*[㎡m²平方メートルsquare meters]',
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)\s*平方メートル',
-            rf'{keyword}[：:\s]*([0-9]+\.?[0-9]*)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    value = float(match.group(1))
-                    # 妥当な範囲チェック（10-10000㎡）
-                    if 10 <= value <= 10000:
-                        return value
-                except ValueError:
-                    continue
+    if positions is None:
+        positions = find_keywords(text)
 
-    return None
+    return _extract_area(text, _FLOOR_AREA_RULES, positions)
 
 
-def extract_structure(text: str) -> Optional[str]:
+def extract_structure(text: str, positions: Optional[KeywordPositions] = None) -> Optional[str]:
     """建物構造を抽出"""
-    # 構造のパターンマッピング
-    structure_patterns = {
-        '木造': ['木造', 'W造', '木', 'Wood', 'Wooden'],
-        '鉄骨造': ['鉄骨造', 'S造', '鉄骨', '軽量鉄骨', 'Steel'],
-        '鉄筋コンクリート造': ['鉄筋コンクリート造', 'RC造', 'ＲＣ造', 'RC', '鉄筋コンクリート', 'SRC造', 'Reinforced Concrete']
-    }
-
-    # キーワード
-    keywords = ['構造', 'Building Structure', '建物構造', 'Structure', '規模構造', '規模']
+    if positions is None:
+        positions = find_keywords(text)
 
     # キーワード付近を探す
-    for keyword in keywords:
-        patterns_to_try = [
-            rf'{keyword}[：:\s]*([^\n]+)',
-            rf'{keyword}\s+([^\n]+)'
-        ]
-
-        for pattern in patterns_to_try:
-            match = re.search(pattern, text, re.IGNORECASE)
+    for keyword, patterns in _STRUCTURE_RULES:
+        for pattern in patterns:
+            match = _search(pattern, text, keyword, positions)
             if match:
-                structure_text = match.group(1).strip()
+                structure_text = match.group(1).strip().lower()
                 # 構造パターンとマッチング
-                for standard_name, patterns in structure_patterns.items():
-                    for pat in patterns:
-                        if pat.lower() in structure_text.lower():
+                for standard_name, structure_patterns in _STRUCTURE_PATTERNS_LOWER:
+                    for pat in structure_patterns:
+                        if pat in structure_text:
                             return standard_name
 
     # キーワードなしでも構造を直接探す
-    for standard_name, patterns in structure_patterns.items():
-        for pattern in patterns:
-            if pattern.lower() in text.lower():
+    text_lower = text.lower()
+    for standard_name, structure_patterns in _STRUCTURE_PATTERNS_LOWER:
+        for pattern in structure_patterns:
+            if pattern in text_lower:
                 return standard_name
 
     return None
 
 
-def extract_build_year(text: str) -> Optional[int]:
+def extract_build_year(text: str, positions: Optional[KeywordPositions] = None) -> Optional[int]:
     """建築年を抽出（西暦）"""
-    keywords = ['建築年', 'Construction Year', '築年月', '建築', '築', '竣工年', '竣工', 'Year']
-
-    # 和暦変換テーブル（簡略版）
-    era_conversion = {
-        '令和': 2018,
-        '平成': 1988,
-        '昭和': 1925,
-        '大正': 1911,
-        '明治': 1867
-    }
+    if positions is None:
+        positions = find_keywords(text)
 
-    for keyword in keywords:
+    for keyword, patterns in _BUILD_YEAR_RULES:
         # 西暦パターン: "建築年：2015年" or "Construction Year: 2018"
-        patterns = [
-            rf'{keyword}[：:\s]*(19[0-9]{{2}}|20[0-9]{{2}})',
-            rf'{keyword}\s+(19[0-9]{{2}}|20[0-9]{{2}})'
-        ]
-
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = _search(pattern, text, keyword, positions)
             if match:
                 try:
                     year = int(match.group(1))
@@ -205,9 +298,8 @@ def extract_build_year(text: str) -> Optional[int]:
                     continue
 
         # 和暦パターン: "平成27年"
-        for era, base_year in era_conversion.items():
-            pattern = rf'{keyword}[：:\s]*{era}\s*([0-9]+)'
-            match = re.search(pattern, text)
+        for base_year, pattern in _BUILD_YEAR_ERA_RULES[keyword]:
+            match = _search(pattern, text, keyword, positions)
             if match:
                 try:
                     era_year = int(match.group(1))
@@ -216,8 +308,7 @@ def extract_build_year(text: str) -> Optional[int]:
                     continue
 
     # キーワードなしで西暦を探す
-    pattern = r'(19[5-9][0-9]|20[0-2][0-9])\s*年'
-    match = re.search(pattern, text)
+    match = _YEAR_FALLBACK.search(text)
     if match:
         try:
             year = int(match.group(1))
@@ -2,42 +2,59 @@
 不動産評価額算出ロジック
 """
 from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
 from property_data import PropertyData
+from rosenka_index import get_default_index
+
+
+# 構造別の再建築費の単価（円/㎡）
+UNIT_COSTS = {
+    '木造': 150000,
+    '鉄骨造': 180000,
+    '鉄筋コンクリート造': 200000
+}
+DEFAULT_UNIT_COST = 150000
+
+# 構造別の耐用年数と最低補正率
+DEPRECIATION_PARAMS = {
+    '木造': {'max_years': 22, 'min_rate': 0.2},
+    '鉄骨造': {'max_years': 34, 'min_rate': 0.2},
+    '鉄筋コンクリート造': {'max_years': 47, 'min_rate': 0.2}
+}
+
+# 路線価インデックスに該当する地域がない場合の路線価（円/㎡）
+DEFAULT_ROSENKA = 300000
+
+# 固定資産税路線価は相続税路線価の70%
+FIXED_ASSET_ROSENKA_RATIO = 0.7
 
 
-def calculate_building_valuation(property_data: PropertyData) -> float:
+def calculate_building_valuation(property_data: PropertyData, current_year: Optional[int] = None) -> float:
     """
     建物の固定資産税評価額を推定する
 
     Args:
         property_data: 物件情報
+        current_year: 経年の基準年（省略時は今年）
 
     Returns:
         建物の評価額（円）
     """
     # 1. 再建築費の単価を決定
-    unit_costs = {
-        '木造': 150000,
-        '鉄骨造': 180000,
-        '鉄筋コンクリート造': 200000
-    }
-    unit_cost = unit_costs.get(property_data.building_structure, 150000)
+    unit_cost = UNIT_COSTS.get(property_data.building_structure, DEFAULT_UNIT_COST)
 
     # 2. 経年減点補正率を決定
-    current_year = datetime.now().year
+    if current_year is None:
+        current_year = datetime.now().year
     age = current_year - property_data.build_year
 
-    # 構造別の耐用年数と最低補正率
-    depreciation_params = {
-        '木造': {'max_years': 22, 'min_rate': 0.2},
-        '鉄骨造': {'max_years': 34, 'min_rate': 0.2},
-        '鉄筋コンクリート造': {'max_years': 47, 'min_rate': 0.2}
-    }
-
     # デフォルトは木造
-    params = depreciation_params.get(
+    params = DEPRECIATION_PARAMS.get(
         property_data.building_structure,
-        depreciation_params['木造']
+        DEPRECIATION_PARAMS['木造']
     )
 
     max_years = params['max_years']
@@ -58,9 +75,13 @@ def calculate_building_valuation(property_data: PropertyData) -> float:
     return valuation
 
 
-def get_rosenka_mock(address: str) -> float:
+def get_rosenka(address: str) -> float:
     """
-    路線価を取得する（モック関数）
+    路線価を取得する
+
+    ローカルの路線価インデックス（rosenka_index.py で取り込み）から、
+    所在地に一致する最も詳細な地域の路線価を返す。
+    インデックスがない場合や該当する地域がない場合は DEFAULT_ROSENKA を返す。
 
     Args:
         address: 物件の所在地
@@ -68,25 +89,31 @@ def get_rosenka_mock(address: str) -> float:
     Returns:
         路線価（円/㎡）
     """
-    # 現時点では固定値を返す
-    return 300000
+    index = get_default_index()
+    if index is not None:
+        price = index.lookup(address)
+        if price is not None:
+            return price
+    return DEFAULT_ROSENKA
 
 
-def calculate_land_valuation(property_data: PropertyData) -> float:
+def calculate_land_valuation(property_data: PropertyData, rosenka: Optional[float] = None) -> float:
     """
     土地の固定資産税評価額を推定する
 
     Args:
         property_data: 物件情報
+        rosenka: 路線価（円/㎡、省略時は所在地から取得）
 
     Returns:
         土地の評価額（円）
     """
-    # 1. 路線価を取得（モック）
-    rosenka = get_rosenka_mock(property_data.address)
+    # 1. 路線価を取得
+    if rosenka is None:
+        rosenka = get_rosenka(property_data.address)
 
     # 2. 固定資産税路線価を推定（相続税路線価の70%）
-    fixed_asset_rosenka = rosenka * 0.7
+    fixed_asset_rosenka = rosenka * FIXED_ASSET_ROSENKA_RATIO
 
     # 3. 補正率（現時点では1.0固定）
     correction_rate = 1.0
@@ -95,3 +122,89 @@ def calculate_land_valuation(property_data: PropertyData) -> float:
     valuation = fixed_asset_rosenka * property_data.land_area * correction_rate
 
     return valuation
+
+
+# 一括計算用の構造別テーブル（未知の構造は木造として扱うため、先頭を木造にする）
+_STRUCTURES = ['木造'] + [name for name in UNIT_COSTS if name != '木造']
+_STRUCTURE_INDEX = {name: i for i, name in enumerate(_STRUCTURES)}
+_UNIT_COST_TABLE = np.array(
+    [UNIT_COSTS[name] for name in _STRUCTURES] + [DEFAULT_UNIT_COST], dtype=np.float64
+)
+_MAX_YEARS_TABLE = np.array([DEPRECIATION_PARAMS[name]['max_years'] for name in _STRUCTURES], dtype=np.int64)
+_MIN_RATE_TABLE = np.array([DEPRECIATION_PARAMS[name]['min_rate'] for name in _STRUCTURES], dtype=np.float64)
+_ANNUAL_DECREASE_TABLE = (1.0 - _MIN_RATE_TABLE) / _MAX_YEARS_TABLE
+
+
+def calculate_valuations_batch(
+    addresses: Iterable[str],
+    land_areas,
+    building_structures: Iterable[str],
+    total_floor_areas,
+    build_years,
+    current_year: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    複数物件の評価額を配列演算でまとめて計算する
+
+    calculate_land_valuation / calculate_building_valuation を1件ずつ呼んだ場合と
+    同じ値（同じ浮動小数点演算）になる。路線価は所在地ごとに1回だけ取得する。
+
+    Args:
+        addresses: 所在地の列
+        land_areas: 土地面積（㎡）の列
+        building_structures: 建物構造の列
+        total_floor_areas: 延床面積（㎡）の列
+        build_years: 建築年の列
+        current_year: 経年の基準年（省略時は今年）
+
+    Returns:
+        {'land_valuation', 'building_valuation', 'total_valuation'} の各配列（円）と
+        'road_price'（使用した路線価、円/㎡）の配列
+    """
+    if current_year is None:
+        current_year = datetime.now().year
+
+    land_areas = np.asarray(land_areas, dtype=np.float64)
+    total_floor_areas = np.asarray(total_floor_areas, dtype=np.float64)
+    build_years = np.asarray(build_years)
+
+    # 構造の文字列をテーブルの添字に変換
+    # 単価は未知の構造でDEFAULT_UNIT_COST（末尾）、耐用年数は木造（先頭）を使う
+    unknown = len(_STRUCTURES)
+    structure_codes = np.fromiter(
+        (_STRUCTURE_INDEX.get(s, unknown) for s in building_structures),
+        dtype=np.intp, count=len(build_years)
+    )
+    depreciation_codes = np.where(structure_codes == unknown, 0, structure_codes)
+
+    # 建物: 再建築費の単価 × 延床面積 × 経年減点補正率
+    age = current_year - build_years
+    max_years = _MAX_YEARS_TABLE[depreciation_codes]
+    depreciation_rate = np.where(
+        age <= 0,
+        1.0,
+        np.where(
+            age >= max_years,
+            _MIN_RATE_TABLE[depreciation_codes],
+            1.0 - age * _ANNUAL_DECREASE_TABLE[depreciation_codes]
+        )
+    )
+    building_valuation = _UNIT_COST_TABLE[structure_codes] * total_floor_areas * depreciation_rate
+
+    # 土地: 固定資産税路線価 × 土地面積 × 補正率
+    rosenka_by_address = {}
+    rosenka = np.fromiter(
+        (rosenka_by_address[a] if a in rosenka_by_address
+         else rosenka_by_address.setdefault(a, get_rosenka(a))
+         for a in addresses),
+        dtype=np.float64, count=len(land_areas)
+    )
+    correction_rate = 1.0
+    land_valuation = rosenka * FIXED_ASSET_ROSENKA_RATIO * land_areas * correction_rate
+
+    return {
+        'land_valuation': land_valuation,
+        'building_valuation': building_valuation,
+        'total_valuation': land_valuation + building_valuation,
+        'road_price': rosenka,
+    }